@@ -5,9 +5,15 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
+from . import cli
 from . import controllers
 from . import models
 from . import wizard
 from . import zk
 
+
+def post_init_hook(env):
+    """Fill the daily attendance summaries from the attendances already in the database."""
+    env['zkteco.attendance.daily']._rebuild()
+
 # vim:expandtab:smartindent:tabstop=4:softtabstop=4:shiftwidth=4:
\ No newline at end of file
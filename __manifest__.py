@@ -7,7 +7,7 @@
 
 {
     'name': 'EAUT ZKTeco Integration',
-    'version': '18.0.3.2.1',
+    'version': '18.0.3.5.0',
     'category': 'Human Resources',
     'summary': 'Automate attendance by integrating ZKTeco biometric devices with Odoo.',
     'description': """
@@ -68,6 +68,9 @@
         'views/dashboard_dashboard.xml',
         'demo/dashboard_dashboard_demo.xml',
         'data/ir_cron.xml',
+        'data/ir_sequence.xml',
+        'data/fingerprint_template_data.xml',
+        'data/raw_payload_data.xml',
         'views/zkteco_device_settings_views.xml',
         'views/zkteco_device_logs.xml',
         'wizard/zkteco_device_attendance_create.xml',
@@ -75,6 +78,7 @@
         'wizard/zkteco_device_attendance_report_view.xml',
         'wizard/employee_leave_assign_wizard.xml',
         'wizard/attendance_reports.xml',
+        'wizard/zkteco_attlog_import_view.xml',
         'views/views_inherit.xml',
         'views/attendance_state_views.xml',
         'views/zkteco_device_fingerprints.xml',
@@ -95,6 +99,7 @@
     "images": ['static/description/main_screenshot.png'],
     "live_test_url" : "",
     'demo': [],
+    'post_init_hook': 'post_init_hook',
     'installable': True,
     'auto_install': False,
     'application': True,
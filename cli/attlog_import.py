@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+import optparse
+import os
+import sys
+
+import odoo
+from odoo.cli import Command
+
+_logger = logging.getLogger(__name__)
+
+
+class ZktecoAttlogImport(Command):
+    """Import attendance dump files exported from ZKTeco devices over USB"""
+    name = 'zkteco_attlog_import'
+
+    def run(self, args):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{sys.argv[0].split("/")[-1]} {self.name}'
+        parser.usage = "%prog [options] FILE [FILE ...]"
+        group = optparse.OptionGroup(parser, "ZKTeco Attendance Dump Import",
+                                     "Import dump files into the database given by `-d`.")
+        group.add_option("--device", dest="import_device",
+                         help="Serial number of the device the files were exported from.")
+        group.add_option("--layout", dest="import_layout", default='auto',
+                         choices=['auto', 'text', '8', '16', '40'],
+                         help="Record layout: auto (default), text, 8, 16 or 40. "
+                              "Auto stops on dumps that several layouts or none fit.")
+        group.add_option("--chunk-records", dest="import_chunk_records", type="int", default=5000,
+                         help="Records written between two commits (default 5000).")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(args, setup_logging=True)
+        files = [path for path in odoo.tools.config.parser.largs if path]
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname or not opt.import_device or not files:
+            _logger.error('Usage: zkteco_attlog_import -d DB --device SERIAL FILE [FILE ...]')
+            sys.exit(1)
+        missing = [path for path in files if not os.path.isfile(path)]
+        if missing:
+            _logger.error("Files not found: %s", ", ".join(missing))
+            sys.exit(1)
+
+        registry = odoo.modules.registry.Registry(dbname)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            device = env['zkteco.device.setting'].search([('serial_number', '=', opt.import_device)], limit=1)
+            if not device:
+                _logger.error("Unknown device serial number: %s", opt.import_device)
+                sys.exit(1)
+            for path in files:
+                report = device._import_attlog_dump(
+                    path, opt.import_layout, chunk_records=opt.import_chunk_records, commit=True)
+                print(f"{path}: {report['records']} records, {report['created']} imported "
+                      f"in {report['seconds']:.1f}s")
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+import multiprocessing
+import optparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import odoo
+from odoo.cli import Command
+
+_logger = logging.getLogger(__name__)
+
+
+def _calculate_shard(dbname, batch_size, shard, shards):
+    """
+    Calculate one shard of the pending punches in a worker process.
+
+    Each worker opens its own registry and cursor; the shard commits its own
+    batches and keeps its own resume cursor.
+
+    Returns:
+        tuple: (shard, counters of the shard)
+    """
+    registry = odoo.modules.registry.Registry(dbname)
+    with registry.cursor() as cr:
+        env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+        counters = env['zkteco.calculation.wizard']._cron_calculate_attendance(
+            batch_size=batch_size, shard=shard, shards=shards)
+    return shard, counters
+
+
+class ZktecoCalculateAttendance(Command):
+    """Calculate pending attendance punches in parallel worker processes"""
+    name = 'zkteco_calculate_attendance'
+
+    def run(self, args):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{sys.argv[0].split("/")[-1]} {self.name}'
+        group = optparse.OptionGroup(parser, "ZKTeco Attendance Calculation",
+                                     "Calculate the pending punches of the database given by `-d`, "
+                                     "split into shards of employees processed by separate processes.")
+        group.add_option("--shards", dest="calculation_shards", type="int", default=os.cpu_count() or 1,
+                         help="Number of shards and worker processes (default: number of CPUs).")
+        group.add_option("--batch-size", dest="calculation_batch_size", type="int", default=0,
+                         help="Employees per committed batch (default: the configured setting).")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(args, setup_logging=True)
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname or opt.calculation_shards < 1:
+            _logger.error('Usage: zkteco_calculate_attendance -d DB [--shards N] [--batch-size N]')
+            sys.exit(1)
+
+        shards = opt.calculation_shards
+        totals = dict.fromkeys(('batches', 'logs', 'employees', 'created', 'updated', 'failed'), 0)
+        failed_shards = []
+        # Workers are forked before this process opens any database connection.
+        with ProcessPoolExecutor(max_workers=shards, mp_context=multiprocessing.get_context('fork')) as executor:
+            futures = {
+                executor.submit(_calculate_shard, dbname, opt.calculation_batch_size, shard, shards): shard
+                for shard in range(shards)
+            }
+            for future in as_completed(futures):
+                try:
+                    shard, counters = future.result()
+                except Exception:
+                    _logger.exception("Attendance calculation shard %s failed", futures[future])
+                    failed_shards.append(futures[future])
+                    continue
+                if not counters:
+                    print(f"shard {shard}/{shards}: skipped, already running")
+                    continue
+                for key, value in counters.items():
+                    totals[key] += value
+                print(f"shard {shard}/{shards}: {counters['logs']} logs of {counters['employees']} employees, "
+                      f"{counters['created']} created, {counters['updated']} updated, "
+                      f"{counters['failed']} employees failed")
+
+        print(f"total: {totals['batches']} batches, {totals['logs']} logs of {totals['employees']} employees, "
+              f"{totals['created']} created, {totals['updated']} updated, {totals['failed']} employees failed")
+        if failed_shards:
+            sys.exit(1)
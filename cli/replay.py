@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+import optparse
+import sys
+
+import odoo
+from odoo.cli import Command
+
+_logger = logging.getLogger(__name__)
+
+REPLAY_MODELS = {
+    'attlog': 'device.stamp.logs',
+    'operlog': 'device.operation.stamplogs',
+}
+
+
+class ZktecoReplay(Command):
+    """Re-ingest the raw ADMS payloads stored in Odoo into the parsed log models"""
+    name = 'zkteco_replay'
+
+    def run(self, args):
+        parser = odoo.tools.config.parser
+        parser.prog = f'{sys.argv[0].split("/")[-1]} {self.name}'
+        group = optparse.OptionGroup(parser, "ZKTeco Replay",
+                                     "Replay stored ATTLOG/OPERLOG payloads of the database given by `-d`.")
+        group.add_option("--table", dest="replay_table", choices=['attlog', 'operlog', 'all'], default='all',
+                         help="Payloads to replay: attlog, operlog or all (default).")
+        group.add_option("--device", dest="replay_devices", action="append", default=[],
+                         help="Serial number of a device to replay; repeat for several. All devices by default.")
+        group.add_option("--chunk-lines", dest="replay_chunk_lines", type="int", default=5000,
+                         help="Lines processed between two commits (default 5000).")
+        parser.add_option_group(group)
+        opt = odoo.tools.config.parse_config(args, setup_logging=True)
+
+        dbname = odoo.tools.config['db_name']
+        if not dbname:
+            _logger.error('The zkteco_replay command needs a database name. Use the "-d" argument.')
+            sys.exit(1)
+
+        registry = odoo.modules.registry.Registry(dbname)
+        with registry.cursor() as cr:
+            env = odoo.api.Environment(cr, odoo.SUPERUSER_ID, {})
+            device_ids = None
+            if opt.replay_devices:
+                devices = env['zkteco.device.setting'].search([('serial_number', 'in', opt.replay_devices)])
+                unknown = set(opt.replay_devices) - set(devices.mapped('serial_number'))
+                if unknown:
+                    _logger.error("Unknown device serial numbers: %s", ", ".join(sorted(unknown)))
+                    sys.exit(1)
+                device_ids = devices.ids
+
+            tables = ['attlog', 'operlog'] if opt.replay_table == 'all' else [opt.replay_table]
+            for table in tables:
+                report = env[REPLAY_MODELS[table]]._replay_stream(
+                    device_ids=device_ids, chunk_lines=opt.replay_chunk_lines, commit=True)
+                print(f"{table}: {report['payloads']} payloads, {report['lines']} lines, "
+                      f"{report['created']} created in {report['seconds']:.1f}s "
+                      f"({report['lines_per_second']:.0f} lines/s)")
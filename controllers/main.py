@@ -79,11 +79,13 @@ class ZKTecoController(http.Controller):
             current_time = now.strftime("%H:%M")
             formatted_time = f"{fixed_time};{current_time}"
 
-            operation_log = request.env['device.operation.stamplogs'].sudo().search([])
-            attendance_log_ids = request.env['device.stamp.logs'].sudo().search([])
+            operation_log = request.env['device.operation.stamplogs'].sudo().search(
+                [], order='opStamp desc', limit=1)
+            attendance_log_ids = request.env['device.stamp.logs'].sudo().search(
+                [], order='stamp desc', limit=1)
 
-            opStamp = operation_log.sorted('opStamp')[-1].opStamp if operation_log else 0
-            stamp = attendance_log_ids.sorted('stamp')[-1].stamp if attendance_log_ids else 0
+            opStamp = operation_log.opStamp if operation_log else 0
+            stamp = attendance_log_ids.stamp if attendance_log_ids else 0
 
             response = (
                 f"GET OPTION FROM: {sn}\n"
@@ -161,19 +163,7 @@ class ZKTecoController(http.Controller):
             if serial_number and table == "OPERLOG":
                 self.generate_zkteco_op_bid_logs(base_data, device_id, stp_value)
 
-                for line in base_data.strip().split('\n'):
-                    if line.startswith("OPLOG"):
-                        values = line.split()
-                        try:
-                            device_id.create_oplog(values, stp_value)
-                        except Exception as e:
-                            print(f"Error processing OPLOG: {e}")
-                    elif line.startswith("FP"):
-                        values = line.split()
-                        device_id.action_create_device_user_fingerprint(values)
-                    elif line.startswith("USER"):
-                        values = line.split()
-                        device_id.action_create_employee_device_user(values)
+                device_id.action_process_operation_payload(base_data, stp_value)
 
             if serial_number and table == "ATTLOG":
                 self.generate_zkteco_slogs(base_data, device_id, stp_value)
@@ -227,8 +217,8 @@ class ZKTecoController(http.Controller):
         **Behavior**:
             - Decode the incoming raw data.
             - Extract acknowledgment parameters.
-            - Identify the executed command (only if CMD is 'DATA' or 'CHECK').
-            - Update the command status in Odoo.
+            - Collect the executed commands (only if CMD is 'DATA' or 'CHECK').
+            - Update all acknowledged commands and device users in one batch.
 
         **Response**:
             str: "OK" to confirm successful processing.
@@ -240,8 +230,9 @@ class ZKTecoController(http.Controller):
 
         device_id = request.env['zkteco.device.setting'].sudo().search([
             ('serial_number', '=', serial_number)
-        ])
+        ], limit=1)
 
+        command_ids = []
         for line in base_data.split('\n'):
             if not line.strip():
                 continue
@@ -250,10 +241,12 @@ class ZKTecoController(http.Controller):
             parameters_dictionary = {}
             for param in parameters:
                 if param:
-                    key, value = param.split("=")
+                    key, value = param.split("=", 1)
                     parameters_dictionary[key] = value
 
-            if parameters_dictionary.get("CMD") in ["DATA", "CHECK"]:
-                command_id = parameters_dictionary.get("ID")
-                device_id.action_check_zkteco_device_command_revert_res(command_id)
+            if parameters_dictionary.get("CMD") in ["DATA", "CHECK"] and parameters_dictionary.get("ID"):
+                command_ids.append(parameters_dictionary["ID"])
+
+        if command_ids:
+            device_id.action_process_zkteco_device_command_acks(command_ids)
         return Response("OK", 200)
\ No newline at end of file
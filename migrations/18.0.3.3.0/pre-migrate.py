@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Move `multiple.punch.attendance_id` from a Many2many to a Many2one.
+
+    The attendance of every punch is copied from the relation table into the
+    new column before the ORM updates the field, then the relation table is
+    dropped. A punch linked to several attendances keeps the oldest one.
+    """
+    cr.execute("SELECT to_regclass('hr_attendance_multiple_punch_rel')")
+    if not cr.fetchone()[0]:
+        return
+
+    cr.execute("ALTER TABLE multiple_punch ADD COLUMN IF NOT EXISTS attendance_id int4")
+    cr.execute("""
+        UPDATE multiple_punch punch
+           SET attendance_id = rel.hr_attendance_id
+          FROM (
+                SELECT multiple_punch_id, min(hr_attendance_id) AS hr_attendance_id
+                  FROM hr_attendance_multiple_punch_rel
+              GROUP BY multiple_punch_id
+               ) rel
+         WHERE rel.multiple_punch_id = punch.id
+    """)
+    _logger.info("Linked %s multiple punches to their attendance", cr.rowcount)
+
+    cr.execute("DROP TABLE hr_attendance_multiple_punch_rel")
+    cr.execute("DELETE FROM ir_model_relation WHERE name = 'hr_attendance_multiple_punch_rel'")
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Fill the new `zkteco.attendance.daily` summaries.
+
+    The table is created empty by the upgrade; every existing attendance and
+    leave line day is summarised once, later changes refresh it incrementally.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['zkteco.attendance.daily']._rebuild()
+    _logger.info("Summarised %s attendance days", env['zkteco.attendance.daily'].search_count([]))
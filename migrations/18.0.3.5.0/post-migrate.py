@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+
+from odoo import api, SUPERUSER_ID
+
+_logger = logging.getLogger(__name__)
+
+
+def migrate(cr, version):
+    """
+    Rebuild the `zkteco.attendance.daily` summaries in the employee timezone.
+
+    Days used to be the UTC date of the check in and lateness was evaluated in
+    UTC; every summary is recomputed with the local day and the new leave
+    start and end.
+    """
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['zkteco.attendance.daily']._rebuild()
+    _logger.info("Summarised %s attendance days", env['zkteco.attendance.daily'].search_count([]))
@@ -6,7 +6,10 @@
 ########################################################
 
 from . import zkteco_device_settings
+from . import zkteco_device_health
 from . import zkteco_device_punching_logs
+from . import zkteco_attendance_dirty_day
+from . import zkteco_attendance_daily
 from . import hr_employee
 from . import res_config_settings
 from . import zkteco_device_event_logs
@@ -14,5 +17,6 @@ from . import device_stamp_logs
 from . import hr_employee
 from . import zkteco_device_states
 from . import zkteco_user_fingerprints
+from . import zkteco_fingerprint_replication
 from . import zkteco_cmds
 from . import dashboard_dashboard
\ No newline at end of file
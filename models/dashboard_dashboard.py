@@ -132,44 +132,32 @@ class DashboardDashboard(models.Model):
 			rec.total_present = present_count
 	
 
+	def _get_daily_employee_ids(self, flag):
+		"""
+		Return the employees with a daily attendance summary flagged `flag` in the dashboard period.
+
+		Args:
+			flag (str): Boolean field of `zkteco.attendance.daily`, e.g. 'is_late'.
+
+		Returns:
+			list: hr.employee ids, the latest flagged first.
+		"""
+		domain = self.get_filter('date') + [(flag, '=', True)]
+		return self.env['zkteco.attendance.daily']._get_employee_ids(domain)
+
 	@api.depends('dashboard_data_filter')
 	def _compute_total_late(self):
 		for rec in self:
-			domain = rec.get_filter('check_in')
-			today_date = fields.Date.context_today(self)
-			today_9am = fields.Datetime.to_datetime(f"{today_date} 09:00:00")
-			attendances = self.env['hr.attendance'].search(domain)
-			late_employees = set()
-			for att in attendances:
-				if att.check_in and att.check_in > today_9am:
-					late_employees.add(att.employee_id.id)
-
-			rec.total_late = len(late_employees)
+			rec.total_late = len(rec._get_daily_employee_ids('is_late'))
 
 
 	@api.depends('dashboard_data_filter')
 	def _compute_total_early_leave(self):
 		for rec in self:
-			domain = rec.get_filter('check_out')
-			today_date = fields.Date.context_today(self)
-			today_7pm = fields.Datetime.to_datetime(f"{today_date} 19:00:00")
-			attendances = self.env['hr.attendance'].search(domain)
-			early_employee_ids = set()
-			for att in attendances:
-				if att.check_out and att.check_out < today_7pm:
-					early_employee_ids.add(att.employee_id.id)
-			rec.total_early_leave = len(early_employee_ids)
+			rec.total_early_leave = len(rec._get_daily_employee_ids('is_early_leave'))
 
 	def open_late(self):
-		domain = self.get_filter('check_in')
-		today_date = fields.Date.context_today(self)
-		today_9am = fields.Datetime.to_datetime(f"{today_date} 09:00:00")
-		attendances = self.env['hr.attendance'].search(domain)
-		late_employee_ids = []
-		for att in attendances:
-			if att.check_in and att.check_in > today_9am:
-				if att.employee_id.id not in late_employee_ids:
-					late_employee_ids.append(att.employee_id.id)
+		late_employee_ids = self._get_daily_employee_ids('is_late')
 		action = self.env["ir.actions.actions"]._for_xml_id("hr.open_view_employee_list_my")
 		action['domain'] = [('id', 'in', late_employee_ids)]
 		return action
@@ -219,19 +207,7 @@ class DashboardDashboard(models.Model):
 	
 
 	def open_early_leave(self):
-		domain = self.get_filter('check_out')
-
-		today_date = fields.Date.context_today(self)
-		today_7pm = fields.Datetime.to_datetime(f"{today_date} 19:00:00")
-
-		attendances = self.env['hr.attendance'].search(domain)
-
-		early_employee_ids = []
-		for att in attendances:
-			if att.check_out and att.check_out < today_7pm:
-				if att.employee_id.id not in early_employee_ids:
-					early_employee_ids.append(att.employee_id.id)
-
+		early_employee_ids = self._get_daily_employee_ids('is_early_leave')
 		action = self.env["ir.actions.actions"]._for_xml_id("hr.open_view_employee_list_my")
 		action['domain'] = [('id', 'in', early_employee_ids)]
 		return action
@@ -295,18 +271,11 @@ class DashboardDashboard(models.Model):
 	@api.depends('dashboard_data_filter')
 	def _compute_late_employee(self):
 		for rec in self:
-			domain = rec.get_filter('check_in')
-			today_date = fields.Date.context_today(self)
-			today_9am = fields.Datetime.to_datetime(f"{today_date} 09:00:00")
-			attendances = self.env['hr.attendance'].search(domain)
-			late_employee_ids = set()
-			for att in attendances:
-				if att.check_in and att.check_in > today_9am:
-					late_employee_ids.add(att.employee_id.id)
+			late_employee_ids = rec._get_daily_employee_ids('is_late')
 			rec.total_late = len(late_employee_ids)
 
 			employee_data = []
-			for emp in self.env['hr.employee'].browse(list(late_employee_ids)[:20]):
+			for emp in self.env['hr.employee'].browse(late_employee_ids[:20]):
 				last_attendance = emp.attendance_ids.sorted(key=lambda r: r.check_in, reverse=True)
 				last_check_in = last_attendance[0].check_in if last_attendance else ''
 				employee_data.append({
@@ -322,20 +291,10 @@ class DashboardDashboard(models.Model):
 	@api.depends('dashboard_data_filter')
 	def _compute_early_leave_employee(self):
 		for rec in self:
-			domain = rec.get_filter('check_out')
-			today_date = fields.Date.context_today(self)
-			today_7pm = fields.Datetime.to_datetime(f"{today_date} 19:00:00")
-			
-			attendances = self.env['hr.attendance'].search(domain)
-			early_employee_ids = set()
-			
-			for att in attendances:
-				if att.check_out and att.check_out < today_7pm:
-					early_employee_ids.add(att.employee_id.id)
-			
+			early_employee_ids = rec._get_daily_employee_ids('is_early_leave')
 			rec.total_early_leave = len(early_employee_ids)
 			employee_data = []
-			for emp in self.env['hr.employee'].browse(list(early_employee_ids)[:20]):
+			for emp in self.env['hr.employee'].browse(early_employee_ids[:20]):
 				last_attendance = emp.attendance_ids.sorted(key=lambda r: r.check_out, reverse=True)
 				last_check_out = last_attendance[0].check_out if last_attendance else ''
 				employee_data.append({
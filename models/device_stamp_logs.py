@@ -5,8 +5,294 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
-from odoo import models, fields
-from datetime import datetime
+import logging
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from psycopg2.extras import execute_values
+
+from odoo import api, models, fields, tools
+
+_logger = logging.getLogger(__name__)
+
+# zlib level used for raw payloads; device bodies are repetitive text.
+PAYLOAD_COMPRESSION_LEVEL = 6
+# Rows deleted or converted per statement by the retention jobs.
+PAYLOAD_BATCH_SIZE = 5000
+# Stored payloads fetched per query by the replay engine.
+REPLAY_PAGE_SIZE = 200
+# Lines fed to the parser (and committed) per replay chunk.
+REPLAY_CHUNK_LINES = 5000
+
+
+class ZktecoRawPayloadMixin(models.AbstractModel):
+    """
+    Raw device payload stored zlib-compressed.
+
+    `log_text` stays the interface used by the controllers, views and replay;
+    it is compressed into `log_data` on write and decompressed on read.
+    Rows older than the configured retention window are pruned in batches,
+    except the latest row of each device, which carries the stamp the device
+    resumes from.
+    """
+    _name = 'zkteco.raw.payload.mixin'
+    _description = 'ZKTeco Compressed Raw Payload'
+
+    # Name of the integer stamp field of the inheriting model.
+    _stamp_field = 'stamp'
+
+    log_data = fields.Binary(
+        string='Compressed Payload',
+        attachment=False,
+        help='zlib-compressed raw body posted by the device.'
+    )
+    log_text = fields.Text(
+        string='Log Text',
+        compute='_compute_log_text',
+        inverse='_inverse_log_text',
+        help='Raw body posted by the device.'
+    )
+
+    @api.depends('log_data')
+    def _compute_log_text(self):
+        # Read the column directly: the client may ask binaries as sizes (bin_size).
+        # New records have no row yet, their payload is only in memory.
+        stored = self.filtered(lambda record: isinstance(record.id, int))
+        payloads = {}
+        if stored:
+            stored.flush_recordset(['log_data'])
+            self.env.cr.execute(
+                f'SELECT id, log_data FROM "{self._table}" WHERE id IN %s', [tuple(stored.ids)])
+            payloads = dict(self.env.cr.fetchall())
+        for record in self:
+            if isinstance(record.id, int):
+                payload = payloads.get(record.id)
+            else:
+                payload = record.log_data
+            record.log_text = zlib.decompress(bytes(payload)).decode('utf-8') if payload else False
+
+    def _inverse_log_text(self):
+        for record in self:
+            record.log_data = self._compress_payload(record.log_text)
+
+    @api.model
+    def _compress_payload(self, text):
+        if not text:
+            return False
+        return zlib.compress(text.encode('utf-8'), PAYLOAD_COMPRESSION_LEVEL)
+
+    @api.model
+    def _get_retention_days(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'dps_zkteco_biometric_integration.raw_log_retention_days', 90) or 0)
+
+    @api.model
+    def _compress_legacy_payloads(self):
+        """
+        Move payloads of the former plain-text `log_text` column into `log_data`.
+
+        Converts the rows in batches and drops the column once empty. Runs on
+        every install/upgrade and does nothing once the column is gone.
+        """
+        cr = self.env.cr
+        if not tools.column_exists(cr, self._table, 'log_text'):
+            return
+        converted = 0
+        while True:
+            cr.execute(f"""
+                SELECT id, log_text FROM "{self._table}"
+                WHERE log_data IS NULL AND log_text IS NOT NULL
+                LIMIT %s
+            """, [PAYLOAD_BATCH_SIZE])
+            rows = cr.fetchall()
+            if not rows:
+                break
+            execute_values(cr._obj, f"""
+                UPDATE "{self._table}" AS t SET log_data = v.log_data, log_text = NULL
+                FROM (VALUES %s) AS v(id, log_data) WHERE t.id = v.id
+            """, [(row_id, self._compress_payload(text)) for row_id, text in rows])
+            converted += len(rows)
+        cr.execute(f'ALTER TABLE "{self._table}" DROP COLUMN log_text')
+        self.invalidate_model()
+        _logger.info("Compressed %s raw payloads of %s", converted, self._name)
+
+    @api.model
+    def _prune_expired_payloads(self, retention_days=None):
+        """
+        Delete the payloads older than the retention window, batch by batch.
+
+        The most recent row of each device is always kept so the stamp sent back
+        to the device never goes backwards. Commits after each full batch, so it
+        is meant to run from the cron.
+
+        Args:
+            retention_days (int, optional): Overrides the configured window;
+                0 keeps everything.
+
+        Returns:
+            int: Number of rows deleted.
+        """
+        if retention_days is None:
+            retention_days = self._get_retention_days()
+        if retention_days <= 0:
+            return 0
+
+        cutoff = datetime.now() - timedelta(days=retention_days)
+        self.flush_model()
+        self.env.cr.execute(f"""
+            SELECT DISTINCT ON (device_id) id FROM "{self._table}"
+            ORDER BY device_id, "{self._stamp_field}" DESC NULLS LAST, id DESC
+        """)
+        kept_ids = tuple(row[0] for row in self.env.cr.fetchall()) or (0,)
+        deleted = 0
+        while True:
+            self.env.cr.execute(f"""
+                DELETE FROM "{self._table}" WHERE id IN (
+                    SELECT id FROM "{self._table}"
+                    WHERE log_date < %s AND id NOT IN %s
+                    LIMIT %s
+                )
+            """, [cutoff, kept_ids, PAYLOAD_BATCH_SIZE])
+            batch = self.env.cr.rowcount
+            deleted += batch
+            if batch < PAYLOAD_BATCH_SIZE:
+                break
+            self.env.cr.commit()
+        self.invalidate_model()
+        if deleted:
+            _logger.info("Pruned %s raw payloads of %s older than %s days", deleted, self._name, retention_days)
+        return deleted
+
+    @api.model
+    def _cron_prune_raw_payloads(self):
+        for model_name in ('device.stamp.logs', 'device.operation.stamplogs'):
+            self.env[model_name]._prune_expired_payloads()
+            self.env.cr.commit()
+
+    def _replay_payloads(self):
+        """Re-parse the selected payloads through the live ingestion path, in the current transaction."""
+        return self._replay_stream(record_ids=self.ids, commit=False)
+
+    @api.model
+    def _iter_device_payloads(self, device_id, record_ids=None, page_size=REPLAY_PAGE_SIZE):
+        """
+        Yield the stored payloads of a device in stamp order, one page at a time.
+
+        Pages are fetched with keyset pagination straight from the table, so only
+        one page of compressed payloads is held in memory.
+
+        Yields:
+            tuple: (stamp, decompressed payload)
+        """
+        stamp_column = f'COALESCE("{self._stamp_field}", 0)'
+        last_key = (-1, 0)
+        record_filter = "AND id IN %s" if record_ids else ""
+        while True:
+            params = [device_id, last_key[0], last_key[1]]
+            if record_ids:
+                params.append(tuple(record_ids))
+            self.env.cr.execute(f"""
+                SELECT {stamp_column}, id, log_data FROM "{self._table}"
+                WHERE device_id = %s AND ({stamp_column}, id) > (%s, %s) {record_filter}
+                ORDER BY {stamp_column}, id
+                LIMIT %s
+            """, params + [page_size])
+            rows = self.env.cr.fetchall()
+            if not rows:
+                return
+            for stamp, row_id, payload in rows:
+                if payload:
+                    yield stamp, zlib.decompress(bytes(payload)).decode('utf-8')
+            last_key = (rows[-1][0], rows[-1][1])
+
+    @api.model
+    def _replay_stream(self, device_ids=None, record_ids=None, chunk_lines=REPLAY_CHUNK_LINES, commit=True):
+        """
+        Re-ingest stored raw payloads through the batched parsers used by live ingestion.
+
+        Payloads are streamed per device in stamp order and fed to the parser in
+        chunks of about `chunk_lines` lines. Each chunk is written, optionally
+        committed, and the ORM cache is cleared, so memory stays bounded whatever
+        the number of stored lines. Ingestion skips data already stored, so a
+        replay can be interrupted and run again.
+
+        Args:
+            device_ids (list, optional): Devices to replay; all devices with payloads by default.
+            record_ids (list, optional): Restrict the replay to these payload records.
+            chunk_lines (int): Lines processed between two commits.
+            commit (bool): Commit after each chunk. Leave False when called from the UI.
+
+        Returns:
+            dict: {'payloads', 'lines', 'created', 'seconds', 'lines_per_second', 'devices': {device_id: {...}}}
+        """
+        self.flush_model()
+        if device_ids is None:
+            query = f'SELECT DISTINCT device_id FROM "{self._table}"'
+            params = []
+            if record_ids:
+                query += ' WHERE id IN %s'
+                params.append(tuple(record_ids))
+            self.env.cr.execute(query, params)
+            device_ids = sorted(row[0] for row in self.env.cr.fetchall() if row[0])
+
+        report = {'payloads': 0, 'lines': 0, 'created': 0, 'devices': {}}
+        started = time.monotonic()
+
+        def _flush(device, payloads, device_report):
+            device_report['created'] += self._replay_chunk(device, payloads) or 0
+            if commit:
+                self.env.cr.commit()
+            self.env.invalidate_all()
+            elapsed = time.monotonic() - started
+            _logger.info(
+                "Replay of %s for device %s: %s payloads, %s lines, %s created (%.0f lines/s overall)",
+                self._name, device.name, device_report['payloads'], device_report['lines'],
+                device_report['created'], (report['lines'] + device_report['lines']) / elapsed if elapsed else 0.0)
+
+        for device_id in device_ids:
+            device = self.env['zkteco.device.setting'].sudo().browse(device_id)
+            device_report = {'payloads': 0, 'lines': 0, 'created': 0}
+            payloads = []
+            buffered_lines = 0
+            for stamp, payload in self._iter_device_payloads(device_id, record_ids):
+                line_count = payload.count('\n') + (not payload.endswith('\n'))
+                payloads.append((stamp, payload))
+                buffered_lines += line_count
+                device_report['payloads'] += 1
+                device_report['lines'] += line_count
+                if buffered_lines >= chunk_lines:
+                    _flush(device, payloads, device_report)
+                    payloads, buffered_lines = [], 0
+            if payloads:
+                _flush(device, payloads, device_report)
+            report['devices'][device_id] = device_report
+            for key in ('payloads', 'lines', 'created'):
+                report[key] += device_report[key]
+
+        report['seconds'] = time.monotonic() - started
+        report['lines_per_second'] = report['lines'] / report['seconds'] if report['seconds'] else 0.0
+        _logger.info("Replay of %s done: %s payloads, %s lines, %s created in %.1fs (%.0f lines/s)",
+                     self._name, report['payloads'], report['lines'], report['created'],
+                     report['seconds'], report['lines_per_second'])
+        return report
+
+    @api.model
+    def _replay_chunk(self, device, payloads):
+        """
+        Feed a chunk of payloads of one device to the live parser.
+
+        Hook used by `_replay_stream`, overridden by the models inheriting the
+        mixin with the parser of their payloads; by default nothing is replayed.
+
+        Args:
+            device (recordset): The `zkteco.device.setting` the payloads come from.
+            payloads (list): [(stamp, payload text)] in stamp order.
+
+        Returns:
+            int: Number of records created.
+        """
+        return 0
 
 
 class DeviceStampLog(models.Model):
@@ -17,20 +303,20 @@ class DeviceStampLog(models.Model):
     biometric attendance device, including:
     - The device reference
     - The timestamp of the sync
-    - The raw log text returned
+    - The raw log text returned, stored compressed
     - The last processed stamp (used for incremental syncs)
     """
     _name = 'device.stamp.logs'
+    _inherit = 'zkteco.raw.payload.mixin'
 
     name = fields.Char(string='Stamp Name')
 
     log_date = fields.Datetime(
         string='Log Date',
-        default=lambda self: datetime.now()
+        default=lambda self: datetime.now(),
+        index=True
     )
 
-    log_text = fields.Text("Log Text")
-
     device_id = fields.Many2one(
         'zkteco.device.setting',
         string='Biometric Attendance Device',
@@ -39,11 +325,19 @@ class DeviceStampLog(models.Model):
 
     stamp = fields.Integer("Stamp")
 
+    @api.model
+    def _replay_chunk(self, device, payloads):
+        lines = []
+        for _stamp, payload in payloads:
+            lines.extend(payload.splitlines())
+        return device._create_attendance_log_lines(lines)
 
-class DeviceOperationStampLogs(models.Model):
 
+class DeviceOperationStampLogs(models.Model):
 
     _name = 'device.operation.stamplogs'
+    _inherit = 'zkteco.raw.payload.mixin'
+    _stamp_field = 'opStamp'
 
     name = fields.Char(
         string='Log Title',
@@ -52,12 +346,9 @@ class DeviceOperationStampLogs(models.Model):
     log_date = fields.Datetime(
         string='Log Timestamp',
         default=lambda self: datetime.now(),
+        index=True,
         help='The date and time when the log entry was created.'
     )
-    log_text = fields.Text(
-        string='Log Details',
-        help='Detailed description or notes regarding this log entry.'
-    )
     device_id = fields.Many2one(
         'zkteco.device.setting',
         string='Biometric Device',
@@ -69,3 +360,9 @@ class DeviceOperationStampLogs(models.Model):
         help='Numerical stamp value representing the operation performed.'
     )
 
+    @api.model
+    def _replay_chunk(self, device, payloads):
+        created = 0
+        for stamp, payload in payloads:
+            created += device.action_process_operation_payload(payload, stamp)
+        return created
@@ -5,12 +5,15 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError
 
 from odoo import models, fields, _
 from odoo.exceptions import UserError
 
+# resource.calendar.attendance fields read by `resource.calendar._get_weekday_index`
+CALENDAR_INDEX_FIELDS = {'calendar_id', 'dayofweek', 'day_period', 'hour_from', 'hour_to'}
+
 
 class HrEmployee(models.Model):
     _inherit = 'hr.employee'
@@ -30,6 +33,78 @@ class HrEmployee(models.Model):
 
 
 
+    @api.model
+    def _sync_device_pin_sequence(self):
+        """
+        Move the device PIN sequence past every PIN in use or reserved.
+
+        PINs come from device user ids and from commands not yet acknowledged.
+        A single aggregate query is used; nothing is loaded in Python.
+        """
+        self.env.cr.execute("""
+            SELECT GREATEST(
+                (SELECT MAX(zkteco_device_attend_id::bigint)
+                   FROM zkteco_attendance_machine
+                  WHERE zkteco_device_attend_id ~ '^[0-9]{1,18}$'),
+                (SELECT MAX(pin) FROM zkteco_dcmmand WHERE status != 'success')
+            )
+        """)
+        max_pin = self.env.cr.fetchone()[0] or 0
+        sequence = self.env.ref('dps_zkteco_biometric_integration.seq_zkteco_device_pin', raise_if_not_found=False)
+        if sequence and sequence.sudo().number_next_actual <= max_pin:
+            sequence.sudo().number_next = max_pin + 1
+
+    @api.model
+    def _next_device_pin(self):
+        """
+        Reserve the next free device PIN.
+
+        The PIN is drawn from a PostgreSQL-backed sequence, so it is never handed
+        out twice even to concurrent transactions. If a device user was imported
+        with a higher id in the meantime, the sequence is resynchronized once.
+
+        Returns:
+            int: The reserved PIN.
+        """
+        sequence_model = self.env['ir.sequence'].sudo()
+        device_user_model = self.env['zkteco.attendance.machine'].sudo()
+        pin = int(sequence_model.next_by_code('zkteco.device.pin'))
+        if device_user_model.search_count([('zkteco_device_attend_id', '=', str(pin))], limit=1):
+            self._sync_device_pin_sequence()
+            pin = int(sequence_model.next_by_code('zkteco.device.pin'))
+        return pin
+
+    @api.model
+    def _next_device_pins(self, count):
+        """
+        Reserve `count` device PINs at once.
+
+        Same guarantees as `_next_device_pin`, with one `nextval` query for all
+        the PINs and one lookup of the device users already holding them.
+
+        Returns:
+            list: The reserved PINs, in increasing order.
+        """
+        if count <= 0:
+            return []
+        sequence = self.env.ref('dps_zkteco_biometric_integration.seq_zkteco_device_pin',
+                                raise_if_not_found=False)
+        if not sequence or sequence.implementation != 'standard':
+            return [self._next_device_pin() for _index in range(count)]
+        sequence = sequence.sudo()
+
+        def draw_pins():
+            self.env.cr.execute("SELECT nextval(%s) FROM generate_series(1, %s)",
+                                ('ir_sequence_%03d' % sequence.id, count))
+            return sorted(pin for pin, in self.env.cr.fetchall())
+
+        pins = draw_pins()
+        if self.env['zkteco.attendance.machine'].sudo().search_count(
+                [('zkteco_device_attend_id', 'in', [str(pin) for pin in pins])], limit=1):
+            self._sync_device_pin_sequence()
+            pins = draw_pins()
+        return pins
+
     def create_export_command(self, device_id):
 
         existing_command = self.env['zkteco.dcmmand'].sudo().search([
@@ -41,13 +116,7 @@ class HrEmployee(models.Model):
         if existing_command:
             raise UserError(_("A pending 'DATA' command already exists for this employee on this device."))
 
-        all_zketco_duser_ids = self.env['zkteco.attendance.machine'].sudo().search([]).mapped('zkteco_device_attend_id')
-        int_user_ids_list = [int(uid) for uid in all_zketco_duser_ids]
-
-        pending_pin_list = self.env['zkteco.dcmmand'].search([('status', '!=', 'success')]).mapped('pin')
-
-        combined_pin_list = int_user_ids_list + pending_pin_list
-        next_pin = max(combined_pin_list) + 1 if combined_pin_list else 1
+        next_pin = self._next_device_pin()
 
         command = self.env['zkteco.dcmmand'].sudo().create({
             'name': 'DATA',
@@ -137,6 +206,7 @@ class ZktecoAttendanceMachine(models.Model):
     zkteco_device_attend_id = fields.Char(
         string='Device User ID',
         required=True,
+        index=True,
         help='Unique user ID on the ZKTeco attendance device.'
     )
     device_id = fields.Many2one(
@@ -167,3 +237,62 @@ class ResourceCalendarInherit(models.Model):
         store=True,
         help='Total working hours defined for this resource calendar.'
     )
+
+    @tools.ormcache('self.id')
+    def _get_weekday_index(self):
+        """
+        Index the attendance lines of the calendar by weekday.
+
+        Cached in the ORM cache, which is cleared whenever calendar attendance
+        lines are created or deleted, or one of `CALENDAR_INDEX_FIELDS` is
+        written. The result must not be modified.
+
+        Returns:
+            dict: {dayofweek: (total duration hours, ((lunch hour_from, lunch hour_to), ...))}
+        """
+        self.ensure_one()
+        index = {}
+        for line in self.attendance_ids:
+            hours, lunches = index.get(line.dayofweek, (0.0, ()))
+            if line.day_period == 'lunch':
+                lunches += ((line.hour_from, line.hour_to),)
+            index[line.dayofweek] = (hours + line.duration_hours, lunches)
+        return index
+
+    def _get_day_working_hours(self, dayofweek):
+        """Total duration in hours of the calendar lines of a weekday ('0' is Monday)."""
+        if not self:
+            return 0.0
+        return self._get_weekday_index().get(dayofweek, (0.0, ()))[0]
+
+    def _get_lunch_intervals(self, daysofweek):
+        """Lunch (hour_from, hour_to) intervals of the calendar on the given weekdays."""
+        if not self:
+            return []
+        index = self._get_weekday_index()
+        return [lunch for day in set(daysofweek) for lunch in index.get(day, (0.0, ()))[1]]
+
+
+class ResourceCalendarAttendanceInherit(models.Model):
+    """Keep the weekday index of the calendars in sync with their attendance lines."""
+    _inherit = 'resource.calendar.attendance'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        if records:
+            self.env.registry.clear_cache()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if self and not CALENDAR_INDEX_FIELDS.isdisjoint(vals):
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        has_lines = bool(self)
+        res = super().unlink()
+        if has_lines:
+            self.env.registry.clear_cache()
+        return res
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+"""
+In-memory calendar of employee leave lines.
+
+Built from one query by `employee.leave.line._get_leave_calendar` for a set of
+employees and a date range, it answers (employee, date) lookups in constant
+time for the attendance calculation and the attendance reports.
+"""
+
+from collections import namedtuple
+
+LeaveDay = namedtuple('LeaveDay', ['leave_type', 'paid', 'start', 'end'])
+
+
+class LeaveCalendar:
+    """
+    Leave lines indexed by (employee id, date).
+
+    When several lines exist for the same employee and date, the first one by
+    id wins, like the first match of `employee.leave_line_ids`.
+    """
+
+    def __init__(self, rows=()):
+        self._days = {}
+        for row in rows:
+            self._days.setdefault((row['employee_id'][0], row['date']), LeaveDay(
+                row['leave_type'], row['paid_medical_leave'], row['att_start_date'], row['att_end_date']))
+
+    def get(self, employee_id, date):
+        """
+        Return the leave of an employee on a date.
+
+        Returns:
+            LeaveDay: (leave_type, paid, start, end), or None without leave line.
+        """
+        return self._days.get((employee_id, date))
+
+    def leave_type(self, employee_id, date):
+        """Leave type of an employee on a date, 'none' without leave line."""
+        leave = self._days.get((employee_id, date))
+        return leave.leave_type if leave else 'none'
@@ -15,6 +15,8 @@ class ResConfigSettingsInherit(models.TransientModel):
     Provides:
     - Minimal Attendance: Enables a mode where attendance records are stored in minimal form.
     - Multiple Shift: Allows multiple shift handling for employees.
+    - ADMS Command Batch: Caps how many commands (and bytes) a device receives per poll.
+    - Raw Log Retention: Number of days raw device payloads are kept.
     """
     _inherit = 'res.config.settings'
 
@@ -29,3 +31,33 @@ class ResConfigSettingsInherit(models.TransientModel):
         string='User Minimal Attendance',
         config_parameter='dps_zkteco_biometric_integration.minimal_attendance'
     )
+
+    attendance_calculation_batch_size = fields.Integer(
+        string='Employees per Calculation Batch',
+        default=500,
+        config_parameter='dps_zkteco_biometric_integration.attendance_calculation_batch_size',
+        help='Number of employees whose pending punches are calculated and committed together by the '
+             'attendance calculation cron.'
+    )
+
+    adms_command_batch_size = fields.Integer(
+        string='Max Commands per Poll',
+        default=200,
+        config_parameter='dps_zkteco_biometric_integration.adms_command_batch_size',
+        help='Maximum number of pending commands sent to an ADMS device in one /iclock/getrequest response.'
+    )
+
+    adms_command_batch_bytes = fields.Integer(
+        string='Max Bytes per Poll',
+        default=32768,
+        config_parameter='dps_zkteco_biometric_integration.adms_command_batch_bytes',
+        help='Maximum size in bytes of one /iclock/getrequest response. '
+             'A single command larger than this is still sent on its own.'
+    )
+
+    raw_log_retention_days = fields.Integer(
+        string='Raw Log Retention (Days)',
+        default=90,
+        config_parameter='dps_zkteco_biometric_integration.raw_log_retention_days',
+        help='Raw payloads posted by ADMS devices older than this are pruned. 0 keeps them forever.'
+    )
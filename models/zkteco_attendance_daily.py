@@ -0,0 +1,359 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+from datetime import datetime, time, timedelta
+
+from pytz import timezone, UTC
+
+from odoo import api, fields, models, tools
+
+from .leave_calendar import LeaveCalendar
+
+# Arrival after / departure before these times, in the timezone of the employee
+LATE_ARRIVAL_TIME = time(9, 0)
+EARLY_LEAVE_TIME = time(19, 0)
+
+# hr.attendance fields feeding the daily summary, a write on any of them refreshes it
+ATTENDANCE_DAILY_FIELDS = {'employee_id', 'check_in', 'check_out', 'validated_overtime_hours', 'overtime_status'}
+# employee.leave.line fields feeding the daily summary
+LEAVE_DAILY_FIELDS = {'employee_id', 'date', 'leave_type', 'paid_medical_leave', 'att_start_date', 'att_end_date'}
+
+# Employees refreshed per chunk when the whole table is rebuilt
+ATTENDANCE_DAILY_REBUILD_BATCH = 500
+
+
+class ZktecoAttendanceDaily(models.Model):
+    """
+    Stored attendance summary of an employee for one day.
+
+    One row per (employee, day) with an attendance or a leave line; days are
+    the date of the check in in the timezone of the employee (of its working
+    calendar when the employee has none), like leave lines. Rows are
+    refreshed at the end of every transaction that creates, changes or deletes
+    attendances or leave lines, so the dashboard and the reports read daily
+    figures with one indexed query instead of recomputing them.
+    """
+    _name = 'zkteco.attendance.daily'
+    _description = 'ZKTeco Daily Attendance Summary'
+    _log_access = False
+    _order = 'date desc, employee_id'
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Employee',
+        required=True,
+        ondelete='cascade',
+        help='Employee the day belongs to.'
+    )
+    company_id = fields.Many2one(
+        'res.company',
+        string='Company',
+        index=True,
+        help='Company of the employee.'
+    )
+    date = fields.Date(
+        string='Day',
+        required=True,
+        index=True,
+        help='Day summarised, the date of the check in in the timezone of the employee.'
+    )
+    check_in = fields.Datetime(
+        string='First Check In',
+        help='Earliest check in of the day.'
+    )
+    check_out = fields.Datetime(
+        string='Last Check Out',
+        help='Latest check out of the attendances of the day.'
+    )
+    attendance_count = fields.Integer(
+        string='Attendances',
+        help='Number of attendances checked in on the day; 0 when the day only has a leave line.'
+    )
+    worked_hours = fields.Float(
+        string='Worked Hours',
+        help='Sum of the worked hours of the attendances of the day.'
+    )
+    break_time = fields.Float(
+        string='Break Time',
+        help='Sum of the break time of the attendances of the day.'
+    )
+    shortfall = fields.Float(
+        string='Shortfall Hours',
+        help='Sum of the shortfall of the attendances of the day.'
+    )
+    overtime_hours = fields.Float(
+        string='Overtime Hours',
+        help='Sum of the positive validated overtime of the attendances of the day.'
+    )
+    is_late = fields.Boolean(
+        string='Late Arrival',
+        help='The first check in is after the late arrival time.'
+    )
+    is_early_leave = fields.Boolean(
+        string='Early Leaving',
+        help='The last check out is before the early leave time of the day.'
+    )
+    leave_type = fields.Selection([
+        ('none', 'None'),
+        ('holiday', 'Holiday'),
+        ('medical', 'Medical Leave'),
+        ('vacation', 'Vacation'),
+    ], string='Leave Type', default='none', required=True,
+        help='Leave line of the employee on the day, if any.')
+    paid_leave = fields.Boolean(
+        string='Paid Leave',
+        help='The leave line of the day is a paid medical leave.'
+    )
+    leave_start = fields.Datetime(
+        string='Leave Start',
+        help='Start of the leave line of the day, for partial medical leaves.'
+    )
+    leave_end = fields.Datetime(
+        string='Leave End',
+        help='End of the leave line of the day, for partial medical leaves.'
+    )
+
+    _sql_constraints = [
+        ('employee_date_uniq', 'unique(employee_id, date)', 'An employee can only have one summary per day.'),
+    ]
+
+    def init(self):
+        # Company dashboards and monthly reports scan a date range of one company
+        tools.create_index(self._cr, 'zkteco_attendance_daily_company_date_index',
+                           self._table, ['company_id', 'date'])
+
+    @api.model
+    def _schedule_refresh(self, pairs):
+        """
+        Queue (employee id, day) pairs to refresh when the transaction commits.
+
+        Pairs of the whole transaction are refreshed together, once, right
+        before the commit.
+
+        Args:
+            pairs (iterable): (employee id, date) tuples.
+        """
+        pairs = {(employee_id, day) for employee_id, day in pairs if employee_id and day}
+        if not pairs:
+            return
+        pending = self.env.cr.precommit.data.setdefault(self._name, set())
+        if not pending:
+            self.env.cr.precommit.add(self._refresh_pending)
+        pending.update(pairs)
+
+    def _refresh_pending(self):
+        """Refresh the pairs queued by `_schedule_refresh` in this transaction."""
+        pairs = self.env.cr.precommit.data.pop(self._name, set())
+        if pairs:
+            self.sudo()._refresh(pairs)
+            self.flush_model()
+
+    @api.model
+    def _employee_timezones(self, employees):
+        """
+        Return the timezone days are counted in for each employee.
+
+        The timezone of the employee, else the one of its working calendar,
+        else UTC.
+
+        Returns:
+            dict: {employee id: tzinfo}
+        """
+        return {
+            employee.id: timezone(employee.tz or employee.resource_calendar_id.tz or 'UTC')
+            for employee in employees
+        }
+
+    @api.model
+    def _local_datetime(self, value, tz):
+        """Convert a naive UTC datetime to a naive datetime in `tz`."""
+        return value.replace(tzinfo=UTC).astimezone(tz).replace(tzinfo=None)
+
+    @api.model
+    def _attendance_pairs(self, attendances):
+        """Return the (employee id, local day) pairs of `hr.attendance` records."""
+        attendances = attendances.filtered(lambda att: att.employee_id and att.check_in)
+        timezones = self._employee_timezones(attendances.employee_id)
+        return {
+            (att.employee_id.id, self._local_datetime(att.check_in, timezones[att.employee_id.id]).date())
+            for att in attendances
+        }
+
+    @api.model
+    def _refresh(self, pairs):
+        """
+        Recompute the summaries of (employee id, day) pairs from the attendances and leave lines.
+
+        Attendances, leave lines and existing summaries are each read with one
+        query over the employees and days covered; summaries are then created,
+        updated or deleted to match.
+
+        Args:
+            pairs (iterable): (employee id, date) tuples.
+        """
+        pairs = {(employee_id, day) for employee_id, day in pairs if employee_id and day}
+        if not pairs:
+            return
+        employee_ids = sorted({employee_id for employee_id, day in pairs})
+        date_from = min(day for employee_id, day in pairs)
+        date_to = max(day for employee_id, day in pairs)
+
+        # Local days straddle two UTC dates: read one more day on each side
+        attendances = self.env['hr.attendance'].search_read([
+            ('employee_id', 'in', employee_ids),
+            ('check_in', '>=', datetime.combine(date_from - timedelta(days=1), time.min)),
+            ('check_in', '<', datetime.combine(date_to + timedelta(days=2), time.min)),
+        ], ['employee_id', 'check_in', 'check_out', 'worked_hours', 'break_time', 'shortfall',
+            'validated_overtime_hours'], order='check_in')
+        leave_calendar = self.env['employee.leave.line']._get_leave_calendar(employee_ids, date_from, date_to)
+        employees = self.env['hr.employee'].with_context(active_test=False).browse(employee_ids)
+        companies = {employee.id: employee.company_id.id for employee in employees}
+        timezones = self._employee_timezones(employees)
+
+        days = {}
+        for att in attendances:
+            employee_id = att['employee_id'][0]
+            key = (employee_id, self._local_datetime(att['check_in'], timezones[employee_id]).date())
+            if key not in pairs:
+                continue
+            day = days.get(key)
+            if day is None:
+                day = days[key] = {
+                    'check_in': att['check_in'], 'check_out': False, 'attendance_count': 0,
+                    'worked_hours': 0.0, 'break_time': 0.0, 'shortfall': 0.0, 'overtime_hours': 0.0,
+                }
+            day['attendance_count'] += 1
+            if att['check_out'] and (not day['check_out'] or att['check_out'] > day['check_out']):
+                day['check_out'] = att['check_out']
+            day['worked_hours'] += att['worked_hours'] or 0.0
+            day['break_time'] += att['break_time'] or 0.0
+            day['shortfall'] += att['shortfall'] or 0.0
+            day['overtime_hours'] += max(att['validated_overtime_hours'] or 0.0, 0.0)
+
+        for employee_id, date in pairs:
+            day = days.get((employee_id, date))
+            leave = leave_calendar.get(employee_id, date)
+            if day is None:
+                if not leave:
+                    continue
+                day = days[(employee_id, date)] = {
+                    'check_in': False, 'check_out': False, 'attendance_count': 0,
+                    'worked_hours': 0.0, 'break_time': 0.0, 'shortfall': 0.0, 'overtime_hours': 0.0,
+                }
+            tz = timezones[employee_id]
+            day.update({
+                'company_id': companies.get(employee_id) or False,
+                'is_late': bool(day['check_in'])
+                and self._local_datetime(day['check_in'], tz).time() > LATE_ARRIVAL_TIME,
+                'is_early_leave': bool(day['check_out'])
+                and self._local_datetime(day['check_out'], tz) < datetime.combine(date, EARLY_LEAVE_TIME),
+                'leave_type': leave.leave_type if leave else 'none',
+                'paid_leave': bool(leave and leave.paid),
+                'leave_start': leave.start if leave and leave.start else False,
+                'leave_end': leave.end if leave and leave.end else False,
+            })
+
+        summary_fields = ['employee_id', 'date', 'company_id', 'check_in', 'check_out', 'attendance_count',
+                          'worked_hours', 'break_time', 'shortfall', 'overtime_hours', 'is_late',
+                          'is_early_leave', 'leave_type', 'paid_leave', 'leave_start', 'leave_end']
+        existing = self.search([
+            ('employee_id', 'in', employee_ids),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+        ]).read(summary_fields, load=None)
+        stale_ids = []
+        for summary in existing:
+            key = (summary['employee_id'], summary['date'])
+            if key not in pairs:
+                continue
+            values = days.pop(key, None)
+            if values is None:
+                stale_ids.append(summary['id'])
+                continue
+            changed = {name: value for name, value in values.items() if summary[name] != value}
+            if changed:
+                self.browse(summary['id']).write(changed)
+        self.browse(stale_ids).unlink()
+        self.create([dict(values, employee_id=employee_id, date=date) for (employee_id, date), values in days.items()])
+
+    @api.model
+    def _rebuild(self):
+        """
+        Recompute every summary from the existing attendances and leave lines.
+
+        Used to fill the table on install and upgrade; employees are processed
+        in chunks to bound the memory used.
+        """
+        self.env.flush_all()
+        self.env.cr.execute("""
+            SELECT att.employee_id,
+                   (att.check_in AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(resource.tz, calendar.tz, 'UTC'))::date
+              FROM hr_attendance att
+              JOIN hr_employee employee ON employee.id = att.employee_id
+              JOIN resource_resource resource ON resource.id = employee.resource_id
+         LEFT JOIN resource_calendar calendar ON calendar.id = employee.resource_calendar_id
+             WHERE att.check_in IS NOT NULL
+             UNION
+            SELECT employee_id, date FROM employee_leave_line WHERE employee_id IS NOT NULL AND date IS NOT NULL
+        """)
+        pairs_by_employee = {}
+        for employee_id, day in self.env.cr.fetchall():
+            pairs_by_employee.setdefault(employee_id, set()).add((employee_id, day))
+        self.search([]).unlink()
+        employee_ids = sorted(pairs_by_employee)
+        for start in range(0, len(employee_ids), ATTENDANCE_DAILY_REBUILD_BATCH):
+            chunk = employee_ids[start:start + ATTENDANCE_DAILY_REBUILD_BATCH]
+            self._refresh(pair for employee_id in chunk for pair in pairs_by_employee[employee_id])
+            self.flush_model()
+            self.env.invalidate_all()
+
+    @api.model
+    def _get_employee_ids(self, domain):
+        """
+        Return the ids of the employees having a summary matching `domain`, latest first.
+
+        Args:
+            domain (list): Domain on the summaries.
+
+        Returns:
+            list: hr.employee ids, without duplicates.
+        """
+        groups = self._read_group(domain, ['employee_id'], ['date:max'], order='date:max desc')
+        return [employee.id for employee, last_date in groups]
+
+    @api.model
+    def _get_leave_calendar(self, employee_ids, date_from, date_to):
+        """
+        Load the leaves of employees over a date range from the summaries.
+
+        Same result as `employee.leave.line._get_leave_calendar`, read from the
+        summaries of the days with a leave.
+
+        Args:
+            employee_ids (iterable): hr.employee ids
+            date_from (date): First day, included
+            date_to (date): Last day, included
+
+        Returns:
+            LeaveCalendar: O(1) lookups by (employee id, date)
+        """
+        employee_ids = list(employee_ids)
+        if not employee_ids or not date_from or not date_to:
+            return LeaveCalendar()
+        return LeaveCalendar({
+            'employee_id': row['employee_id'],
+            'date': row['date'],
+            'leave_type': row['leave_type'],
+            'paid_medical_leave': row['paid_leave'],
+            'att_start_date': row['leave_start'],
+            'att_end_date': row['leave_end'],
+        } for row in self.search_read([
+            ('employee_id', 'in', employee_ids),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+            ('leave_type', '!=', 'none'),
+        ], ['employee_id', 'date', 'leave_type', 'paid_leave', 'leave_start', 'leave_end']))
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+from odoo import api, fields, models
+
+
+class ZktecoAttendanceDirtyDay(models.Model):
+    """
+    Queue of (employee, punch day) pairs whose attendance must be recomputed.
+
+    Days are marked when punches are stored and consumed by the multi-shift
+    attendance calculation, which only recomputes the queued days. The table
+    has no access columns and one row per pair, so marking the same day again
+    costs nothing.
+    """
+    _name = 'zkteco.attendance.dirty.day'
+    _description = 'ZKTeco Attendance Day to Recompute'
+    _log_access = False
+    _order = 'employee_id, date'
+
+    employee_id = fields.Many2one(
+        'hr.employee',
+        string='Employee',
+        required=True,
+        ondelete='cascade',
+        help='Employee whose attendance must be recomputed.'
+    )
+    date = fields.Date(
+        string='Day',
+        required=True,
+        help='Punch day to recompute, as stored in the attendance punch date.'
+    )
+
+    _sql_constraints = [
+        ('employee_date_uniq', 'unique(employee_id, date)', 'A day can only be queued once per employee.'),
+    ]
+
+    @api.model
+    def _punch_day(self, punch_time):
+        """
+        Return the day a punch belongs to in the multi-shift calculation.
+
+        The calculation converts punches to the user timezone and back to UTC
+        before taking their date, so the day is the UTC date of the punch.
+        """
+        return punch_time.date()
+
+    @api.model
+    def _mark(self, pairs):
+        """
+        Queue (employee id, day) pairs, ignoring the ones already queued.
+
+        Args:
+            pairs (iterable): (employee id, date) tuples.
+
+        Returns:
+            int: Number of pairs added to the queue.
+        """
+        rows = {(employee_id, day) for employee_id, day in pairs if employee_id and day}
+        if not rows:
+            return 0
+        placeholders = ", ".join(["(%s, %s)"] * len(rows))
+        self.env.cr.execute(f"""
+            INSERT INTO zkteco_attendance_dirty_day (employee_id, date)
+            VALUES {placeholders}
+            ON CONFLICT (employee_id, date) DO NOTHING
+        """, [value for row in rows for value in row])
+        return self.env.cr.rowcount
+
+    @api.model
+    def _mark_logs(self, logs):
+        """Queue the punch days of `zkteco.device.logs` records when multiple shifts are enabled."""
+        if not self.env['hr.attendance']._get_multiple_shift_status():
+            return 0
+        return self._mark(
+            (log.employee_id.id, self._punch_day(log.user_punch_time))
+            for log in logs if log.employee_id and log.user_punch_time
+        )
+
+    @api.model
+    def _mark_pending_logs(self, employee_ids=None):
+        """
+        Queue the days of uncalculated punches that are not queued yet.
+
+        Covers punches stored before the queue existed and punches flagged
+        uncalculated again, e.g. when their attendance is deleted.
+        """
+        self.env['zkteco.device.logs'].flush_model(['employee_id', 'user_punch_time', 'user_punch_calculated'])
+        query = """
+            INSERT INTO zkteco_attendance_dirty_day (employee_id, date)
+            SELECT DISTINCT employee_id, user_punch_time::date
+              FROM zkteco_device_logs
+             WHERE user_punch_calculated IS NOT TRUE
+               AND employee_id IS NOT NULL
+               AND user_punch_time <= now() at time zone 'UTC'
+        """
+        params = []
+        if employee_ids is not None:
+            query += " AND employee_id = ANY(%s)"
+            params.append(list(employee_ids))
+        self.env.cr.execute(query + " ON CONFLICT (employee_id, date) DO NOTHING", params)
+        return self.env.cr.rowcount
@@ -5,7 +5,7 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
-from odoo import models, fields
+from odoo import api, models, fields, tools
 
 class DeviceCommand(models.Model):
     _name = 'zkteco.dcmmand'
@@ -21,5 +21,29 @@ class DeviceCommand(models.Model):
         ('failed', 'Failed'),
     ], string='Status', default='pending')
     pin = fields.Integer('PIN')
+    finger_id = fields.Integer('Finger')
+    template_id = fields.Many2one('zkteco.fingerprint.template', "Fingerprint Template", ondelete='set null')
     execution_log = fields.Text(string='Execution Log')
 
+    def init(self):
+        # /iclock/getrequest looks up the pending commands of one device on every poll
+        tools.create_index(self._cr, 'zkteco_dcmmand_device_id_status_index',
+                           self._table, ['device_id', 'status', 'id'])
+
+    @api.model
+    def _create_with_lines(self, vals_list, lines):
+        """
+        Create commands with one `create` and set their command lines.
+
+        Args:
+            vals_list (list): Values of the commands.
+            lines (list): Command line of each command, without the `C:<id>:`
+                header, which needs the id of the created command.
+
+        Returns:
+            recordset: The created commands.
+        """
+        commands = self.create(vals_list)
+        for command, line in zip(commands, lines):
+            command.execution_log = f"C:{command.id}:{line}"
+        return commands
@@ -5,8 +5,7 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
-from odoo import api, fields, models
-from odoo.exceptions import UserError, ValidationError
+from odoo import fields, models
 
 
 class ZKTecoDeviceEventLog(models.Model):
@@ -107,19 +106,7 @@ class ZKTecoDeviceEventLog(models.Model):
         help="Operation stamp number used for synchronization and ordering."
     )
 
-    @api.constrains('log_code', 'device_id')
-    def _check_unique_log_per_device(self):
-        """
-        Ensures that the same log code cannot be duplicated
-        for the same device. This avoids redundant log entries.
-        """
-        for log in self:
-            duplicate = self.search([
-                ('log_code', '=', log.log_code),
-                ('device_id', '=', log.device_id.id),
-                ('id', '!=', log.id)
-            ], limit=1)
-            if duplicate:
-                raise ValidationError(
-                    f"The log with code '{log.log_code}' already exists for the selected device."
-                )
+    _sql_constraints = [
+        ('unique_log_per_device', 'unique(device_id, log_code)',
+         'A log with this code already exists for the selected device.'),
+    ]
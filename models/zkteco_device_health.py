@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from odoo import api, fields, models
+from ..zk import ZK
+
+_logger = logging.getLogger(__name__)
+
+# Consecutive connection failures after which the breaker opens.
+BREAKER_FAILURE_THRESHOLD = 3
+# Seconds an open breaker waits before letting a trial request through.
+BREAKER_RESET_SECONDS = 300
+# Socket timeout used by the background probe (seconds).
+PROBE_TIMEOUT = 5
+PROBE_MAX_WORKERS = 8
+
+
+def _probe_device(target):
+    """
+    Try to open and close a session on a TCP device.
+
+    Runs inside a worker thread, so it must not touch the ORM.
+
+    Args:
+        target (tuple): (health_id, ip, port, password)
+
+    Returns:
+        tuple: (health_id, latency in ms or None, error message or None)
+    """
+    health_id, ip, port, password = target
+    zk = ZK(ip, port, timeout=PROBE_TIMEOUT, password=password)
+    started = time.monotonic()
+    try:
+        zk.connect()
+        latency_ms = (time.monotonic() - started) * 1000.0
+        zk.disconnect()
+        return health_id, latency_ms, None
+    except Exception as probe_exception:
+        return health_id, None, str(probe_exception) or probe_exception.__class__.__name__
+
+
+class ZktecoDeviceHealth(models.Model):
+    """
+    Persistent health record of a biometric device.
+
+    Each device has at most one record tracking its last successful and failed
+    connections, the consecutive failure count and the mean connection latency.
+    The record drives a circuit breaker:
+    - closed: the device answers, requests go through.
+    - open: the failure threshold was reached, requests fail fast.
+    - half_open: the cool-down expired, requests are let through on trial.
+    """
+    _name = 'zkteco.device.health'
+    _description = 'ZKTeco Device Health'
+    _rec_name = 'device_id'
+
+    device_id = fields.Many2one(
+        'zkteco.device.setting',
+        string='Device',
+        required=True,
+        index=True,
+        ondelete='cascade',
+        help='Biometric device this health record belongs to.'
+    )
+    breaker_state = fields.Selection(
+        [
+            ('closed', 'Closed'),
+            ('open', 'Open'),
+            ('half_open', 'Half-Open'),
+        ],
+        string='Breaker State',
+        default='closed',
+        required=True,
+        help='Closed: device reachable. Open: requests fail fast. Half-Open: trial requests allowed.'
+    )
+    last_success = fields.Datetime(
+        string='Last Success',
+        help='Last time a connection to the device succeeded.'
+    )
+    last_failure = fields.Datetime(
+        string='Last Failure',
+        help='Last time a connection to the device failed.'
+    )
+    opened_at = fields.Datetime(
+        string='Opened At',
+        help='Time the breaker was last opened.'
+    )
+    consecutive_failures = fields.Integer(
+        string='Consecutive Failures',
+        help='Number of failed connections since the last success.'
+    )
+    latency_samples = fields.Integer(
+        string='Latency Samples',
+        help='Number of successful connections included in the mean latency.'
+    )
+    mean_latency = fields.Float(
+        string='Mean Latency (ms)',
+        help='Running mean of the connection latency in milliseconds.'
+    )
+    last_error = fields.Char(
+        string='Last Error',
+        help='Error message of the last failed connection.'
+    )
+
+    _sql_constraints = [
+        ('device_uniq', 'unique(device_id)', 'A device can only have one health record.'),
+    ]
+
+    @api.model
+    def _get_for_device(self, device_id):
+        """Return the health record of the given device id, creating it when missing."""
+        health = self.search([('device_id', '=', device_id)], limit=1)
+        if not health:
+            health = self.create({'device_id': device_id})
+        return health
+
+    def _allows_request(self):
+        """
+        Tell whether a request may be sent to the device.
+
+        An open breaker whose cool-down has expired moves to half-open so the
+        next request acts as a trial.
+        """
+        self.ensure_one()
+        if self.breaker_state != 'open':
+            return True
+        reset_at = (self.opened_at or fields.Datetime.now()) + timedelta(seconds=BREAKER_RESET_SECONDS)
+        if fields.Datetime.now() >= reset_at:
+            self.breaker_state = 'half_open'
+            return True
+        return False
+
+    def _record_success(self, latency_ms):
+        now = fields.Datetime.now()
+        for health in self:
+            samples = health.latency_samples + 1
+            health.write({
+                'breaker_state': 'closed',
+                'last_success': now,
+                'opened_at': False,
+                'consecutive_failures': 0,
+                'latency_samples': samples,
+                'mean_latency': health.mean_latency + (latency_ms - health.mean_latency) / samples,
+                'last_error': False,
+            })
+
+    def _record_failure(self, error):
+        now = fields.Datetime.now()
+        for health in self:
+            failures = health.consecutive_failures + 1
+            vals = {
+                'last_failure': now,
+                'consecutive_failures': failures,
+                'last_error': (error or '')[:255],
+            }
+            if health.breaker_state == 'half_open' or failures >= BREAKER_FAILURE_THRESHOLD:
+                vals.update({'breaker_state': 'open', 'opened_at': now})
+            health.write(vals)
+
+    @api.model
+    def _cron_probe_device_health(self):
+        """
+        Probe every TCP device whose breaker is not closed and record the outcome.
+
+        Devices are probed concurrently with a short timeout; a device that
+        answers gets its breaker closed again.
+        """
+        healths = self.search([
+            ('breaker_state', '!=', 'closed'),
+            ('device_id.is_adms', '=', False),
+        ])
+        targets = [
+            (health.id, health.device_id.zkteco_device_ip_address,
+             health.device_id.port, health.device_id.zkteco_device_pass)
+            for health in healths if health.device_id.zkteco_device_ip_address
+        ]
+        if not targets:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(PROBE_MAX_WORKERS, len(targets))) as executor:
+            results = list(executor.map(_probe_device, targets))
+
+        for health_id, latency_ms, error in results:
+            health = self.browse(health_id)
+            if error is None:
+                health._record_success(latency_ms)
+            else:
+                health._record_failure(error)
+                _logger.info("Health probe failed for device %s: %s", health.device_id.name, error)
@@ -5,10 +5,59 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
-from odoo import api, fields, models, _
-from datetime import datetime
+import bisect
+from collections import defaultdict
+
+from markupsafe import Markup
+from odoo import api, fields, models, tools, _
+from datetime import datetime, timedelta
 from odoo.exceptions import UserError, ValidationError
-from convertdate import islamic
+from .leave_calendar import LeaveCalendar
+from .zkteco_attendance_daily import ATTENDANCE_DAILY_FIELDS, LEAVE_DAILY_FIELDS
+
+# Ramadan intervals of the Gregorian years first_year..last_year, built on demand:
+# (first_year, last_year, [start dates], [end dates]), sorted by start.
+_ramadan_table = (0, -1, [], [])
+
+
+def _build_ramadan_table(first_year, last_year):
+    """
+    Compute the Ramadan intervals covering Gregorian years first_year..last_year.
+
+    Returns:
+        tuple: (first_year, last_year, [start dates], [end dates])
+    """
+    from convertdate import islamic
+
+    starts, ends = [], []
+    hijri_year = islamic.from_gregorian(first_year - 1, 1, 1)[0]
+    last_hijri_year = islamic.from_gregorian(last_year + 1, 12, 31)[0]
+    for year in range(hijri_year, last_hijri_year + 1):
+        starts.append(datetime(*islamic.to_gregorian(year, 9, 1)).date())
+        ends.append(datetime(*islamic.to_gregorian(year, 10, 1)).date() - timedelta(days=1))
+    return first_year, last_year, starts, ends
+
+
+def is_ramadan_date(day):
+    """
+    Tell whether a Gregorian date (or datetime) falls in Ramadan.
+
+    The first lookup outside the years already covered rebuilds the interval
+    table for a range of years; lookups are then a bisect on the start dates.
+    """
+    global _ramadan_table
+    if not day:
+        return False
+    if isinstance(day, datetime):
+        day = day.date()
+    first_year, last_year, starts, ends = _ramadan_table
+    if not first_year <= day.year <= last_year:
+        if last_year < first_year:
+            first_year, last_year = day.year - 5, day.year + 5
+        _ramadan_table = _build_ramadan_table(min(first_year, day.year), max(last_year, day.year))
+        first_year, last_year, starts, ends = _ramadan_table
+    index = bisect.bisect_right(starts, day) - 1
+    return index >= 0 and day <= ends[index]
 
 
 class ZktecoDeviceLogs(models.Model):
@@ -86,6 +135,14 @@ class ZktecoDeviceLogs(models.Model):
         help="Status text representation captured from the device."
     )
 
+    def init(self):
+        # Dedup lookup of incoming and replayed punches
+        tools.create_index(self._cr, 'zkteco_device_logs_duser_timestamp_index',
+                           self._table, ['zketco_duser_id', 'timestamp'])
+        # Employees with pending punches, scanned batch by batch by the calculation cron
+        tools.create_index(self._cr, 'zkteco_device_logs_pending_employee_index',
+                           self._table, ['employee_id'], where='user_punch_calculated IS NOT TRUE')
+
     def unlink(self):
 
         already_processed_logs = self.filtered(lambda record: record.user_punch_calculated)
@@ -97,40 +154,42 @@ class ZktecoDeviceLogs(models.Model):
         return super(ZktecoDeviceLogs, self).unlink()
     
     # Customized by Tunn
-    @api.model
-    def create(self, vals):
+    @api.model_create_multi
+    def create(self, vals_list):
         """Khi có log mới, tự động tạo / cập nhật bản ghi hr.attendance."""
-        record = super().create(vals)
+        records = super().create(vals_list)
 
-        employee = record.employee_id
-        punch_time = record.user_punch_time
-
-        if not employee or not punch_time:
-            return record
-
-        # Tìm bản ghi chấm công gần nhất của nhân viên
         hr_attendance_model = self.env['hr.attendance']
-        last_attendance = hr_attendance_model.search([
-            ('employee_id', '=', employee.id)
-        ], order='check_in desc', limit=1)
-
-        if not last_attendance or last_attendance.check_out:
-            # Nếu chưa có hoặc đã check_out → tạo mới Check In
-            hr_attendance_model.create({
-                'employee_id': employee.id,
-                'check_in': punch_time
-            })
-            record.status = '0'  # Check In
-        else:
-            # Nếu có bản ghi check_in chưa có check_out
-            if punch_time > last_attendance.check_in:
-                last_attendance.write({'check_out': punch_time})
-                record.status = '1'  # Check Out
+        for record in records:
+            employee = record.employee_id
+            punch_time = record.user_punch_time
+
+            if not employee or not punch_time:
+                continue
+
+            # Tìm bản ghi chấm công gần nhất của nhân viên
+            last_attendance = hr_attendance_model.search([
+                ('employee_id', '=', employee.id)
+            ], order='check_in desc', limit=1)
+
+            if not last_attendance or last_attendance.check_out:
+                # Nếu chưa có hoặc đã check_out → tạo mới Check In
+                hr_attendance_model.create({
+                    'employee_id': employee.id,
+                    'check_in': punch_time
+                })
+                record.status = '0'  # Check In
             else:
-                # Nếu thời gian nhỏ hơn check_in gần nhất → bỏ qua (log cũ)
-                record.status = '2'
+                # Nếu có bản ghi check_in chưa có check_out
+                if punch_time > last_attendance.check_in:
+                    last_attendance.write({'check_out': punch_time})
+                    record.status = '1'  # Check Out
+                else:
+                    # Nếu thời gian nhỏ hơn check_in gần nhất → bỏ qua (log cũ)
+                    record.status = '2'
 
-        return record
+        self.env['zkteco.attendance.dirty.day'].sudo()._mark_logs(records)
+        return records
 
 
 class HrAttendance(models.Model):
@@ -157,11 +216,9 @@ class HrAttendance(models.Model):
     ], string="Leave Type", default='none', required=True)
 
     def is_in_ramadan(self, punch_date):
-        """Convert the Gregorian date to the Islamic (Hijri) calendar.
-        Check if the month is Ramadan (9th month in the Islamic calendar)"""
-        hijri_year, hijri_month, hijri_day = islamic.from_gregorian(
-            punch_date.year, punch_date.month, punch_date.day)
-        return hijri_month == 9
+        """Check if the date falls in Ramadan (9th month in the Islamic calendar),
+        using the cached table of Ramadan intervals."""
+        return is_ramadan_date(punch_date)
 
     def _get_employee_calendar(self):
         self.ensure_one()
@@ -176,9 +233,7 @@ class HrAttendance(models.Model):
             attendance.shortfall = False
             if attendance.worked_hours and attendance.employee_id:
                 calendar = attendance._get_employee_calendar()
-                working_hours = sum(calendar.attendance_ids.filtered(
-                    lambda x: x.dayofweek == str(attendance.check_in.weekday())
-                ).mapped('duration_hours'))
+                working_hours = calendar._get_day_working_hours(str(attendance.check_in.weekday()))
                 if working_hours > attendance.worked_hours:
                     attendance.shortfall = 2 * (working_hours - attendance.worked_hours)
 
@@ -218,27 +273,35 @@ class HrAttendance(models.Model):
     @api.depends()
     def _compute_multiple_shifts(self):
 
-        config_value = self.env['ir.config_parameter'].sudo().get_param(
-            'dps_zkteco_biometric_integration.multiple_shift'
-        )
-        is_multi_shift_enabled = config_value in ['True', 'true', '1']
+        is_multi_shift_enabled = self._get_multiple_shift_status()
         for rec in self:
             rec.is_multiple_shift = True if is_multi_shift_enabled else False
 
+    @tools.ormcache()
     def _get_multiple_shift_status(self):
+        """
+        Tell whether multiple shifts are enabled in the settings.
 
+        Cached in the ORM cache; saving the settings writes `ir.config_parameter`,
+        which clears that cache.
+        """
         config_value = self.env['ir.config_parameter'].sudo().get_param(
             'dps_zkteco_biometric_integration.multiple_shift'
         )
         return config_value in ['True', 'true', '1']
 
-    @api.model
-    def create(self, values):
+    @api.model_create_multi
+    def create(self, vals_list):
 
-        if 'is_multiple_shift' not in values:
-            values['is_multiple_shift'] = self._get_multiple_shift_status()
+        is_multiple_shift = self._get_multiple_shift_status()
+        for values in vals_list:
+            if 'is_multiple_shift' not in values:
+                values['is_multiple_shift'] = is_multiple_shift
         try:
-            return super(HrAttendance, self).create(values)
+            attendances = super(HrAttendance, self).create(vals_list)
+            daily = self.env['zkteco.attendance.daily']
+            daily._schedule_refresh(daily._attendance_pairs(attendances))
+            return attendances
         except Exception as e:
             # Raise a professional error message if record creation fails
             raise UserError(
@@ -247,10 +310,21 @@ class HrAttendance(models.Model):
 
     def write(self, values):
 
-        if 'is_multiple_shift' not in values:
-            values['is_multiple_shift'] = self._get_multiple_shift_status()
         try:
-            return super(HrAttendance, self).write(values)
+            daily = self.env['zkteco.attendance.daily']
+            refresh_daily = not ATTENDANCE_DAILY_FIELDS.isdisjoint(values)
+            if refresh_daily:
+                daily._schedule_refresh(daily._attendance_pairs(self))
+            res = super(HrAttendance, self).write(values)
+            if refresh_daily:
+                daily._schedule_refresh(daily._attendance_pairs(self))
+            if 'is_multiple_shift' not in values:
+                # Only touch the flag, and its dependents, on records where it is outdated
+                is_multiple_shift = self._get_multiple_shift_status()
+                outdated = self.filtered(lambda rec: rec.is_multiple_shift != is_multiple_shift)
+                if outdated:
+                    super(HrAttendance, outdated).write({'is_multiple_shift': is_multiple_shift})
+            return res
         except Exception as e:
             raise UserError(
                 f"Unable to update record(s). Reason: {str(e)}"
@@ -301,6 +375,8 @@ class HrAttendance(models.Model):
                 for log_entry in related_logs:
                     log_entry.user_punch_calculated = False
 
+            daily = self.env['zkteco.attendance.daily']
+            daily._schedule_refresh(daily._attendance_pairs(self))
             return super(HrAttendance, self).unlink()
 
         except (UserError, ValidationError) as e:
@@ -336,27 +412,75 @@ class EmployeeLeaveLine(models.Model):
 
     description = fields.Char(string="Description")
 
-    def _log_change_on_employee(self, message):
+    @api.model
+    def _get_leave_calendar(self, employee_ids, date_from, date_to):
+        """
+        Load the leave lines of employees over a date range into a `LeaveCalendar`.
+
+        Args:
+            employee_ids (iterable): hr.employee ids
+            date_from (date): First day, included
+            date_to (date): Last day, included
+
+        Returns:
+            LeaveCalendar: O(1) lookups by (employee id, date)
+        """
+        employee_ids = list(employee_ids)
+        if not employee_ids or not date_from or not date_to:
+            return LeaveCalendar()
+        return LeaveCalendar(self.search_read([
+            ('employee_id', 'in', employee_ids),
+            ('date', '>=', date_from),
+            ('date', '<=', date_to),
+        ], ['employee_id', 'date', 'leave_type', 'paid_medical_leave', 'att_start_date', 'att_end_date'],
+            order='id'))
+
+    def _log_changes_on_employees(self, icon, action):
+        """
+        Post one note per employee summarising the given leave lines.
+
+        A single line keeps the one-line message; several lines of the same
+        employee are listed in one message. All notes are created at once.
+
+        Args:
+            icon (str): Emoji prefixing the message.
+            action (str): 'created', 'updated' or 'removed'.
+        """
+        lines_by_employee = defaultdict(list)
         for rec in self:
             if rec.employee_id:
-                rec.employee_id.message_post(
-                    body=message,
-                    subtype_xmlid="mail.mt_note",
-                )
+                lines_by_employee[rec.employee_id.id].append(rec)
+        bodies = {}
+        for employee_id, lines in lines_by_employee.items():
+            entries = [f"{line.date} – {line.leave_type.capitalize()}" for line in sorted(lines, key=lambda l: l.date)]
+            if len(entries) == 1:
+                bodies[employee_id] = Markup("<br/>").join([f"{icon} Leave entry {action}: {entries[0]}"])
+            else:
+                bodies[employee_id] = Markup("<br/>").join([f"{icon} {len(entries)} leave entries {action}:"] + entries)
+        if bodies:
+            self.env['hr.employee'].browse(bodies)._message_log_batch(bodies=bodies, message_type='comment')
 
-    @api.model
-    def create(self, vals):
-        rec = super().create(vals)
-        rec._log_change_on_employee(f"➕ Leave entry created: {rec.date} – {rec.leave_type.capitalize()}")
-        return rec
+    def _schedule_daily_refresh(self):
+        """Refresh the daily attendance summaries of the days of these leave lines."""
+        self.env['zkteco.attendance.daily']._schedule_refresh((rec.employee_id.id, rec.date) for rec in self)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._log_changes_on_employees("➕", "created")
+        records._schedule_daily_refresh()
+        return records
 
     def write(self, vals):
+        if not LEAVE_DAILY_FIELDS.isdisjoint(vals):
+            self._schedule_daily_refresh()
         res = super().write(vals)
-        for rec in self:
-            rec._log_change_on_employee(f"✏️ Leave entry updated: {rec.date} – {rec.leave_type.capitalize()}")
+        self._log_changes_on_employees("✏️", "updated")
+        if not LEAVE_DAILY_FIELDS.isdisjoint(vals):
+            self._schedule_daily_refresh()
         return res
 
     def unlink(self):
-        for rec in self:
-            rec._log_change_on_employee(f"❌ Leave entry removed: {rec.date} – {rec.leave_type.capitalize()}")
+        self._log_changes_on_employees("❌", "removed")
+        self._schedule_daily_refresh()
         return super().unlink()
\ No newline at end of file
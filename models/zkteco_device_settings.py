@@ -6,16 +6,33 @@
 ########################################################
 
 import base64
+import functools
+import itertools
+import logging
+import mmap
+import os
+import time
 import unicodedata
 from odoo import api, fields, models, _
 from collections import defaultdict
 from odoo.addons.base.models.res_partner import _tz_get
 import pytz
 from datetime import datetime
-from ..zk import ZK
+from ..zk import ZK, attlog
 from odoo.exceptions import UserError, ValidationError
 import re
 
+_logger = logging.getLogger(__name__)
+
+# Records parsed and written per chunk by the attendance dump import.
+ATTLOG_IMPORT_CHUNK = 5000
+
+
+@functools.lru_cache(maxsize=None)
+def _get_timezone(tz_name):
+    """Return the pytz timezone for a name, resolved once per process."""
+    return pytz.timezone(tz_name or 'GMT')
+
 
 class ZktecoDeviceSetting(models.Model):
     """
@@ -46,6 +63,7 @@ class ZktecoDeviceSetting(models.Model):
         device_command_no_count: Computed number of device commands.
         state: Device connection state.
         zkteco_attendance_device_status_ids: Attendance state records for the device.
+        health_ids: Connection health record driving the device circuit breaker.
     """
 
     _name = 'zkteco.device.setting'
@@ -122,6 +140,12 @@ class ZktecoDeviceSetting(models.Model):
         help='Indicates whether the device supports ADMS.',
         tracking=True
     )
+    sync_remove_archived = fields.Boolean(
+        string='Remove Archived Employees',
+        help='When synchronizing employees, delete the device users of archived or deleted employees '
+             'and their device user mapping.',
+        tracking=True
+    )
     serial_number = fields.Char(
         string='Serial Number',
         help='Device serial number for identification.',
@@ -166,6 +190,11 @@ class ZktecoDeviceSetting(models.Model):
         help='Attendance state logs for the device.'
     )
 
+    health_ids = fields.One2many(
+        'zkteco.device.health', 'device_id', string="Health",
+        help='Connection health record of the device.'
+    )
+
 
     @api.onchange('password_configured')
     def onchange_password_configured(self):
@@ -194,16 +223,75 @@ class ZktecoDeviceSetting(models.Model):
                 _("Invalid Device Password: The password must contain only numeric characters.")
             )
 
-    def action_validate_zkteco_connection(self):
+    def _health_call(self, method, *args):
+        """
+        Run a `zkteco.device.health` method for this device in its own transaction.
+
+        The outcome is committed immediately so that it survives a rollback of the
+        calling action (a failed connection usually ends in a UserError).
+
+        Returns:
+            The method result, or None if the health registry could not be updated.
+        """
+        self.ensure_one()
+        try:
+            with self.env.registry.cursor() as health_cr:
+                health_env = self.env(cr=health_cr, su=True)
+                health = health_env['zkteco.device.health']._get_for_device(self.id)
+                return getattr(health, method)(*args)
+        except Exception as health_exception:
+            _logger.warning("Could not update health of device %s: %s", self.name, health_exception)
+            return None
+
+    def _is_reachable(self):
+        """
+        Return False when the circuit breaker of this TCP device is open.
+
+        ADMS devices connect to Odoo on their own and have no breaker, so they
+        are always reachable.
+        """
+        self.ensure_one()
+        if self.is_adms:
+            return True
+        return self._health_call('_allows_request') is not False
+
+    def _zk_connect(self, ignore_breaker=False):
+        """
+        Open a session on a TCP device, honouring its circuit breaker.
 
-        device_ip = self.zkteco_device_ip_address
-        device_port = self.port
-        device_password = self.zkteco_device_pass
+        The connection latency or the failure is recorded on the device health record.
 
-        zk_device = ZK(device_ip, device_port, password=device_password)
+        Args:
+            ignore_breaker (bool): Try to connect even if the breaker is open.
 
+        Returns:
+            ZK: The connected ZK instance.
+
+        Raises:
+            UserError: When the breaker is open.
+            Exception: Whatever the ZK library raised while connecting.
+        """
+        self.ensure_one()
+        if not ignore_breaker and not self._is_reachable():
+            raise UserError(_(
+                "Device '%s' is marked unreachable after repeated connection failures. "
+                "It will be retried automatically once the health probe reaches it again."
+            ) % self.name)
+
+        zk_device = ZK(self.zkteco_device_ip_address, self.port, password=self.zkteco_device_pass)
+        started = time.monotonic()
         try:
-            connection_result = zk_device.connect()
+            zk_device.connect()
+        except Exception as connection_exception:
+            self._health_call('_record_failure', str(connection_exception))
+            raise
+        self._health_call('_record_success', (time.monotonic() - started) * 1000.0)
+        return zk_device
+
+    def action_validate_zkteco_connection(self):
+
+        try:
+            connection_result = self._zk_connect(ignore_breaker=True)
             if connection_result:
                 raise UserError(_("ZKTeco Device connection established successfully."))
             else:
@@ -238,116 +326,278 @@ class ZktecoDeviceSetting(models.Model):
 
         return text
 
-    def action_synchronize_employees(self):
+    def _prepare_employee_sync_snapshot(self):
+        """
+        Load the Odoo side of the employee-to-device synchronization.
 
-        max_uid = 0
-        next_user_id_str = '1'
-        uid_list = []
-        device_user_id_list = []
+        Two queries cover every device in `self`: one for the active employees and
+        one for the `zkteco.attendance.machine` mapping of the devices.
 
-        all_employees = self.env['hr.employee'].search([])
+        Returns:
+            tuple: (employees, mappings_by_device)
+                employees (dict): {employee_id: name} of the active employees.
+                mappings_by_device (dict): {device_id: [mapping dict, ...]}.
+        """
+        employees = {
+            employee['id']: employee['name'] or ''
+            for employee in self.env['hr.employee'].search_read([], ['name'], order='id')
+        }
+        mappings_by_device = defaultdict(list)
+        for mapping in self.env['zkteco.attendance.machine'].search_read(
+                [('device_id', 'in', self.ids)],
+                ['device_id', 'employee_id', 'zkteco_device_attend_id', 'zkteco_device_username']):
+            mappings_by_device[mapping['device_id'][0]].append(mapping)
+        return employees, mappings_by_device
+
+    def _compute_employee_sync_diff(self, employees, mappings, device_users=None):
+        """
+        Compare the active employees with what is known about this device.
+
+        Args:
+            employees (dict): {employee_id: name} of the active employees.
+            mappings (list): `zkteco.attendance.machine` rows of this device.
+            device_users (dict or None): {user_id: User} read from a TCP device.
+                None for ADMS devices, whose users are only known through the mapping.
+
+        Returns:
+            dict:
+                add: [employee_id] employees without a user on the device.
+                restore: [(mapping, employee_id)] mapped users missing on the device (TCP only).
+                rename: [(mapping, employee_id)] users whose name differs from the employee;
+                    ADMS users without a known device username are left alone.
+                delete: [mapping] users linked to archived or deleted employees, only
+                    when `sync_remove_archived` is set on the device.
+        """
+        self.ensure_one()
+        diff = {'add': [], 'restore': [], 'rename': [], 'delete': []}
+        mapped_employee_ids = set()
+
+        for mapping in mappings:
+            employee_id = mapping['employee_id'] and mapping['employee_id'][0]
+            if not employee_id:
+                continue
+            if employee_id not in employees:
+                if self.sync_remove_archived:
+                    diff['delete'].append(mapping)
+                continue
+            mapped_employee_ids.add(employee_id)
+
+            if device_users is None:
+                # An empty username means the name on the device is unknown, not different
+                if mapping['zkteco_device_username'] and mapping['zkteco_device_username'] != employees[employee_id]:
+                    diff['rename'].append((mapping, employee_id))
+                continue
+
+            device_user = device_users.get(mapping['zkteco_device_attend_id'])
+            if not device_user:
+                diff['restore'].append((mapping, employee_id))
+            elif not device_user.name or not self._clean_username(employees[employee_id]).startswith(device_user.name):
+                # Devices truncate names to their field width, so a prefix match is in sync.
+                diff['rename'].append((mapping, employee_id))
 
-        device_ip = self.zkteco_device_ip_address
-        device_port = self.port
-        device_password = self.zkteco_device_pass
+        diff['add'] = [employee_id for employee_id in employees if employee_id not in mapped_employee_ids]
+        return diff
 
-        zk_device = ZK(device_ip, device_port, password=device_password)
+    def _apply_employee_sync_diff_tcp(self, zk_device, diff, employees, mappings, device_users, preferred_user_ids):
+        """
+        Push a computed diff to a connected TCP device and mirror it in Odoo.
+
+        Device writes happen over the given session; the Odoo mapping is updated
+        with one create, one unlink and the minimal set of name writes.
+
+        Args:
+            zk_device (ZK): Connected session on this device.
+            diff (dict): Result of `_compute_employee_sync_diff`.
+            employees (dict): {employee_id: name} of the active employees.
+            mappings (list): `zkteco.attendance.machine` rows of this device.
+            device_users (dict): {user_id: User} read from the device.
+            preferred_user_ids (dict): {employee_id: user_id} already used for the
+                employee on another device, reused when free on this one.
+        """
+        self.ensure_one()
+        mapping_model = self.env['zkteco.attendance.machine']
+        taken_user_ids = set(device_users) | {mapping['zkteco_device_attend_id'] for mapping in mappings}
+        numeric_ids = [int(user_id) for user_id in taken_user_ids if user_id and user_id.isdigit()]
+        next_user_id = max(numeric_ids, default=0) + 1
+        next_uid = max((user.uid for user in device_users.values()), default=0) + 1
 
+        zk_device.disable_device()
         try:
-            connection_result = zk_device.connect()
-            if not connection_result:
-                raise ValidationError(_("Failed to establish connection with the ZKTeco device."))
+            new_mappings = []
+            for employee_id in diff['add']:
+                user_id = preferred_user_ids.get(employee_id)
+                if not user_id or user_id in taken_user_ids:
+                    while str(next_user_id) in taken_user_ids:
+                        next_user_id += 1
+                    user_id = str(next_user_id)
+                taken_user_ids.add(user_id)
+                clean_name = self._clean_username(employees[employee_id])
+                zk_device.set_user(next_uid, clean_name, 0, '', '', user_id)
+                next_uid += 1
+                new_mappings.append({
+                    'employee_id': employee_id,
+                    'zkteco_device_attend_id': user_id,
+                    'device_id': self.id,
+                    'zkteco_device_username': clean_name,
+                })
 
-            existing_users = zk_device.get_users()
-            print("USERS", existing_users)
-
-            def generate_next_user_id(current_user_id):
-
-                pattern = r'(\d+)'
-
-                def increment(match):
-                    number = match.group(0)
-                    incremented_number = str(int(number) + 1)
-                    return incremented_number
-
-                return re.sub(pattern, increment, current_user_id)
-
-            if existing_users:
-                for user in existing_users:
-                    uid_list.append(user.uid)
-                    device_user_id_list.append(user.user_id)
-
-                uid_list.sort()
-                device_user_id_list.sort()
-                max_uid = uid_list[-1]
-                next_user_id_str = str(generate_next_user_id(device_user_id_list[-1]))
-
-                attempt_counter = 2
-                while True:
-                    if next_user_id_str in device_user_id_list:
-                        next_user_id_str = str(generate_next_user_id(device_user_id_list[-1 * attempt_counter]))
-                        attempt_counter += 1
-                    else:
-                        for emp_index in range(len(all_employees)):
-                            test_user_id = generate_next_user_id(next_user_id_str)
-                            if test_user_id in device_user_id_list:
-                                next_user_id_str = test_user_id
-                                continue
-                        break
-
-            for employee in all_employees:
-                biometric_device_record = employee.biometric_device_ids.search([
-                    ('employee_id', '=', employee.id),
-                    ('device_id', '=', self.id)
-                ])
-
-                if not biometric_device_record:
-                    max_uid += 1
-                    employee.biometric_device_ids = [(0, 0, {
-                        'employee_id': employee.id,
-                        'zkteco_device_attend_id': next_user_id_str,
-                        'device_id': self.id,
-                    })]
-
-                    # Customized By Tunn
-                    clean_name = self._clean_username(employee.name)
-                    zk_device.set_user(
-                        max_uid,
-                        clean_name,
-                        0,
-                        '',
-                        '',
-                        str(next_user_id_str)
-                    )
-
-                    next_user_id_str = generate_next_user_id(next_user_id_str)
-
-            return {
-                'name': 'Success Message',
-                'type': 'ir.actions.act_window',
-                'res_model': 'employee.sync.wizard',
-                'view_mode': 'form',
-                'view_type': 'form',
-                'target': 'new'
-            }
+            for mapping, employee_id in diff['restore']:
+                clean_name = self._clean_username(employees[employee_id])
+                zk_device.set_user(next_uid, clean_name, 0, '', '', mapping['zkteco_device_attend_id'])
+                next_uid += 1
+
+            renamed = {}
+            for mapping, employee_id in diff['rename']:
+                clean_name = self._clean_username(employees[employee_id])
+                device_user = device_users[mapping['zkteco_device_attend_id']]
+                zk_device.set_user(device_user.uid, clean_name, device_user.privilege, device_user.password,
+                                   device_user.group_id, device_user.user_id, device_user.card)
+                renamed[mapping['id']] = clean_name
+
+            for mapping in diff['delete']:
+                device_user = device_users.get(mapping['zkteco_device_attend_id'])
+                if device_user:
+                    zk_device.delete_user(uid=device_user.uid)
+        finally:
+            zk_device.enable_device()
+
+        if new_mappings:
+            mapping_model.create(new_mappings)
+        if diff['delete']:
+            mapping_model.browse([mapping['id'] for mapping in diff['delete']]).unlink()
+        for mapping_id, username in renamed.items():
+            mapping_model.browse(mapping_id).zkteco_device_username = username
+
+    def _apply_employee_sync_diff_adms(self, diff):
+        """
+        Queue ADMS commands for a computed diff.
 
+        Employees that already have a pending command of the same kind on this
+        device are skipped, so repeated syncs never raise on duplicates. The
+        commands of the whole diff are created with a single `create`, with PINs
+        of new device users reserved at once.
+        """
+        self.ensure_one()
+        pending = {
+            (command['employee_id'][0], command['name'])
+            for command in self.env['zkteco.dcmmand'].search_read([
+                ('device_id', '=', self.id),
+                ('status', '=', 'pending'),
+                ('employee_id', '!=', False),
+            ], ['employee_id', 'name'])
+        }
+        employee_model = self.env['hr.employee'].with_context(active_test=False)
+        vals_list = []
+        lines = []
+
+        to_add = employee_model.browse([
+            employee_id for employee_id in diff['add'] if (employee_id, 'DATA') not in pending
+        ])
+        for employee, pin in zip(to_add, employee_model._next_device_pins(len(to_add))):
+            card_number = employee.barcode if employee.barcode else "0000000000"
+            vals_list.append({'name': 'DATA', 'device_id': self.id, 'employee_id': employee.id,
+                              'status': 'pending', 'pin': pin})
+            lines.append(f"DATA USER PIN={pin} Name={employee.name} Pri=0 Passwd= Card=[{card_number}] "
+                         f"Grp=1 TZ=0000000000000000\n")
+
+        renamed = employee_model.browse([employee_id for _mapping, employee_id in diff['rename']])
+        names = dict(zip(renamed.ids, renamed.mapped('name')))
+        for mapping, employee_id in diff['rename']:
+            if (employee_id, 'UPDATE') in pending:
+                continue
+            pending.add((employee_id, 'UPDATE'))
+            pin = mapping['zkteco_device_attend_id']
+            vals_list.append({'name': 'UPDATE', 'device_id': self.id, 'employee_id': employee_id,
+                              'status': 'pending', 'pin': pin})
+            lines.append(f"DATA USER PIN={pin} Name={names[employee_id]} \n")
+
+        for mapping in diff['delete']:
+            employee_id = mapping['employee_id'][0]
+            if (employee_id, 'DEL') in pending:
+                continue
+            pending.add((employee_id, 'DEL'))
+            pin = mapping['zkteco_device_attend_id']
+            vals_list.append({'name': 'DEL', 'device_id': self.id, 'employee_id': employee_id,
+                              'status': 'pending', 'pin': pin})
+            lines.append(f"DATA DEL_USER PIN={pin} \n")
+
+        if vals_list:
+            self.env['zkteco.dcmmand'].sudo()._create_with_lines(vals_list, lines)
+
+    def _sync_employees_to_devices(self, raise_on_error=False):
+        """
+        Synchronize all active employees to the devices in `self`.
+
+        One snapshot of the employees and of the device mapping is taken for all
+        devices; each TCP device is read once with `get_users()` and written over
+        a single session, each ADMS device gets its commands queued.
+
+        Args:
+            raise_on_error (bool): Raise on the first failing device instead of
+                logging it and moving on to the next one.
+
+        Returns:
+            dict: {device_id: {'add': n, 'restore': n, 'rename': n, 'delete': n}}
+        """
+        employees, mappings_by_device = self._prepare_employee_sync_snapshot()
+
+        preferred_user_ids = {}
+        for mappings in mappings_by_device.values():
+            for mapping in mappings:
+                if mapping['employee_id']:
+                    preferred_user_ids.setdefault(mapping['employee_id'][0], mapping['zkteco_device_attend_id'])
+
+        stats = {}
+        for device in self:
+            mappings = mappings_by_device.get(device.id, [])
+            try:
+                if device.is_adms:
+                    diff = device._compute_employee_sync_diff(employees, mappings)
+                    device._apply_employee_sync_diff_adms(diff)
+                else:
+                    zk_device = device._zk_connect()
+                    try:
+                        device_users = {user.user_id: user for user in zk_device.get_users()}
+                        diff = device._compute_employee_sync_diff(employees, mappings, device_users)
+                        device._apply_employee_sync_diff_tcp(
+                            zk_device, diff, employees, mappings, device_users, preferred_user_ids)
+                    finally:
+                        zk_device.disconnect()
+            except Exception as sync_exception:
+                if raise_on_error:
+                    raise
+                _logger.warning("Employee synchronization failed for device %s: %s", device.name, sync_exception)
+                continue
+
+            stats[device.id] = {key: len(values) for key, values in diff.items()}
+            _logger.info("Employee synchronization of device %s: %s", device.name, stats[device.id])
+        return stats
+
+    def action_synchronize_employees(self):
+
+        try:
+            self._sync_employees_to_devices(raise_on_error=True)
         except Exception as sync_exception:
             raise UserError(_(
                 f"An unexpected error occurred during employee synchronization: {sync_exception}"
             ))
 
+        return {
+            'name': 'Success Message',
+            'type': 'ir.actions.act_window',
+            'res_model': 'employee.sync.wizard',
+            'view_mode': 'form',
+            'view_type': 'form',
+            'target': 'new'
+        }
+
     def action_pull_attendance_logs(self):
 
         attendance_model = self.env['zkteco.device.logs']
 
-        device_ip = self.zkteco_device_ip_address
-        device_port = self.port
-        device_password = self.zkteco_device_pass
-        zk = ZK(device_ip, device_port, password=device_password)
-
         try:
-            connection = zk.connect()
-            if connection:
+            zk = self._zk_connect()
+            if zk:
                 raw_attendance_records = zk.get_attendance()
                 print("Retrieved attendance records:", raw_attendance_records)
                 device_name = self.name
@@ -454,9 +704,10 @@ class ZktecoDeviceSetting(models.Model):
         zkteco_devices = self.env["zkteco.device.setting"].search([])
 
         for zkteco_device in zkteco_devices:
+            if not zkteco_device.is_adms:
+                continue
             try:
-                if zkteco_device.is_adms:
-                    zkteco_device.action_pull_attendance_logs()
+                zkteco_device.action_pull_attendance_logs()
             except UserError as ue:
                 raise UserError(
                     _(f"Failed to fetch attendance logs for device '{zkteco_device.name}': {ue}")
@@ -525,28 +776,93 @@ class ZktecoDeviceSetting(models.Model):
             'context': dict(self.env.context, default_device_id=self.id),
         }
 
+    def _get_device_timezone(self):
+        """Return the pytz timezone of the device, falling back to GMT."""
+        self.ensure_one()
+        return _get_timezone(self.time_zone or 'GMT')
+
     def create_oplog(self, log_values, op_stamp):
 
-        combined_datetime = datetime.strptime(f"{log_values[3]} {log_values[4]}", "%Y-%m-%d %H:%M:%S")
+        return self.create_oplogs([log_values], op_stamp)
+
+    def create_oplogs(self, log_lines, op_stamp):
+        """
+        Insert a batch of OPLOG lines as `zkteco.device.event.log` records.
+
+        Device local times are converted to UTC with the device timezone. All rows
+        are written with one multi-row INSERT; rows already stored for the same
+        (device, log code) are skipped by the unique constraint.
+
+        Args:
+            log_lines (list): OPLOG lines already split on whitespace.
+            op_stamp (str): OpStamp reported by the device for this upload.
 
-        local_timezone = pytz.timezone('Asia/Kolkata')
-        localized_datetime = local_timezone.localize(combined_datetime)
+        Returns:
+            int: Number of rows inserted.
+        """
+        self.ensure_one()
+        event_log_model = self.env['zkteco.device.event.log'].sudo()
+        local_timezone = self._get_device_timezone()
+        valid_codes = dict(event_log_model._fields['description'].selection)
+        op_stamp = int(op_stamp) if op_stamp and str(op_stamp).isdigit() else 0
+        uid = self.env.uid
+
+        rows = []
+        for log_values in log_lines:
+            try:
+                combined_datetime = datetime.strptime(f"{log_values[3]} {log_values[4]}", "%Y-%m-%d %H:%M:%S")
+                utc_datetime = local_timezone.localize(combined_datetime).astimezone(pytz.utc).replace(tzinfo=None)
+                rows.append((
+                    self.id, log_values[1],
+                    log_values[1] if log_values[1] in valid_codes else None,
+                    log_values[2], utc_datetime, log_values[5], log_values[6],
+                    log_values[7], log_values[8], op_stamp, uid, uid,
+                ))
+            except (IndexError, ValueError) as e:
+                _logger.warning("Skipping malformed OPLOG line from device %s: %s", self.name, e)
+
+        if not rows:
+            return 0
+
+        event_log_model.flush_model()
+        placeholders = ", ".join(
+            ["(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, now() at time zone 'UTC', now() at time zone 'UTC')"] * len(rows)
+        )
+        self.env.cr.execute(f"""
+            INSERT INTO zkteco_device_event_log
+                (device_id, log_code, description, operator, op_time, value_1, value_2,
+                 value_3, reserved, "opStamp", create_uid, write_uid, create_date, write_date)
+            VALUES {placeholders}
+            ON CONFLICT (device_id, log_code) DO NOTHING
+        """, [value for row in rows for value in row])
+        return self.env.cr.rowcount
+
+    def action_process_operation_payload(self, raw_data, op_stamp):
+        """
+        Parse an OPERLOG body and store its operation logs, device users and fingerprints.
 
-        utc_datetime = localized_datetime.astimezone(pytz.utc)
-        formatted_utc_datetime = utc_datetime.strftime('%Y-%m-%d %H:%M:%S')
+        Args:
+            raw_data (str): Body posted by the device.
+            op_stamp (str): OpStamp reported by the device for this upload.
 
-        self.env['zkteco.device.event.log'].sudo().create({
-            'device_id': self.id,
-            'log_code': log_values[1],
-            'description': log_values[1],
-            'operator': log_values[2],
-            'op_time': formatted_utc_datetime,
-            'value_1': log_values[5],
-            'value_2': log_values[6],
-            'value_3': log_values[7],
-            'reserved': log_values[8],
-            'opStamp': op_stamp,
-        })
+        Returns:
+            int: Number of operation logs inserted.
+        """
+        self.ensure_one()
+        oplog_lines = []
+        for line in raw_data.strip().split('\n'):
+            if line.startswith("OPLOG"):
+                oplog_lines.append(line.split())
+            elif line.startswith("FP"):
+                values = line.split()
+                self.action_create_device_user_fingerprint(values)
+            elif line.startswith("USER"):
+                values = line.split()
+                self.action_create_employee_device_user(values)
+
+        if oplog_lines:
+            return self.create_oplogs(oplog_lines, op_stamp)
+        return 0
 
     def action_create_employee_device_user(self, raw_values):
 
@@ -571,81 +887,189 @@ class ZktecoDeviceSetting(models.Model):
 
     def action_create_device_zkteco_logs(self, raw_data):
 
-        for record_line in raw_data.splitlines():
+        return self._create_attendance_log_lines(raw_data.splitlines())
+
+    def _create_attendance_log_lines(self, lines):
+        """
+        Parse ATTLOG lines of this device and store the new punches.
+
+        Device users, punch states and already stored punches are looked up with
+        one query each; unknown device users are created in one call and new
+        punches in one create, in the order received. Punches already stored
+        for the same device user and timestamp are skipped, so feeding the
+        same lines again creates nothing.
+
+        Args:
+            lines (list): ATTLOG lines, e.g. "1\t2024-05-01 08:00:00\t0\t1\t0...".
+
+        Returns:
+            int: Number of `zkteco.device.logs` records created.
+        """
+        self.ensure_one()
+        parsed = []
+        for record_line in lines:
             line_values = record_line.split()
-            device_user_id = line_values[0]
-            punch_date = line_values[1]
-            punch_time = line_values[2]
-            punch_number = line_values[3]
-            punch_status_code = int(line_values[4])
-
-            # Customized by Tunn
-            # device_user_record = self.env['zkteco.attendance.machine'].sudo().search([
-            #     ('zkteco_device_attend_id', '=', device_user_id)
-            # ])
-            device_user_record = self.env['zkteco.attendance.machine'].sudo().search([
-                ('zkteco_device_attend_id', '=', device_user_id),
-                ('device_id', '=', self.id)
-            ], limit=1)
+            if not line_values:
+                continue
+            try:
+                local_datetime = datetime.strptime(f"{line_values[1]} {line_values[2]}", "%Y-%m-%d %H:%M:%S")
+                parsed.append((line_values[0], local_datetime, line_values[3], int(line_values[4])))
+            except (IndexError, ValueError) as e:
+                _logger.warning("Skipping malformed ATTLOG line from device %s: %s", self.name, e)
+        return self._create_attendance_log_records(parsed)
 
-            if not device_user_record:
-                device_user_record = self.env['zkteco.attendance.machine'].sudo().create({
-                    'zkteco_device_attend_id': device_user_id,
-                    'device_id': self.id
-                })
+    def _create_attendance_log_records(self, parsed):
+        """
+        Store parsed punches of this device, skipping the ones already stored.
 
-            local_datetime = datetime.strptime(f"{punch_date} {punch_time}", "%Y-%m-%d %H:%M:%S")
-            local_tz = pytz.timezone(self.time_zone)
-            localized_datetime = local_tz.localize(local_datetime)
-            utc_datetime = localized_datetime.astimezone(pytz.utc)
-            timestamp = local_datetime.timestamp()
-            formatted_utc_datetime = utc_datetime.strftime('%Y-%m-%d %H:%M:%S')
-
-            # Customized by Tunn
-            # existing_log = self.env['zkteco.device.logs'].sudo().search([
-            #     ('zketco_duser_id', '=', device_user_record.id),
-            #     ('timestamp', '=', timestamp)
-            # ])
-            existing_log = self.env['zkteco.device.logs'].sudo().search([
-                ('zketco_duser_id', '=', device_user_record.id),
-                ('timestamp', '=', timestamp)
-            ], limit=1)
-
-            state_record = self.env['zkteco.device.states'].search([
-                ('code', '=', punch_status_code),
-                ('device_id', '=', self.id)
-            ], limit=1)
+        Args:
+            parsed (list): [(device user id, local datetime, punch number, status code)]
 
-            if state_record:
-                if state_record.activity_type == 'check_in':
-                    punch_status = '0'
-                elif state_record.activity_type == 'check_out':
-                    punch_status = '1'
-                else:
-                    punch_status = '2'
+        Returns:
+            int: Number of `zkteco.device.logs` records created.
+        """
+        self.ensure_one()
+        if not parsed:
+            return 0
+        local_tz = self._get_device_timezone()
+
+        device_user_model = self.env['zkteco.attendance.machine'].sudo()
+        pins = {device_user_id for device_user_id, _dt, _number, _code in parsed}
+        users_by_pin = {}
+        for device_user in device_user_model.search([
+            ('zkteco_device_attend_id', 'in', list(pins)),
+            ('device_id', '=', self.id)
+        ], order='id desc'):
+            users_by_pin[device_user.zkteco_device_attend_id] = device_user
+        missing_pins = sorted(pins - set(users_by_pin))
+        if missing_pins:
+            for device_user in device_user_model.create([{
+                'zkteco_device_attend_id': pin,
+                'device_id': self.id
+            } for pin in missing_pins]):
+                users_by_pin[device_user.zkteco_device_attend_id] = device_user
+
+        activity_by_code = {}
+        for state in self.env['zkteco.device.states'].search_read(
+                [('device_id', '=', self.id)], ['code', 'activity_type'], order='id desc'):
+            activity_by_code[state['code']] = state['activity_type']
+
+        punch_rows = []
+        for device_user_id, local_datetime, punch_number, punch_status_code in parsed:
+            utc_datetime = local_tz.localize(local_datetime).astimezone(pytz.utc)
+            punch_rows.append((
+                users_by_pin[device_user_id].id, int(local_datetime.timestamp()),
+                utc_datetime.strftime('%Y-%m-%d %H:%M:%S'), punch_number, punch_status_code
+            ))
+
+        log_model = self.env['zkteco.device.logs'].sudo()
+        stored = {
+            (log['zketco_duser_id'][0], log['timestamp'])
+            for log in log_model.search_read([
+                ('zketco_duser_id', 'in', list({row[0] for row in punch_rows})),
+                ('timestamp', 'in', list({row[1] for row in punch_rows}))
+            ], ['zketco_duser_id', 'timestamp'])
+        }
+
+        vals_list = []
+        for device_user_id, timestamp, formatted_utc_datetime, punch_number, punch_status_code in punch_rows:
+            if (device_user_id, timestamp) in stored:
+                continue
+            stored.add((device_user_id, timestamp))
+            activity_type = activity_by_code.get(str(punch_status_code))
+            if activity_type == 'check_in':
+                punch_status = '0'
+            elif activity_type == 'check_out':
+                punch_status = '1'
             else:
                 punch_status = '2'
+            vals_list.append({
+                'zketco_duser_id': device_user_id,
+                'company_id': self.company_id.id,
+                'user_punch_time': formatted_utc_datetime,
+                'status_number': punch_status_code,
+                'number': punch_number,
+                'status': punch_status,
+                'device': self.name,
+                'timestamp': timestamp,
+            })
+        if vals_list:
+            log_model.create(vals_list)
+        return len(vals_list)
 
-            if not existing_log:
-                self.env['zkteco.device.logs'].sudo().create({
-                    'zketco_duser_id': device_user_record.id,
-                    'company_id': self.company_id.id,
-                    'user_punch_time': formatted_utc_datetime,
-                    'status_number': punch_status_code,
-                    'number': punch_number,
-                    'status': punch_status,
-                    'device': self.name,
-                    'timestamp': timestamp,
-                })
+    def _import_attlog_dump(self, file_path, layout='auto', chunk_records=ATTLOG_IMPORT_CHUNK, commit=False):
+        """
+        Import an attendance dump exported from this device (USB attlog file).
+
+        The file is memory-mapped and its records are parsed lazily with the
+        layouts understood by `ZK.get_attendance` (8/16/40 byte binary records)
+        or as ATTLOG text lines, then stored chunk by chunk through the same
+        writer as live ingestion, skipping punches already stored.
+
+        Args:
+            file_path (str): Path of the dump file.
+            layout (str): 'auto', 'text', '8', '16' or '40'.
+            chunk_records (int): Records written per chunk.
+            commit (bool): Commit after each chunk (command line imports).
+
+        Returns:
+            dict: {'records': n, 'created': n, 'seconds': s}
+        """
+        self.ensure_one()
+        started = time.monotonic()
+        report = {'records': 0, 'created': 0}
+        with open(file_path, 'rb') as dump_file:
+            if not os.fstat(dump_file.fileno()).st_size:
+                report['seconds'] = 0.0
+                return report
+            with mmap.mmap(dump_file.fileno(), 0, access=mmap.ACCESS_READ) as dump:
+                try:
+                    records = attlog.iter_records(dump, layout)
+                except ValueError as layout_error:
+                    raise UserError(_("Cannot read the attendance dump: %s", layout_error))
+                try:
+                    while True:
+                        chunk = list(itertools.islice(records, chunk_records))
+                        if not chunk:
+                            break
+                        report['records'] += len(chunk)
+                        report['created'] += self._create_attendance_log_records(chunk)
+                        if commit:
+                            self.env.cr.commit()
+                        self.env.invalidate_all()
+                        _logger.info("Attendance dump import for device %s: %s records read, %s created",
+                                     self.name, report['records'], report['created'])
+                finally:
+                    records.close()
+        report['seconds'] = time.monotonic() - started
+        return report
 
     def action_create_device_user_fingerprint(self, values):
+        """
+        Store an FP line pushed by the device in the fingerprint template store.
 
+        Templates are keyed by (device user, finger id). A template whose checksum
+        matches the stored one is skipped without any write; identical templates
+        pushed by other devices reuse the same stored blob.
 
-        user_device_id = values[1].split('=')[1]
-        fingerprint_template = values[5].split('=')[1]
+        Args:
+            values (list): FP line split on whitespace, e.g.
+                ['FP', 'PIN=1', 'FID=6', 'Size=1336', 'Valid=1', 'TMP=...'].
+        """
+        fp_values = dict(value.split('=', 1) for value in values[1:] if '=' in value)
+        user_device_id = fp_values.get('PIN')
+        fingerprint_template = fp_values.get('TMP')
+        if not user_device_id or not fingerprint_template:
+            return
+        finger_id = int(fp_values['FID']) if fp_values.get('FID', '').isdigit() else 0
+
+        padding_needed = len(fingerprint_template) % 4
+        if padding_needed:
+            fingerprint_template += '=' * (4 - padding_needed)
+        raw_template = base64.b64decode(fingerprint_template)
+        template_model = self.env['zkteco.fingerprint.template'].sudo()
+        checksum = template_model._compute_checksum(raw_template)
 
-        fixed_template = self._base64_fix_padding(fingerprint_template)
-        
         # Customized by Tunn
         # db_user_device = self.env['zkteco.attendance.machine'].sudo().search(
         #     [('zkteco_device_attend_id', '=', user_device_id)]
@@ -655,7 +1079,6 @@ class ZktecoDeviceSetting(models.Model):
             ('device_id', '=', self.id)
         ], limit=1)
 
-
         if not db_user_device:
             db_user_device = self.env['zkteco.attendance.machine'].sudo().create({
                 'zkteco_device_attend_id': user_device_id,
@@ -663,18 +1086,24 @@ class ZktecoDeviceSetting(models.Model):
             })
 
         existing_fp = self.env['zkteco.device.fingerprints'].sudo().search([
-            ('device_id', '=', self.id),
-            ('zketco_duser_id', '=', db_user_device.id)
-        ])
+            ('zketco_duser_id', '=', db_user_device.id),
+            ('finger_id', '=', finger_id)
+        ], limit=1)
 
+        if existing_fp.checksum == checksum:
+            return existing_fp
+
+        template = template_model._get_or_create(raw_template, checksum)
         if existing_fp:
-            existing_fp.template_data = fixed_template
+            existing_fp.template_id = template
         else:
-            self.env['zkteco.device.fingerprints'].sudo().create({
+            existing_fp = self.env['zkteco.device.fingerprints'].sudo().create({
                 'zketco_duser_id': db_user_device.id,
                 'device_id': self.id,
-                'template_data': fixed_template
+                'finger_id': finger_id,
+                'template_id': template.id
             })
+        return existing_fp
 ########################################################################################################################
 
     def _base64_fix_padding(self, encoded_string):
@@ -686,72 +1115,211 @@ class ZktecoDeviceSetting(models.Model):
         return base64.b64encode(decoded_data)
 
     def action_create_zkteco_device_user_commands(self):
+        """
+        Build the /iclock/getrequest response from the pending commands of this device.
 
-        pending_commands = self.env['zkteco.dcmmand'].sudo().search([
+        The oldest pending commands are sent first, capped by the configured maximum
+        number of commands and bytes per poll; the remainder waits for the next poll.
+        Sent commands, and empty ones met on the way, are marked as executed with
+        a single write.
+
+        Returns:
+            str: The concatenated command lines, or an empty string.
+        """
+        if not self:
+            return ""
+
+        get_param = self.env['ir.config_parameter'].sudo().get_param
+        max_commands = int(get_param('dps_zkteco_biometric_integration.adms_command_batch_size', 200) or 200)
+        max_bytes = int(get_param('dps_zkteco_biometric_integration.adms_command_batch_bytes', 32768) or 32768)
+
+        pending_commands = self.env['zkteco.dcmmand'].sudo().search_read([
             ('status', '=', 'pending'),
             ('device_id', '=', self.id)
-        ])
-        combined_log = ""
+        ], ['execution_log'], order='id', limit=max_commands)
+
+        command_lines = []
+        command_ids = []
+        response_size = 0
         for cmd in pending_commands:
-            combined_log += cmd.execution_log
-            cmd.status = 'executed'
-        return combined_log
+            if not cmd['execution_log']:
+                # Nothing to send: close it with the sent ones so it never holds a slot again
+                command_ids.append(cmd['id'])
+                continue
+            line_size = len(cmd['execution_log'].encode('utf-8'))
+            if command_lines and response_size + line_size > max_bytes:
+                break
+            command_lines.append(cmd['execution_log'])
+            command_ids.append(cmd['id'])
+            response_size += line_size
+
+        if command_ids:
+            self.env['zkteco.dcmmand'].sudo().browse(command_ids).write({'status': 'executed'})
+        return "".join(command_lines)
 
     def action_check_zkteco_device_command_revert_res(self, command_record_id):
 
         if not command_record_id:
             return
+        return self.action_process_zkteco_device_command_acks([command_record_id])
 
-        command_record = self.env['zkteco.dcmmand'].search([('id', '=', command_record_id)])
-        if not command_record:
-            return
-
-        if command_record.employee_id and command_record.name == "DATA":
-            log_values = command_record.execution_log.split()
-            device_user_id = log_values[2].split('=')[1]
-            device_user_name = log_values[3].split('=')[1]
-
-            device_user = self.env['zkteco.attendance.machine'].sudo().search([
-                ('zkteco_device_attend_id', '=', device_user_id),
-                ('device_id', '=', self.id)
-            ])
-
-            if not device_user:
-                device_user = self.env['zkteco.attendance.machine'].sudo().create({
-                    'zkteco_device_attend_id': device_user_id,
-                    'device_id': self.id,
-                    'zkteco_device_username': device_user_name,
-                    'employee_id': command_record.employee_id.id
-                })
-            else:
-                device_user.employee_id = command_record.employee_id
-                device_user.zkteco_device_username = command_record.employee_id.name
+    def action_process_zkteco_device_command_acks(self, command_record_ids):
+        """
+        Apply the acknowledgements posted by the device for a batch of commands.
 
-            command_record.status = 'success'
+        The referenced commands and device users are fetched with one query each.
+        Acknowledgements are replayed in command order to get the final state of
+        every device user PIN, which is then applied with set-based writes, one
+        multi-create and one unlink. All acknowledged commands are marked as
+        success with a single write.
 
-        elif command_record.employee_id and command_record.name == "DEL":
-            log_values = command_record.execution_log.split()
-            device_user_id = log_values[2].split('=')[1]
+        Args:
+            command_record_ids (list): Command ids reported by the device.
 
-            device_user = self.env['zkteco.attendance.machine'].sudo().search([
-                ('zkteco_device_attend_id', '=', device_user_id),
-                ('device_id', '=', self.id)
-            ])
-            device_user.unlink()
-            command_record.status = 'success'
+        Returns:
+            recordset: The acknowledged `zkteco.dcmmand` records.
+        """
+        command_model = self.env['zkteco.dcmmand'].sudo()
+        ids = {int(cmd_id) for cmd_id in command_record_ids if cmd_id and str(cmd_id).strip().isdigit()}
+        if not self or not ids:
+            return command_model
 
-        elif command_record.employee_id and command_record.name == "UPDATE":
-            device_user = self.env['zkteco.attendance.machine'].sudo().search([
-                ('zkteco_device_attend_id', '=', command_record.pin),
+        commands = command_model.search([
+            ('id', 'in', list(ids)),
+            ('device_id', '=', self.id)
+        ], order='id')
+
+        # pin -> ('upsert', employee, name) | ('rename', name) | ('delete',)
+        pin_actions = {}
+        replicated_templates = []
+        acknowledged = command_model
+        for command_record in commands:
+            if command_record.employee_id and command_record.name == "DATA":
+                log_values = command_record.execution_log.split()
+                device_user_id = log_values[2].split('=')[1]
+                device_user_name = log_values[3].split('=')[1]
+                pin_actions[device_user_id] = ('upsert', command_record.employee_id, device_user_name)
+
+            elif command_record.employee_id and command_record.name == "DEL":
+                log_values = command_record.execution_log.split()
+                device_user_id = log_values[2].split('=')[1]
+                pin_actions[device_user_id] = ('delete',)
+
+            elif command_record.employee_id and command_record.name == "UPDATE":
+                device_user_id = str(command_record.pin)
+                previous = pin_actions.get(device_user_id)
+                if previous and previous[0] == 'upsert':
+                    pin_actions[device_user_id] = ('upsert', previous[1], command_record.employee_id.name)
+                elif not previous or previous[0] != 'delete':
+                    pin_actions[device_user_id] = ('rename', command_record.employee_id.name)
+
+            elif command_record.employee_id and command_record.name == "FINGERTMP":
+                if command_record.template_id:
+                    replicated_templates.append(command_record)
+
+            elif command_record.name not in ["USERINFO", "CHECK"]:
+                continue
+
+            acknowledged |= command_record
+
+        if pin_actions:
+            device_user_model = self.env['zkteco.attendance.machine'].sudo()
+            device_users = device_user_model.search([
+                ('zkteco_device_attend_id', 'in', list(pin_actions)),
                 ('device_id', '=', self.id)
             ])
-            device_user.zkteco_device_username = command_record.employee_id.name
-            command_record.status = 'success'
+            users_by_pin = {}
+            for device_user in device_users:
+                users_by_pin[device_user.zkteco_device_attend_id] = \
+                    users_by_pin.get(device_user.zkteco_device_attend_id, device_user_model) | device_user
+
+            to_delete = device_user_model
+            to_create = []
+            grouped_writes = {}
+            for pin, action in pin_actions.items():
+                existing = users_by_pin.get(pin, device_user_model)
+                if action[0] == 'delete':
+                    to_delete |= existing
+                elif action[0] == 'upsert' and not existing:
+                    to_create.append({
+                        'zkteco_device_attend_id': pin,
+                        'device_id': self.id,
+                        'zkteco_device_username': action[2],
+                        'employee_id': action[1].id
+                    })
+                elif action[0] == 'upsert':
+                    key = (action[1].id, action[1].name)
+                    grouped_writes[key] = grouped_writes.get(key, device_user_model) | existing
+                elif existing:
+                    key = (None, action[1])
+                    grouped_writes[key] = grouped_writes.get(key, device_user_model) | existing
+
+            for (employee_id, username), records in grouped_writes.items():
+                vals = {'zkteco_device_username': username}
+                if employee_id:
+                    vals['employee_id'] = employee_id
+                records.write(vals)
+            if to_create:
+                device_user_model.create(to_create)
+            if to_delete:
+                to_delete.unlink()
+
+        if replicated_templates:
+            self._record_replicated_fingerprints(replicated_templates)
+
+        if acknowledged:
+            acknowledged.write({'status': 'success'})
+        return acknowledged
+
+    def _record_replicated_fingerprints(self, commands):
+        """
+        Mirror the templates acknowledged through FINGERTMP commands in `zkteco.device.fingerprints`.
 
-        elif command_record.name in ["USERINFO", "CHECK"]:
-            command_record.status = 'success'
+        Args:
+            commands (list): Acknowledged FINGERTMP `zkteco.dcmmand` records of this device.
+        """
+        device_users = self.env['zkteco.attendance.machine'].sudo().search([
+            ('zkteco_device_attend_id', 'in', [str(command.pin) for command in commands]),
+            ('device_id', '=', self.id)
+        ])
+        users_by_pin = {user.zkteco_device_attend_id: user for user in device_users}
+        fingerprint_model = self.env['zkteco.device.fingerprints'].sudo()
+        existing = {
+            (row['zketco_duser_id'][0], row['finger_id']): row['id']
+            for row in fingerprint_model.search_read([
+                ('zketco_duser_id', 'in', device_users.ids)
+            ], ['zketco_duser_id', 'finger_id'])
+        }
 
-        return command_record
+        to_create = {}
+        for command in commands:
+            device_user = users_by_pin.get(str(command.pin))
+            if not device_user:
+                continue
+            key = (device_user.id, command.finger_id)
+            if key in existing:
+                fingerprint_model.browse(existing[key]).template_id = command.template_id
+            else:
+                to_create[key] = {
+                    'zketco_duser_id': device_user.id,
+                    'device_id': self.id,
+                    'finger_id': command.finger_id,
+                    'template_id': command.template_id.id,
+                }
+        if to_create:
+            fingerprint_model.create(list(to_create.values()))
+
+    def action_replicate_fingerprints(self):
+        """Queue the replication of the stored fingerprint templates to the selected devices."""
+        self.env['zkteco.fingerprint.replication'].sudo()._enqueue(self)
+        return {
+            'name': _('Fingerprint Replication'),
+            'type': 'ir.actions.act_window',
+            'res_model': 'zkteco.fingerprint.replication',
+            'view_mode': 'list',
+            'domain': [('device_id', 'in', self.ids)],
+            'target': 'current',
+        }
 
     def action_export_device_employee(self):
 
@@ -795,61 +1363,5 @@ class ZktecoDeviceSetting(models.Model):
 
     def action_sync_employees_all_devices(self):
 
-
-        all_employees = self.env['hr.employee'].search([])
-        all_devices = self.search([])
-
-        for employee in all_employees:
-            for device in all_devices:
-
-                existing_record = self.env['zkteco.attendance.machine'].search([
-                    ('employee_id', '=', employee.id),
-                    ('device_id', '=', device.id),
-                ])
-
-                try:
-                    if not existing_record:
-                        if device.is_adms:
-                            employee.create_export_command(device)
-                        else:
-                            device_user_id = ''
-                            for line in employee.biometric_device_ids:
-                                device_user_id = line.zkteco_device_attend_id
-
-                            ip_address = device.zkteco_device_ip_address
-                            port_number = device.port
-                            device_password = device.zkteco_device_pass
-
-                            zk_connection = ZK(ip_address, port_number, password=device_password)
-                            connection = zk_connection.connect()
-
-                            if connection:
-                                device_users = zk_connection.get_users()
-
-                                already_exists = any(
-                                    user.user_id == device_user_id for user in device_users
-                                )
-
-                                if already_exists:
-                                    continue
-                                else:
-                                    if device_user_id:
-                                        zk_connection.set_user(
-                                            int(device_user_id),
-                                            employee.name,
-                                            0,  # Privilege
-                                            '', '',  # Empty password and card number
-                                            device_user_id
-                                        )
-                                    else:
-                                        employee.update_zkteco_device_emp()
-
-                                zk_connection.disconnect()
-                            else:
-                                raise ValidationError(
-                                    f"Failed to establish connection with the device {device.name} at {ip_address}:{port_number}."
-                                )
-                except Exception:
-                    continue
-
-
+        all_devices = self.search([]).filtered(lambda device: device.is_adms or device._is_reachable())
+        all_devices._sync_employees_to_devices()
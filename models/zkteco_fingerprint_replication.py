@@ -0,0 +1,364 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import base64
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from odoo import _, api, fields, models
+from odoo.exceptions import UserError
+from ..zk import ZK
+from ..zk.finger import Finger
+
+_logger = logging.getLogger(__name__)
+
+# Devices replicated at the same time by the cron.
+REPLICATION_MAX_WORKERS = 4
+# Socket timeout of the TCP replication sessions (seconds).
+REPLICATION_TIMEOUT = 30
+# Seconds between two progress updates while devices are being replicated.
+REPLICATION_PROGRESS_INTERVAL = 5
+# Running jobs started longer ago than this (seconds) were interrupted, e.g. by a
+# worker restart, and are failed so the device can be replicated again.
+REPLICATION_STALE_TIMEOUT = 3600
+
+
+def _push_templates(target, progress):
+    """
+    Upload missing fingerprint templates to a TCP device over one session.
+
+    Templates are grouped by device user and sent with one buffered
+    `save_user_template` upload per user. Runs inside a worker thread, so it
+    must not touch the ORM.
+
+    Args:
+        target (tuple): (job_id, ip, port, password, {user_id: [(fid, template bytes)]})
+        progress (dict): Shared {job_id: templates sent}, updated as users are written.
+
+    Returns:
+        tuple: (job_id, [(user_id, fid)] uploaded, [user_id] missing on the device,
+                error message or None)
+    """
+    job_id, ip, port, password, templates_by_user = target
+    uploaded = []
+    missing_users = []
+    zk_device = ZK(ip, port, timeout=REPLICATION_TIMEOUT, password=password)
+    try:
+        zk_device.connect()
+        try:
+            zk_device.disable_device()
+            device_users = {user.user_id: user for user in zk_device.get_users()}
+            for user_id, templates in templates_by_user.items():
+                user = device_users.get(user_id)
+                if not user:
+                    missing_users.append(user_id)
+                    continue
+                fingers = [Finger(user.uid, fid, 1, template) for fid, template in templates]
+                zk_device.save_user_template(user, fingers)
+                uploaded.extend((user_id, fid) for fid, _template in templates)
+                progress[job_id] = len(uploaded)
+        finally:
+            zk_device.enable_device()
+            zk_device.disconnect()
+    except Exception as push_exception:
+        return job_id, uploaded, missing_users, str(push_exception) or push_exception.__class__.__name__
+    return job_id, uploaded, missing_users, None
+
+
+class ZktecoFingerprintReplication(models.Model):
+    """
+    Replication of stored fingerprint templates to one target device.
+
+    A job computes which (device user, finger) templates the target is missing,
+    compared with what the other devices enrolled for the same employees, and
+    pushes them: buffered template uploads on TCP devices, queued
+    `DATA UPDATE FINGERTMP` commands on ADMS devices. Jobs are run by a cron,
+    several TCP devices at a time, and report their own progress.
+    """
+    _name = 'zkteco.fingerprint.replication'
+    _description = 'ZKTeco Fingerprint Replication'
+    _order = 'id desc'
+    _rec_name = 'device_id'
+
+    device_id = fields.Many2one(
+        'zkteco.device.setting',
+        string='Target Device',
+        required=True,
+        index=True,
+        ondelete='cascade',
+        help='Device receiving the missing fingerprint templates.'
+    )
+    state = fields.Selection(
+        [
+            ('pending', 'Pending'),
+            ('running', 'Running'),
+            ('done', 'Done'),
+            ('failed', 'Failed'),
+        ],
+        string='Status',
+        default='pending',
+        required=True,
+        index=True
+    )
+    total_count = fields.Integer(
+        string='Templates to Send',
+        help='Number of missing templates found for the device.'
+    )
+    sent_count = fields.Integer(
+        string='Templates Sent',
+        help='Number of templates uploaded (TCP) or queued (ADMS) so far.'
+    )
+    skipped_count = fields.Integer(
+        string='Templates Skipped',
+        help='Templates not sent because their user does not exist on the device.'
+    )
+    progress = fields.Float(
+        string='Progress',
+        compute='_compute_progress',
+        help='Percentage of the missing templates already sent.'
+    )
+    started_at = fields.Datetime(string='Started At')
+    finished_at = fields.Datetime(string='Finished At')
+    last_error = fields.Char(
+        string='Last Error',
+        help='Error that stopped the replication of this device.'
+    )
+
+    @api.depends('total_count', 'sent_count', 'skipped_count')
+    def _compute_progress(self):
+        for job in self:
+            if job.total_count:
+                job.progress = 100.0 * (job.sent_count + job.skipped_count) / job.total_count
+            else:
+                job.progress = 100.0 if job.state == 'done' else 0.0
+
+    @api.model
+    def _stale_cutoff(self):
+        """Start date before which a running job is considered interrupted."""
+        return fields.Datetime.now() - timedelta(seconds=REPLICATION_STALE_TIMEOUT)
+
+    @api.model
+    def _enqueue(self, devices):
+        """Create a pending job for each device that has none pending or running (and not stale)."""
+        busy_device_ids = set(self.search([
+            ('device_id', 'in', devices.ids),
+            '|',
+            ('state', '=', 'pending'),
+            '&', ('state', '=', 'running'), ('started_at', '>=', self._stale_cutoff()),
+        ]).device_id.ids)
+        jobs = self.create([
+            {'device_id': device.id} for device in devices if device.id not in busy_device_ids
+        ])
+        self.env.ref('dps_zkteco_biometric_integration.cron_run_fingerprint_replication')._trigger()
+        return jobs
+
+    def _compute_missing_templates(self):
+        """
+        List the templates the target device of this job is missing.
+
+        For every employee mapped on the target, the most recent template of each
+        finger enrolled on any other device is a candidate; fingers already
+        stored for the target, or already queued to it, are left out.
+
+        Returns:
+            list: [(device user record, finger id, template record)]
+        """
+        self.ensure_one()
+        device = self.device_id
+        fingerprint_model = self.env['zkteco.device.fingerprints'].sudo()
+
+        target_users = self.env['zkteco.attendance.machine'].sudo().search([
+            ('device_id', '=', device.id),
+            ('employee_id', '!=', False),
+        ])
+        users_by_employee = {user.employee_id.id: user for user in target_users}
+        if not users_by_employee:
+            return []
+
+        present = {
+            (row['employee_id'][0], row['finger_id'])
+            for row in fingerprint_model.search_read([
+                ('device_id', '=', device.id),
+                ('employee_id', 'in', list(users_by_employee)),
+            ], ['employee_id', 'finger_id'])
+        }
+        if device.is_adms:
+            employee_by_pin = {user.zkteco_device_attend_id: user.employee_id.id for user in target_users}
+            for command in self.env['zkteco.dcmmand'].sudo().search_read([
+                ('device_id', '=', device.id),
+                ('name', '=', 'FINGERTMP'),
+                ('status', 'in', ('pending', 'executed')),
+            ], ['pin', 'finger_id']):
+                employee_id = employee_by_pin.get(str(command['pin']))
+                if employee_id:
+                    present.add((employee_id, command['finger_id']))
+
+        missing = {}
+        for row in fingerprint_model.search_read([
+            ('device_id', '!=', device.id),
+            ('employee_id', 'in', list(users_by_employee)),
+            ('template_id', '!=', False),
+        ], ['employee_id', 'finger_id', 'template_id'], order='id desc'):
+            key = (row['employee_id'][0], row['finger_id'])
+            if key not in present and key not in missing:
+                missing[key] = row['template_id'][0]
+
+        template_model = self.env['zkteco.fingerprint.template'].sudo()
+        return [
+            (users_by_employee[employee_id], finger_id, template_model.browse(template_id))
+            for (employee_id, finger_id), template_id in missing.items()
+        ]
+
+    def _record_replicated(self, replicated):
+        """Mirror templates now present on the target device in `zkteco.device.fingerprints`."""
+        self.ensure_one()
+        if replicated:
+            self.env['zkteco.device.fingerprints'].sudo().create([{
+                'zketco_duser_id': device_user.id,
+                'device_id': self.device_id.id,
+                'finger_id': finger_id,
+                'template_id': template.id,
+            } for device_user, finger_id, template in replicated])
+
+    def _run_adms(self, missing):
+        """Queue one `DATA UPDATE FINGERTMP` command per missing template on an ADMS device."""
+        self.ensure_one()
+        command_model = self.env['zkteco.dcmmand'].sudo()
+        commands = command_model.create([{
+            'name': 'FINGERTMP',
+            'device_id': self.device_id.id,
+            'employee_id': device_user.employee_id.id,
+            'pin': int(device_user.zkteco_device_attend_id),
+            'finger_id': finger_id,
+            'template_id': template.id,
+            'status': 'pending',
+        } for device_user, finger_id, template in missing
+            if (device_user.zkteco_device_attend_id or '').isdigit()])
+        for command in commands:
+            template = command.template_id
+            command.execution_log = (
+                f"C:{command.id}:DATA UPDATE FINGERTMP PIN={command.pin}\tFID={command.finger_id}"
+                f"\tSize={len(template.template_data)}\tValid=1\tTMP={template.template_data.decode()}\n"
+            )
+        self.write({
+            'state': 'done',
+            'sent_count': len(commands),
+            'skipped_count': len(missing) - len(commands),
+            'finished_at': fields.Datetime.now(),
+        })
+
+    @api.model
+    def _fail_stale(self):
+        """Fail the running jobs started more than `REPLICATION_STALE_TIMEOUT` seconds ago."""
+        stale_jobs = self.search([
+            ('state', '=', 'running'),
+            '|', ('started_at', '=', False), ('started_at', '<', self._stale_cutoff()),
+        ])
+        if stale_jobs:
+            _logger.warning("Failing %s interrupted fingerprint replication jobs", len(stale_jobs))
+            stale_jobs.write({
+                'state': 'failed',
+                'finished_at': fields.Datetime.now(),
+                'last_error': _('Replication was interrupted before it finished.'),
+            })
+        return stale_jobs
+
+    @api.model
+    def _cron_run_fingerprint_replication(self):
+        """
+        Run the pending replication jobs.
+
+        Running jobs left over by an interrupted run are failed first. ADMS jobs
+        only queue commands and are handled in the cron transaction. TCP jobs
+        are pushed concurrently from worker threads; the cron commits the
+        progress of each device while the uploads are running, and records the
+        replicated templates once a device is done.
+        """
+        if self._fail_stale():
+            self.env.cr.commit()
+        jobs = self.search([('state', '=', 'pending')], order='id')
+        if not jobs:
+            return
+
+        plans = {}
+        for job in jobs:
+            job.write({'state': 'running', 'started_at': fields.Datetime.now(), 'last_error': False})
+            missing = job._compute_missing_templates()
+            job.total_count = len(missing)
+            if job.device_id.is_adms:
+                job._run_adms(missing)
+            elif not job.device_id.zkteco_device_ip_address or not job.device_id._is_reachable():
+                job.write({
+                    'state': 'failed',
+                    'finished_at': fields.Datetime.now(),
+                    'last_error': _('Device is not reachable.'),
+                })
+            elif not missing:
+                job.write({'state': 'done', 'finished_at': fields.Datetime.now()})
+            else:
+                plans[job.id] = missing
+        self.env.cr.commit()
+
+        if not plans:
+            return
+
+        targets = []
+        for job_id, missing in plans.items():
+            device = self.browse(job_id).device_id
+            templates_by_user = {}
+            for device_user, finger_id, template in missing:
+                templates_by_user.setdefault(device_user.zkteco_device_attend_id, []).append(
+                    (finger_id, base64.b64decode(template.template_data)))
+            targets.append((job_id, device.zkteco_device_ip_address, device.port,
+                            device.zkteco_device_pass, templates_by_user))
+
+        progress = {}
+        with ThreadPoolExecutor(max_workers=min(REPLICATION_MAX_WORKERS, len(targets))) as executor:
+            running = {executor.submit(_push_templates, target, progress) for target in targets}
+            while running:
+                finished, running = wait(running, timeout=REPLICATION_PROGRESS_INTERVAL,
+                                         return_when=FIRST_COMPLETED)
+                for job_id, sent in list(progress.items()):
+                    self.browse(job_id).sent_count = sent
+                for future in finished:
+                    self.browse(future.result()[0])._finish_tcp(plans, *future.result()[1:])
+                self.env.cr.commit()
+
+    def _finish_tcp(self, plans, uploaded, missing_users, error):
+        """Store the outcome of a TCP replication returned by a worker thread."""
+        self.ensure_one()
+        uploaded = set(uploaded)
+        missing_users = set(missing_users)
+        replicated = [
+            (device_user, finger_id, template)
+            for device_user, finger_id, template in plans[self.id]
+            if (device_user.zkteco_device_attend_id, finger_id) in uploaded
+        ]
+        self._record_replicated(replicated)
+        self.write({
+            'state': 'failed' if error else 'done',
+            'sent_count': len(replicated),
+            'skipped_count': sum(
+                1 for device_user, _finger_id, _template in plans[self.id]
+                if device_user.zkteco_device_attend_id in missing_users
+            ),
+            'finished_at': fields.Datetime.now(),
+            'last_error': error and error[:255],
+        })
+        if error:
+            self.device_id._health_call('_record_failure', error)
+            _logger.warning("Fingerprint replication failed for device %s: %s", self.device_id.name, error)
+        else:
+            _logger.info("Fingerprint replication of device %s: %s templates sent",
+                         self.device_id.name, len(replicated))
+
+    def action_retry(self):
+        for job in self:
+            if job.state != 'failed':
+                raise UserError(_("Only failed replications can be retried."))
+        self._enqueue(self.device_id)
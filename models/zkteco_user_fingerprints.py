@@ -5,9 +5,101 @@
 #    Email : sales@dotsprime.com / dotsprime@gmail.com
 ########################################################
 
+import base64
+import hashlib
+import logging
+
+from psycopg2 import IntegrityError
+
 from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError
 
+_logger = logging.getLogger(__name__)
+
+
+class ZktecoFingerprintTemplate(models.Model):
+    """
+    Content-addressed store of fingerprint templates.
+
+    Each distinct template is stored once, keyed by the SHA-256 of its raw bytes,
+    and shared by every device user (on any device) that enrolled it. The blob is
+    a non-prefetched column, so it is only read when explicitly requested.
+    """
+    _name = 'zkteco.fingerprint.template'
+    _description = 'ZKTeco Fingerprint Template Store'
+    _rec_name = 'checksum'
+
+    checksum = fields.Char(
+        string='Checksum',
+        required=True,
+        index=True,
+        readonly=True,
+        help="SHA-256 of the raw template bytes."
+    )
+    template_size = fields.Integer(
+        string='Size',
+        readonly=True,
+        help="Size of the raw template in bytes."
+    )
+    template_data = fields.Binary(
+        string='Template Data',
+        attachment=False,
+        required=True,
+        readonly=True,
+        help="Binary data representing the fingerprint template."
+    )
+
+    _sql_constraints = [
+        ('checksum_uniq', 'unique(checksum)', 'A template with this checksum is already stored.'),
+    ]
+
+    @api.model
+    def _compute_checksum(self, raw_template):
+        return hashlib.sha256(raw_template).hexdigest()
+
+    @api.model
+    def _get_or_create(self, raw_template, checksum=None):
+        """
+        Return the stored template for the given raw bytes, storing it when new.
+
+        Args:
+            raw_template (bytes): Decoded template bytes.
+            checksum (str, optional): Precomputed checksum of `raw_template`.
+
+        Returns:
+            recordset: A single `zkteco.fingerprint.template` record.
+        """
+        checksum = checksum or self._compute_checksum(raw_template)
+        template = self.search([('checksum', '=', checksum)], limit=1)
+        if template:
+            return template
+        try:
+            with self.env.cr.savepoint():
+                return self.create({
+                    'checksum': checksum,
+                    'template_size': len(raw_template),
+                    'template_data': base64.b64encode(raw_template),
+                })
+        except IntegrityError:
+            # Stored concurrently by another request
+            return self.search([('checksum', '=', checksum)], limit=1)
+
+    @api.autovacuum
+    def _gc_unused_templates(self):
+        """Remove templates no longer referenced by any device user."""
+        self.env['zkteco.device.fingerprints'].flush_model(['template_id'])
+        self.env.cr.execute("""
+            SELECT t.id FROM zkteco_fingerprint_template t
+            WHERE NOT EXISTS (
+                SELECT 1 FROM zkteco_device_fingerprints f WHERE f.template_id = t.id
+            )
+        """)
+        unused_ids = [row[0] for row in self.env.cr.fetchall()]
+        if unused_ids:
+            self.browse(unused_ids).unlink()
+            _logger.info("Removed %s unused fingerprint templates", len(unused_ids))
+
+
 class ZktecoDeviceFingerprints(models.Model):
     """
     Model to store fingerprint templates for employees on ZKTeco biometric devices.
@@ -45,8 +137,54 @@ class ZktecoDeviceFingerprints(models.Model):
         help="The device user entry associated with this employee on the biometric device."
     )
 
+    finger_id = fields.Integer(
+        string='Finger',
+        default=0,
+        help="Finger index (FID) of the template on the device, from 0 to 9."
+    )
+
+    template_id = fields.Many2one(
+        'zkteco.fingerprint.template',
+        string='Template',
+        required=True,
+        index=True,
+        ondelete='restrict',
+        help="Stored template shared by all device users with identical data."
+    )
+
+    checksum = fields.Char(
+        related='template_id.checksum',
+        string='Checksum',
+        store=True,
+        index=True,
+        help="SHA-256 of the template, used to skip unchanged uploads."
+    )
+
     template_data = fields.Binary(
+        related='template_id.template_data',
         string='Template Data',
-        required=True,
         help="Binary data representing the employee's fingerprint template."
     )
+
+    _sql_constraints = [
+        ('duser_finger_uniq', 'unique(zketco_duser_id, finger_id)',
+         'A device user can only have one template per finger.'),
+    ]
+
+    @api.model
+    def _migrate_inline_templates(self):
+        """
+        Move templates stored as attachments on this model into the template store.
+
+        Runs on every install/upgrade and does nothing once no legacy attachment is left.
+        """
+        attachments = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'template_data'),
+        ])
+        template_model = self.env['zkteco.fingerprint.template'].sudo()
+        for attachment in attachments:
+            fingerprint = self.sudo().browse(attachment.res_id).exists()
+            if fingerprint and attachment.raw:
+                fingerprint.template_id = template_model._get_or_create(attachment.raw)
+        attachments.unlink()
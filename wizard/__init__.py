@@ -10,4 +10,4 @@ from . import zkteco_attendance_device
 from . import zkteco_device_attendance_report
 from . import employee_leave_wizard
 from . import attendance_reports
-
+from . import zkteco_attlog_import
@@ -59,6 +59,15 @@ class EmployeeAttendanceReports(models.TransientModel):
                     'bold': True, 'bg_color': '#FFF2CC', 'border': 1, 'align': 'center'
                 })
 
+                # Fetch the attendance records of all employees at once, dispatched per employee
+                attendances_by_employee = defaultdict(list)
+                for att in self.env['hr.attendance'].search([
+                    ('employee_id', 'in', employee_ids.ids),
+                    ('check_in', '>=', rec.start_date),
+                    ('check_in', '<=', rec.end_date)
+                ], order='check_in asc'):
+                    attendances_by_employee[att.employee_id.id].append(att)
+
                 # Iterate over employees
                 for emp in employee_ids:
                     sheet_name = emp.name[:31] if emp.name else 'Employee'
@@ -73,12 +82,7 @@ class EmployeeAttendanceReports(models.TransientModel):
                     for col, header in enumerate(headers):
                         worksheet.write(0, col, header, header_format)
 
-                    # Fetch attendance records
-                    attendances = self.env['hr.attendance'].search([
-                        ('employee_id', '=', emp.id),
-                        ('check_in', '>=', rec.start_date),
-                        ('check_in', '<=', rec.end_date)
-                    ], order='check_in asc')
+                    attendances = attendances_by_employee[emp.id]
 
                     # Fill data
                     row = 1
@@ -172,6 +176,18 @@ class EmployeeAttendanceReports(models.TransientModel):
                 # Employees
                 employee_ids = rec.employee_ids or self.env['hr.employee'].search([])
 
+                # (employee, day) pairs with an attendance, from the daily summaries in one query;
+                # the absent days of an employee are the days of the range missing from it
+                present_days = {
+                    (summary['employee_id'][0], summary['date'])
+                    for summary in self.env['zkteco.attendance.daily'].search_read([
+                        ('employee_id', 'in', employee_ids.ids),
+                        ('date', '>=', start_date),
+                        ('date', '<=', end_date),
+                        ('attendance_count', '>', 0),
+                    ], ['employee_id', 'date'])
+                }
+
                 for emp in employee_ids:
                     # Create a new worksheet for each employee
                     sheet_name = emp.name[:31] if emp.name else 'Employee'
@@ -186,26 +202,18 @@ class EmployeeAttendanceReports(models.TransientModel):
                     sr_no = 1
                     total_absent = 0
 
-                    for date in date_range:
-                        # Check if attendance exists for that date
-                        attendance = self.env['hr.attendance'].search([
-                            ('employee_id', '=', emp.id),
-                            ('check_in', '>=', datetime.combine(date, datetime.min.time())),
-                            ('check_in', '<=', datetime.combine(date, datetime.max.time())),
-                        ], limit=1)
-
-                        # If no attendance found => mark as absent
-                        if not attendance:
-                            worksheet.write(row, 0, sr_no, cell_format)
-                            worksheet.write(row, 1, emp.name or '', cell_format)
-                            worksheet.write(row, 2, emp.barcode or '', cell_format)
-                            worksheet.write(row, 3, date, date_format)
-                            worksheet.write(row, 4, date.strftime('%A'), cell_format)  # Day name
-                            worksheet.write(row, 5, 'Absent', cell_format)
-
-                            sr_no += 1
-                            total_absent += 1
-                            row += 1
+                    absent_dates = [date for date in date_range if (emp.id, date) not in present_days]
+                    for date in absent_dates:
+                        worksheet.write(row, 0, sr_no, cell_format)
+                        worksheet.write(row, 1, emp.name or '', cell_format)
+                        worksheet.write(row, 2, emp.barcode or '', cell_format)
+                        worksheet.write(row, 3, date, date_format)
+                        worksheet.write(row, 4, date.strftime('%A'), cell_format)  # Day name
+                        worksheet.write(row, 5, 'Absent', cell_format)
+
+                        sr_no += 1
+                        total_absent += 1
+                        row += 1
 
                     # Totals row for that employee
                     if total_absent > 0:
@@ -261,6 +269,16 @@ class EmployeeAttendanceReports(models.TransientModel):
                 start_dt = datetime.combine(start_date, datetime.min.time())
                 end_dt = datetime.combine(end_date, datetime.max.time())
 
+                # Fetch the logs of all employees at once, dispatched per employee
+                logs_by_employee = defaultdict(list)
+                for log in self.env['zkteco.device.logs'].search([
+                    ('employee_id', 'in', employee_ids.ids),
+                    ('user_punch_time', '>=', start_dt),
+                    ('user_punch_time', '<=', end_dt),
+                ], order='user_punch_time asc'):
+                    logs_by_employee[log.employee_id.id].append(log)
+                status_labels = dict(self.env['zkteco.device.logs']._fields['status'].selection)
+
                 # Iterate per employee
                 for emp in employee_ids:
                     sheet_name = emp.name[:31] if emp.name else 'Employee'
@@ -276,12 +294,7 @@ class EmployeeAttendanceReports(models.TransientModel):
                     for col, header in enumerate(headers):
                         worksheet.write(0, col, header, header_format)
 
-                    # Fetch logs from zkteco.device.logs
-                    logs = self.env['zkteco.device.logs'].search([
-                        ('employee_id', '=', emp.id),
-                        ('user_punch_time', '>=', start_dt),
-                        ('user_punch_time', '<=', end_dt),
-                    ], order='user_punch_time asc')
+                    logs = logs_by_employee[emp.id]
 
                     row = 1
                     sr_no = 1
@@ -292,7 +305,7 @@ class EmployeeAttendanceReports(models.TransientModel):
                         day_name = punch_time.strftime('%A') if punch_time else ''
 
                         # Get status and numeric value safely
-                        status = dict(log._fields['status'].selection).get(log.status, '') if log.status else ''
+                        status = status_labels.get(log.status, '') if log.status else ''
                         status_number = getattr(log, 'status_number', '')
 
                         worksheet.write(row, 0, sr_no, cell_format)
@@ -368,6 +381,15 @@ class EmployeeAttendanceReports(models.TransientModel):
                 start_dt = datetime.combine(start_date, datetime.min.time())
                 end_dt = datetime.combine(end_date, datetime.max.time())
 
+                # Fetch the attendance records of all employees at once, dispatched per employee
+                attendances_by_employee = defaultdict(list)
+                for att in self.env['hr.attendance'].search([
+                    ('employee_id', 'in', employee_ids.ids),
+                    ('check_in', '>=', start_dt),
+                    ('check_in', '<=', end_dt)
+                ], order='check_in asc'):
+                    attendances_by_employee[att.employee_id.id].append(att)
+
                 for emp in employee_ids:
                     worksheet = workbook.add_worksheet(emp.name[:31] if emp.name else 'Employee')
                     headers = [
@@ -381,11 +403,7 @@ class EmployeeAttendanceReports(models.TransientModel):
 
                     expected_hours = emp.resource_calendar_id.hours_per_day or 0.0
 
-                    attendances = self.env['hr.attendance'].search([
-                        ('employee_id', '=', emp.id),
-                        ('check_in', '>=', start_dt),
-                        ('check_in', '<=', end_dt)
-                    ], order='check_in asc')
+                    attendances = attendances_by_employee[emp.id]
 
                     row = 1
                     sr_no = 1
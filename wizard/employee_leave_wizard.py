@@ -81,23 +81,28 @@ class EmployeeLeaveWizard(models.TransientModel):
             leave_dates.append(current_date)
             current_date += timedelta(days=1)
 
-        for employee in self.employee_ids:
-            for date in leave_dates:
-                already_exists = self.env['employee.leave.line'].search_count([
-                    ('employee_id', '=', employee.id),
-                    ('date', '=', date),
-                ])
-
-                if not already_exists:
-                    self.env['employee.leave.line'].create({
-                        'employee_id': employee.id,
-                        'date': date,
-                        'leave_type': self.leave_type,
-                        'description': self.description,
-                        'att_start_date': self.att_start_date,
-                        'att_end_date': self.att_end_date,
-                        'paid_medical_leave': self.paid_medical_leave,
-                    })
+        # One query for the lines that already exist, one create for the missing ones;
+        # each employee gets a single summary note (see employee.leave.line.create).
+        leave_line_model = self.env['employee.leave.line']
+        existing = {
+            (line['employee_id'][0], line['date'])
+            for line in leave_line_model.search_read([
+                ('employee_id', 'in', self.employee_ids.ids),
+                ('date', '>=', self.start_date),
+                ('date', '<=', self.end_date),
+            ], ['employee_id', 'date'])
+        }
+        vals_list = [{
+            'employee_id': employee.id,
+            'date': date,
+            'leave_type': self.leave_type,
+            'description': self.description,
+            'att_start_date': self.att_start_date,
+            'att_end_date': self.att_end_date,
+            'paid_medical_leave': self.paid_medical_leave,
+        } for employee in self.employee_ids for date in leave_dates if (employee.id, date) not in existing]
+        if vals_list:
+            leave_line_model.with_context(mail_create_nolog=True, mail_create_nosubscribe=True).create(vals_list)
 
         return {'type': 'ir.actions.client', 'tag': 'reload'}
 
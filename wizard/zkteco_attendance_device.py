@@ -1,6 +1,5 @@
 # -*- coding: utf-8 -*-
 from odoo import api, fields, models, _
-from ..zk import ZK
 from odoo.exceptions import ValidationError, UserError
 
 
@@ -61,12 +60,8 @@ class ZktecoDeviceWizard(models.TransientModel):
                     if line.device_id == biometric_device:
                         zkteco_device_attend_id = line.zkteco_device_attend_id
 
-                ip = biometric_device.zkteco_device_ip_address
-                port = biometric_device.port
-                password = biometric_device.zkteco_device_pass
-
-                zk = ZK(ip, port, password=password)
-                conn = zk.connect()
+                zk = biometric_device._zk_connect()
+                conn = zk
 
                 if conn:
                     users = zk.get_users()
@@ -104,12 +99,8 @@ class ZktecoDeviceWizard(models.TransientModel):
         uid_list = []
         user_id_list = []
 
-        ip = biometric.zkteco_device_ip_address
-        port = biometric.port
-        password = biometric.zkteco_device_pass
-
-        zk = ZK(ip, port, password=password)
-        conn = zk.connect()
+        zk = biometric._zk_connect()
+        conn = zk
 
         if conn:
             zk.disable_device()
@@ -165,12 +156,8 @@ class ZktecoDeviceWizard(models.TransientModel):
             for attendance_id in employee.biometric_device_ids:
                 zkteco_device_attend_id = attendance_id.zkteco_device_attend_id
 
-            ip = biometric.zkteco_device_ip_address
-            port = biometric.port
-            password = biometric.zkteco_device_pass
-
-            zk = ZK(ip, port, password=password)
-            conn = zk.connect()
+            zk = biometric._zk_connect()
+            conn = zk
 
             if conn:
                 users = zk.get_users()
@@ -218,12 +205,8 @@ class ZktecoDeviceWizard(models.TransientModel):
                 for attendance_id in employee.biometric_device_ids:
                     zkteco_device_attend_id = attendance_id.zkteco_device_attend_id
 
-                ip = biometric.zkteco_device_ip_address
-                port = biometric.port
-                password = biometric.zkteco_device_pass
-
-                zk = ZK(ip, port, password=password)
-                conn = zk.connect()
+                zk = biometric._zk_connect()
+                conn = zk
 
                 if conn:
                     users = zk.get_users()
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+import os
+import tempfile
+
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+
+
+class ZktecoAttlogImportWizard(models.TransientModel):
+    """
+    Wizard importing an attendance dump exported from a device over USB.
+
+    The uploaded file is kept in the filestore and memory-mapped from there,
+    so the import never holds the whole dump in Python objects.
+    """
+    _name = 'zkteco.attlog.import.wizard'
+    _description = 'ZKTeco Attendance Dump Import'
+
+    device_id = fields.Many2one(
+        'zkteco.device.setting',
+        string='ZKTeco Device',
+        required=True,
+        help="Device the dump was exported from; its timezone and users are used."
+    )
+    dump_file = fields.Binary(
+        string='Dump File',
+        required=True,
+        attachment=True,
+        help="ATTLOG text export or binary attlog.dat file."
+    )
+    dump_filename = fields.Char(string='File Name')
+    layout = fields.Selection(
+        [
+            ('auto', 'Detect'),
+            ('text', 'Text (tab separated)'),
+            ('8', 'Binary, 8-byte records'),
+            ('16', 'Binary, 16-byte records'),
+            ('40', 'Binary, 40-byte records'),
+        ],
+        string='Layout',
+        default='auto',
+        required=True,
+        help="Record layout of the dump, as understood by the device protocol. Detection fails, "
+             "asking for an explicit layout, when several layouts or none fit the file."
+    )
+    records_count = fields.Integer(string='Records Read', readonly=True)
+    created_count = fields.Integer(string='Punches Imported', readonly=True)
+    state = fields.Selection([('draft', 'Draft'), ('done', 'Done')], default='draft')
+
+    def action_import_dump(self):
+        self.ensure_one()
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_field', '=', 'dump_file'),
+            ('res_id', '=', self.id),
+        ], limit=1)
+        if not attachment:
+            raise UserError(_("Please upload a dump file."))
+
+        if attachment.store_fname:
+            report = self.device_id._import_attlog_dump(
+                attachment._full_path(attachment.store_fname), self.layout)
+        else:
+            # Database storage: spill the dump to a temporary file to map it
+            with tempfile.NamedTemporaryFile(suffix='.dat', delete=False) as dump:
+                dump.write(attachment.raw)
+            try:
+                report = self.device_id._import_attlog_dump(dump.name, self.layout)
+            finally:
+                os.unlink(dump.name)
+
+        self.write({
+            'records_count': report['records'],
+            'created_count': report['created'],
+            'state': 'done',
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
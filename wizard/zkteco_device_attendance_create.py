@@ -1,11 +1,25 @@
 # -*- coding: utf-8 -*-
 
+import bisect
+import logging
+import time as time_module
+from collections import defaultdict
 from datetime import datetime, timedelta
 from odoo import api, fields, models, _
+from odoo.exceptions import UserError
 from pytz import timezone, UTC
 from odoo.addons.resource.models.utils import Intervals
 from datetime import datetime, time
 
+_logger = logging.getLogger(__name__)
+
+# Key of the advisory lock serializing the attendance calculation cron runs.
+ATTENDANCE_CALCULATION_LOCK = 0x5A4B4341
+# Parameter holding the last employee id committed by the calculation cron.
+ATTENDANCE_CALCULATION_CURSOR = 'dps_zkteco_biometric_integration.attendance_calculation_cursor'
+# Employees per batch when the setting is not configured.
+ATTENDANCE_CALCULATION_BATCH = 500
+
 
 class ZktecoCalculationWizard(models.TransientModel):
     _name = 'zkteco.calculation.wizard'
@@ -87,282 +101,641 @@ class ZktecoCalculationWizard(models.TransientModel):
 
         return check_in, check_out
 
-    def calculate_attendance(self):
+    def _adjust_calculated_times(self, check_in, check_out, user_tz):
         """
-        Calculate and adjust attendance records based on attendance logs and company settings.
+        Adjust check-in and check-out times the way the attendance calculation does.
 
-        This method processes attendance logs from biometric devices or other sources and creates or updates
-        corresponding HR attendance records in Odoo. It handles:
-            - Timezone conversions
-            - Adjusting check-in and check-out times
-            - Applying minimal attendance rules (if configured)
-            - Assigning leave types for specific dates
-            - Handling both single-shift and multi-shift configurations
-            - Pairing multiple punches into check-in/check-out pairs
+        Same rules as `adjust_check_in_out_times`, except that a check-out rounded
+        past 23:00 stays on the same day (minute 59), and the timezone is given by
+        the caller so it is only resolved once per run.
 
-        Logic is divided into two paths:
-            1. Single shift scenario (multiple_shift = False)
-            2. Multi-shift scenario (multiple_shift = True)
+        Args:
+            check_in (datetime): Original check-in time in UTC
+            check_out (datetime or None): Original check-out time in UTC
+            user_tz (tzinfo): Timezone the rules apply in
+
+        Returns:
+            tuple: (adjusted_check_in, adjusted_check_out) in UTC without tzinfo
+        """
+        check_in_local = check_in.replace(tzinfo=UTC).astimezone(user_tz)
+        check_out_local = check_out.replace(tzinfo=UTC).astimezone(user_tz) if check_out else None
 
-        Helper Functions:
-            adjust_check_in_out_times: Normalizes check-in and check-out times based on business rules.
-            get_leave_type_for_date: Determines the leave type for an employee on a given date.
+        if check_in_local.time() < time(8, 15) or check_in_local.time() < time(1, 0):
+            check_in_local = check_in_local.replace(hour=8, minute=0, second=0, microsecond=0)
 
-        Raises:
-            No direct exceptions raised here, but writes and creates may raise Odoo ORM exceptions if
-            constraints fail.
+        if check_out_local and check_out_local.time() > time(17, 0):
+            minute = check_out_local.minute
+            hour = check_out_local.hour
+
+            if 0 <= minute <= 29:
+                minute = 0
+            elif 30 <= minute <= 44:
+                minute = 30
+            elif 45 <= minute <= 50:
+                minute = 45
+            elif 51 <= minute <= 59:
+                if hour < 23:
+                    hour += 1
+                    minute = 0
+                else:
+                    minute = 59
+
+            check_out_local = check_out_local.replace(hour=hour, minute=minute, second=0, microsecond=0)
+
+        check_in = check_in_local.astimezone(UTC).replace(tzinfo=None)
+        check_out = check_out_local.astimezone(UTC).replace(tzinfo=None) if check_out_local else None
+
+        return check_in, check_out
+
+    def _get_leave_calendar(self, employee_ids, local_dates):
+        """
+        Load the leave lines of several employees over several days in one query.
+
+        Args:
+            employee_ids (iterable): hr.employee ids
+            local_dates (set): Dates, in the user's timezone, to cover
 
         Returns:
-            None
+            LeaveCalendar: Leave lookups by (employee id, date)
+        """
+        return self.env['employee.leave.line']._get_leave_calendar(
+            employee_ids, min(local_dates, default=None), max(local_dates, default=None))
+
+    def _pair_single_shift_punches(self, employee_id, punches, open_attendances, dated_attendances,
+                                   leave_calendar, minimal_attendance, user_tz):
         """
+        Replay the punches of one employee against its attendances, in memory.
 
-        def adjust_check_in_out_times(check_in, check_out):
-            """
-            Adjusts check-in and check-out times according to predefined rules:
-            - Convert UTC times to user's timezone
-            - Normalize check-in before 8:15 AM to exactly 8:00 AM
-            - Round check-out times after 5 PM to the nearest 0, 30, 45, or next hour
+        Attendances are dicts {'id', 'check_in', 'check_out'}; the ones to create
+        have no id and carry their creation values under 'vals'. The punches are
+        paired with the rules of the single-shift calculation:
+            - minimal attendance: the first punch of a day opens the attendance of
+              that day (closing the previous open one at 23:59:59), later punches
+              move its check-out.
+            - otherwise: punches alternate between opening an attendance and
+              closing the open one.
+
+        Args:
+            employee_id (int): hr.employee id
+            punches (list): (log id, raw UTC time, normalized UTC time, local date), by time
+            open_attendances (list): Open attendances of the employee, sorted by check-in
+            dated_attendances (dict): {punch date: attendance} (minimal attendance only)
+            leave_calendar (LeaveCalendar): Leave lines of the employees being calculated
+            minimal_attendance: Value of the minimal_attendance setting
+            user_tz (tzinfo): Timezone of the adjustment rules
+
+        Returns:
+            list: Attendances closed or created by the punches
+        """
+        touched = {}
+
+        def close_attendance(attendance, check_out):
+            _, attendance['check_out'] = self._adjust_calculated_times(attendance['check_in'], check_out, user_tz)
+            open_attendances[:] = [other for other in open_attendances if other is not attendance]
+            touched[id(attendance)] = attendance
+
+        def open_attendance(punch_time, local_date, punch_date=None):
+            check_in, _ = self._adjust_calculated_times(punch_time, None, user_tz)
+            vals = {
+                'employee_id': employee_id,
+                'check_in': check_in,
+                'leave_type': leave_calendar.leave_type(employee_id, local_date),
+            }
+            if punch_date:
+                vals['punch_date'] = punch_date
+            attendance = {'id': False, 'check_in': check_in, 'check_out': False, 'vals': vals}
+            bisect.insort(open_attendances, attendance, key=lambda item: item['check_in'])
+            touched[id(attendance)] = attendance
+            return attendance
+
+        if minimal_attendance:
+            for _log_id, raw_time, punch_time, local_date in punches:
+                attendance = dated_attendances.get(raw_time.date())
+                if attendance:
+                    if punch_time > attendance['check_in']:
+                        close_attendance(attendance, punch_time)
+                    continue
+                if open_attendances:
+                    last_attendance = open_attendances[-1]
+                    check_out_time = last_attendance['check_in'].replace(hour=23, minute=59, second=59)
+                    if check_out_time > last_attendance['check_in']:
+                        close_attendance(last_attendance, check_out_time)
+                attendance = open_attendance(punch_time, local_date, punch_time.date())
+                dated_attendances.setdefault(punch_time.date(), attendance)
+        else:
+            checked_in = False
+            for _log_id, _raw_time, punch_time, local_date in punches:
+                attendance = open_attendances[-1] if open_attendances else None
+                if checked_in:
+                    if attendance and punch_time > attendance['check_in']:
+                        close_attendance(attendance, punch_time)
+                    checked_in = False
+                elif attendance:
+                    if punch_time > attendance['check_in']:
+                        close_attendance(attendance, punch_time)
+                else:
+                    open_attendance(punch_time, local_date)
+                    checked_in = True
 
-            Args:
-                check_in (datetime): Original check-in time in UTC
-                check_out (datetime or None): Original check-out time in UTC
+        return list(touched.values())
 
-            Returns:
-                tuple: (adjusted_check_in, adjusted_check_out) in UTC without tzinfo
-            """
-            user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
+    def _flush_single_shift_changes(self, attendances):
+        """
+        Store attendances paired by `_pair_single_shift_punches`.
 
-            check_in_local = check_in.replace(tzinfo=UTC).astimezone(user_tz)
-            check_out_local = check_out.replace(tzinfo=UTC).astimezone(user_tz) if check_out else None
+        Existing attendances are closed first, so the new ones never overlap an
+        open attendance, then all new attendances are created at once.
 
-            if check_in_local.time() < time(8, 15) or check_in_local.time() < time(1, 0):
-                check_in_local = check_in_local.replace(hour=8, minute=0, second=0, microsecond=0)
+        Returns:
+            tuple: (created count, updated count)
+        """
+        attendance_model = self.env['hr.attendance']
+        updated = [attendance for attendance in attendances if attendance['id']]
+        for attendance in updated:
+            attendance_model.browse(attendance['id']).write({'check_out': attendance['check_out']})
+
+        vals_list = []
+        for attendance in attendances:
+            if not attendance['id']:
+                vals = dict(attendance['vals'])
+                if attendance['check_out']:
+                    vals['check_out'] = attendance['check_out']
+                vals_list.append(vals)
+        if vals_list:
+            attendance_model.create(vals_list)
+        return len(vals_list), len(updated)
+
+    def _calculate_single_shift_attendance(self, minimal_attendance, employee_ids=None):
+        """
+        Turn the pending punches of single-shift employees into attendances.
 
-            if check_out_local and check_out_local.time() > time(17, 0):
-                minute = check_out_local.minute
-                hour = check_out_local.hour
+        The pending logs, the open attendances of their employees, the attendances
+        already dated on their punch days (minimal attendance) and the leave lines
+        of the period are loaded in a few queries. Punches are paired in memory
+        per employee, then the result is flushed in bulk and the logs are flagged
+        calculated with one write.
 
-                if 0 <= minute <= 29:
-                    minute = 0
-                elif 30 <= minute <= 44:
-                    minute = 30
-                elif 45 <= minute <= 50:
-                    minute = 45
-                elif 51 <= minute <= 59:
-                    if hour < 23:
-                        hour += 1
-                        minute = 0
-                    else:
-                        minute = 59
-
-                check_out_local = check_out_local.replace(hour=hour, minute=minute, second=0, microsecond=0)
-
-            check_in = check_in_local.astimezone(UTC).replace(tzinfo=None)
-            check_out = check_out_local.astimezone(UTC).replace(tzinfo=None) if check_out_local else None
-
-            return check_in, check_out
-
-        def get_leave_type_for_date(employee, dt):
-            """
-            Get the leave type for the given employee on the specified date.
-
-            Args:
-                employee (record): hr.employee record
-                dt (datetime): Punch time (UTC)
-
-            Returns:
-                str: Leave type string (or 'none' if no leave found)
-            """
-            user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
-            local_date = dt.replace(tzinfo=UTC).astimezone(user_tz).date()
-            leave_line = self.env['employee.leave.line'].search([
-                ('employee_id', '=', employee.id),
-                ('date', '=', local_date)
-            ], limit=1)
-            return leave_line.leave_type if leave_line else 'none'
+        If the bulk flush fails, employees are flushed one by one in savepoints;
+        the logs of an employee that still fails stay pending for the next run.
 
-        param_val = self.env['ir.config_parameter'].sudo().get_param('dps_zkteco_biometric_integration.multiple_shift')
+        Args:
+            minimal_attendance: Value of the minimal_attendance setting
+            employee_ids (iterable): Only process these employees (all when None)
 
-        if param_val in [False, 'False', 'false', '0', 0, None, '']:
-            minimal_attendance = self.env['ir.config_parameter'].sudo().get_param(
-                'dps_zkteco_biometric_integration.minimal_attendance')
-            hr_attendance = self.env['hr.attendance']
-            today = datetime.now(UTC)
-
-            domain = [('user_punch_time', '<=', today), ('user_punch_calculated', '=', False)]
-            attendance_log = self.env['zkteco.device.logs'].search(domain).sorted('user_punch_time')
-            employee_list = []
-
-            for log in attendance_log.filtered(lambda x: x.employee_id):
-                user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
-                punch_time_utc = log.user_punch_time.replace(tzinfo=UTC)
-                punch_time_local = punch_time_utc.astimezone(user_tz)
-
-                morning_start = punch_time_local.replace(hour=7, minute=45, second=0, microsecond=0)
-                morning_end = punch_time_local.replace(hour=8, minute=15, second=0, microsecond=0)
-                if morning_start <= punch_time_local <= morning_end:
-                    punch_time_local = punch_time_local.replace(hour=8, minute=0, second=0)
-
-                punch_time = punch_time_local.astimezone(UTC).replace(tzinfo=None)
-
-                if minimal_attendance:
-                    attendance = self.env['hr.attendance'].search([
-                        ('employee_id', '=', log.employee_id.id),
-                        ('punch_date', '=', log.user_punch_time.date())
-                    ])
-                    if attendance:
-                        if punch_time > attendance.check_in:
-                            _, adjusted_check_out = adjust_check_in_out_times(attendance.check_in, punch_time)
-                            try:
-                                attendance.write({'check_out': adjusted_check_out})
-                            except:
-                                continue
-                    else:
-                        last_attendance_before_check_out = self.env['hr.attendance'].search([
-                            ('employee_id', '=', log.employee_id.id),
-                            ('check_out', '=', False)
-                        ], order='check_in desc', limit=1)
-                        if last_attendance_before_check_out:
-                            check_out_time = last_attendance_before_check_out.check_in.replace(hour=23, minute=59,
-                                                                                               second=59)
-                            if check_out_time > last_attendance_before_check_out.check_in:
-                                _, adjusted_check_out = adjust_check_in_out_times(
-                                    last_attendance_before_check_out.check_in, check_out_time)
-                                try:
-                                    last_attendance_before_check_out.write({'check_out': adjusted_check_out})
-                                except:
-                                    continue
-
-                        adjusted_check_in, _ = adjust_check_in_out_times(punch_time, None)
-                        hr_attendance.create({
-                            'employee_id': log.employee_id.id,
-                            'check_in': adjusted_check_in,
-                            'punch_date': punch_time.date(),
-                            'leave_type': get_leave_type_for_date(log.employee_id, punch_time),
-                        })
+        Returns:
+            dict: Counters 'logs', 'employees', 'created', 'updated' and 'failed'
+        """
+        user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
+        log_model = self.env['zkteco.device.logs']
+        attendance_model = self.env['hr.attendance']
+
+        domain = [
+            ('user_punch_time', '<=', fields.Datetime.now()),
+            ('user_punch_calculated', '=', False),
+            ('employee_id', '!=', False),
+        ]
+        if employee_ids is not None:
+            domain.append(('employee_id', 'in', list(employee_ids)))
+
+        punches_by_employee = {}
+        local_dates = set()
+        for log in log_model.search_read(domain, ['employee_id', 'user_punch_time'], order='user_punch_time, id'):
+            punch_time_local = log['user_punch_time'].replace(tzinfo=UTC).astimezone(user_tz)
+            morning_start = punch_time_local.replace(hour=7, minute=45, second=0, microsecond=0)
+            morning_end = punch_time_local.replace(hour=8, minute=15, second=0, microsecond=0)
+            if morning_start <= punch_time_local <= morning_end:
+                punch_time_local = punch_time_local.replace(hour=8, minute=0, second=0)
+            punch_time = punch_time_local.astimezone(UTC).replace(tzinfo=None)
+            local_dates.add(punch_time_local.date())
+            punches_by_employee.setdefault(log['employee_id'][0], []).append(
+                (log['id'], log['user_punch_time'], punch_time, punch_time_local.date()))
+
+        counters = {'logs': 0, 'employees': len(punches_by_employee), 'created': 0, 'updated': 0, 'failed': 0}
+        if not punches_by_employee:
+            return counters
+
+        # The same attendance can be both open and dated: share one dict per id.
+        attendances_by_id = {}
+        open_by_employee = {}
+        for row in attendance_model.search_read([
+            ('employee_id', 'in', list(punches_by_employee)),
+            ('check_out', '=', False),
+        ], ['employee_id', 'check_in'], order='check_in, id'):
+            attendance = attendances_by_id[row['id']] = {
+                'id': row['id'], 'check_in': row['check_in'], 'check_out': False}
+            open_by_employee.setdefault(row['employee_id'][0], []).append(attendance)
+
+        dated_by_employee = {}
+        if minimal_attendance:
+            punch_dates = {raw_time.date() for punches in punches_by_employee.values()
+                           for _log_id, raw_time, _punch_time, _local_date in punches}
+            for row in attendance_model.search_read([
+                ('employee_id', 'in', list(punches_by_employee)),
+                ('punch_date', 'in', list(punch_dates)),
+            ], ['employee_id', 'punch_date', 'check_in', 'check_out'], order='id'):
+                attendance = attendances_by_id.setdefault(row['id'], {
+                    'id': row['id'], 'check_in': row['check_in'], 'check_out': row['check_out']})
+                dated_by_employee.setdefault(row['employee_id'][0], {}).setdefault(row['punch_date'], attendance)
+
+        leave_calendar = self._get_leave_calendar(punches_by_employee, local_dates)
+        changes = {
+            employee_id: self._pair_single_shift_punches(
+                employee_id, punches, open_by_employee.get(employee_id, []),
+                dated_by_employee.get(employee_id, {}), leave_calendar, minimal_attendance, user_tz)
+            for employee_id, punches in punches_by_employee.items()
+        }
+
+        try:
+            with self.env.cr.savepoint():
+                created, updated = self._flush_single_shift_changes(
+                    [attendance for attendances in changes.values() for attendance in attendances])
+            counters['created'] += created
+            counters['updated'] += updated
+            done_employee_ids = list(changes)
+        except Exception:
+            _logger.warning("Bulk attendance flush failed, retrying employee by employee", exc_info=True)
+            done_employee_ids = []
+            for employee_id, attendances in changes.items():
+                try:
+                    with self.env.cr.savepoint():
+                        created, updated = self._flush_single_shift_changes(attendances)
+                except Exception as flush_exception:
+                    counters['failed'] += 1
+                    _logger.warning("Attendance calculation failed for employee %s: %s", employee_id, flush_exception)
+                    continue
+                counters['created'] += created
+                counters['updated'] += updated
+                done_employee_ids.append(employee_id)
+
+        log_ids = [punch[0] for employee_id in done_employee_ids for punch in punches_by_employee[employee_id]]
+        if log_ids:
+            log_model.browse(log_ids).write({'user_punch_calculated': True})
+        counters['logs'] = len(log_ids)
+        return counters
+
+    def _flush_multi_shift_days(self, plans):
+        """
+        Store the day plans computed by `_calculate_multi_shift_attendance`.
 
+        Existing attendances are written only on the fields that changed and new
+        ones are created at once. The `multiple.punch` rows of each day are
+        matched by position with the new pairs: changed rows are written, missing
+        ones created and extra ones deleted.
+
+        Returns:
+            tuple: (created count, updated count) of attendances
+        """
+        attendance_model = self.env['hr.attendance']
+        punch_model = self.env['multiple.punch']
+        updated = 0
+
+        attendance_ids = {}
+        for index, plan in enumerate(plans):
+            attendance = plan['attendance']
+            if not attendance:
+                continue
+            attendance_ids[index] = attendance['id']
+            changed = {field: value for field, value in plan['vals'].items() if attendance[field] != value}
+            if changed:
+                attendance_model.browse(attendance['id']).write(changed)
+                updated += 1
+
+        new_indexes = [index for index, plan in enumerate(plans) if not plan['attendance']]
+        if new_indexes:
+            records = attendance_model.create([
+                dict(plans[index]['vals'], employee_id=plans[index]['employee_id']) for index in new_indexes
+            ])
+            attendance_ids.update(zip(new_indexes, records.ids))
+
+        punch_vals_list = []
+        stale_ids = []
+        for index, plan in enumerate(plans):
+            rows = plan['rows']
+            for position, (punch_in, punch_out) in enumerate(plan['pairs']):
+                values = {'count': position + 1, 'check_in': punch_in, 'check_out': punch_out}
+                if position < len(rows):
+                    changed = {field: value for field, value in values.items() if rows[position][field] != value}
+                    if changed:
+                        punch_model.browse(rows[position]['id']).write(changed)
                 else:
-                    if log.employee_id.id in employee_list:
-                        attd = self.device_user_check_in_out(log.employee_id.id, punch_time)
-                        attendance = self.env['hr.attendance'].browse(attd)
-                        if attendance and punch_time > attendance.check_in:
-                            _, adjusted_check_out = adjust_check_in_out_times(attendance.check_in, punch_time)
-                            try:
-                                attendance.write({'check_out': adjusted_check_out})
-                            except:
-                                continue
-                        employee_list.remove(log.employee_id.id)
-                    else:
-                        attd = self.device_user_check_in_out(log.employee_id.id, punch_time)
-                        attendance = self.env['hr.attendance'].browse(attd)
-                        if attendance and attendance.check_out is False:
-                            if punch_time > attendance.check_in:
-                                _, adjusted_check_out = adjust_check_in_out_times(attendance.check_in, punch_time)
-                                try:
-                                    attendance.write({'check_out': adjusted_check_out})
-                                except:
-                                    continue
-                        else:
-                            adjusted_check_in, _ = adjust_check_in_out_times(punch_time, None)
-                            hr_attendance.create({
-                                'employee_id': log.employee_id.id,
-                                'check_in': adjusted_check_in,
-                                'leave_type': get_leave_type_for_date(log.employee_id, punch_time),
-                            })
-                            employee_list.append(log.employee_id.id)
-
-                log.user_punch_calculated = True
+                    values['attendance_id'] = attendance_ids[index]
+                    punch_vals_list.append(values)
+            stale_ids.extend(row['id'] for row in rows[len(plan['pairs']):])
+        if stale_ids:
+            punch_model.browse(stale_ids).unlink()
+        if punch_vals_list:
+            punch_model.create(punch_vals_list)
+        return len(new_indexes), updated
+
+    def _calculate_multi_shift_attendance(self, employee_ids=None):
+        """
+        Recompute the multi-shift attendances of the queued (employee, day) pairs.
 
-        else:
-            minimal_attendance = self.env['ir.config_parameter'].sudo().get_param(
-                'dps_zkteco_biometric_integration.minimal_attendance')
-            hr_attendance = self.env['hr.attendance']
-            user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
+        The days come from `zkteco.attendance.dirty.day`, after queuing the days of
+        pending punches that are not queued yet. All the punches of a queued day
+        are paired again and the result is diffed against the stored attendance
+        and its `multiple.punch` rows, so a day that received one punch only
+        touches the rows that changed. Days with a single punch keep their punch
+        pending, as before.
+
+        If the bulk flush fails, days are flushed one by one in savepoints; a day
+        that still fails stays queued for the next run.
+
+        Args:
+            employee_ids (iterable): Only recompute these employees (all when None)
+
+        Returns:
+            dict: Counters 'logs', 'employees', 'created', 'updated' and 'failed'
+        """
+        counters = {'logs': 0, 'employees': 0, 'created': 0, 'updated': 0, 'failed': 0}
+        user_tz = timezone(self.env.user.tz) if self.env.user.tz else UTC
+        dirty_model = self.env['zkteco.attendance.dirty.day'].sudo()
+        log_model = self.env['zkteco.device.logs']
+
+        dirty_model._mark_pending_logs(employee_ids)
+        domain = [('employee_id', 'in', list(employee_ids))] if employee_ids is not None else []
+        dirty_ids = {
+            (row['employee_id'][0], row['date']): row['id']
+            for row in dirty_model.search_read(domain, ['employee_id', 'date'])
+        }
+        if not dirty_ids:
+            return counters
+        day_employee_ids = list({employee_id for employee_id, _day in dirty_ids})
+        days = {day for _employee_id, day in dirty_ids}
+
+        logs_by_day = {}
+        for log in log_model.search_read([
+            ('employee_id', 'in', day_employee_ids),
+            ('user_punch_time', '>=', datetime.combine(min(days), time.min)),
+            ('user_punch_time', '<=', datetime.combine(max(days), time.max)),
+        ], ['employee_id', 'user_punch_time', 'user_punch_calculated'], order='user_punch_time, id'):
+            key = (log['employee_id'][0], dirty_model._punch_day(log['user_punch_time']))
+            if key in dirty_ids:
+                logs_by_day.setdefault(key, []).append(log)
+
+        attendances = {}
+        for row in self.env['hr.attendance'].search_read([
+            ('employee_id', 'in', day_employee_ids),
+            ('punch_date', 'in', list(days)),
+        ], ['employee_id', 'punch_date', 'check_in', 'check_out', 'leave_type'], order='check_in desc'):
+            attendances.setdefault((row['employee_id'][0], row['punch_date']), row)
+
+        rows_by_attendance = {}
+        if attendances:
+            for row in self.env['multiple.punch'].search_read([
+                ('attendance_id', 'in', [attendance['id'] for attendance in attendances.values()]),
+            ], ['attendance_id', 'count', 'check_in', 'check_out'], order='count, id'):
+                rows_by_attendance.setdefault(row['attendance_id'][0], []).append(row)
+
+        local_dates = {
+            logs[0]['user_punch_time'].replace(tzinfo=UTC).astimezone(user_tz).date()
+            for logs in logs_by_day.values()
+        }
+        leave_calendar = self._get_leave_calendar(day_employee_ids, local_dates)
+
+        plans = []
+        settled_keys = []
+        for key in dirty_ids:
+            logs = logs_by_day.get(key, [])
+            if len(logs) < 2:
+                settled_keys.append(key)
+                continue
+            employee_id, day = key
+            punch_times = [log['user_punch_time'] for log in logs]
+            check_in, check_out = self._adjust_calculated_times(punch_times[0], punch_times[-1], user_tz)
+            local_date = punch_times[0].replace(tzinfo=UTC).astimezone(user_tz).date()
+            attendance = attendances.get(key)
+            plans.append({
+                'key': key,
+                'employee_id': employee_id,
+                'attendance': attendance,
+                'vals': {
+                    'check_in': check_in,
+                    'check_out': check_out if check_in != check_out else False,
+                    'leave_type': leave_calendar.leave_type(employee_id, local_date),
+                    'punch_date': day,
+                },
+                'pairs': [
+                    (punch_times[i], punch_times[i + 1] if i + 1 < len(punch_times) else False)
+                    for i in range(0, len(punch_times), 2)
+                ],
+                'rows': rows_by_attendance.get(attendance['id'], []) if attendance else [],
+                'log_ids': [log['id'] for log in logs if not log['user_punch_calculated']],
+            })
+
+        try:
+            with self.env.cr.savepoint():
+                created, updated = self._flush_multi_shift_days(plans)
+            counters['created'] += created
+            counters['updated'] += updated
+            done_plans = plans
+        except Exception:
+            _logger.warning("Bulk multi-shift flush failed, retrying day by day", exc_info=True)
+            done_plans = []
+            failed_employee_ids = set()
+            for plan in plans:
+                try:
+                    with self.env.cr.savepoint():
+                        created, updated = self._flush_multi_shift_days([plan])
+                except Exception as flush_exception:
+                    failed_employee_ids.add(plan['employee_id'])
+                    _logger.warning("Attendance calculation failed for employee %s on %s: %s",
+                                    plan['employee_id'], plan['key'][1], flush_exception)
+                    continue
+                counters['created'] += created
+                counters['updated'] += updated
+                done_plans.append(plan)
+            counters['failed'] = len(failed_employee_ids)
 
-            today = datetime.now(UTC)
-            domain = [('user_punch_time', '<=', today), ('user_punch_calculated', '=', False)]
-            attendance_log = self.env['zkteco.device.logs'].search(domain).sorted('user_punch_time')
+        log_ids = [log_id for plan in done_plans for log_id in plan['log_ids']]
+        if log_ids:
+            log_model.browse(log_ids).write({'user_punch_calculated': True})
+        settled_keys.extend(plan['key'] for plan in done_plans)
+        dirty_model.browse([dirty_ids[key] for key in settled_keys]).unlink()
 
-            logs_by_employee = {}
+        counters['logs'] = len(log_ids)
+        counters['employees'] = len({plan['employee_id'] for plan in done_plans})
+        return counters
 
-            for log in attendance_log.filtered(lambda x: x.employee_id):
-                punch_time_utc = log.user_punch_time.replace(tzinfo=UTC)
-                punch_time_local = punch_time_utc.astimezone(user_tz)
-                punch_time = punch_time_local.astimezone(UTC).replace(tzinfo=None)
+    def calculate_attendance(self):
+        """
+        Calculate the pending punches of all employees in the current transaction.
 
-                key = (log.employee_id.id, punch_time.date())
-                logs_by_employee.setdefault(key, []).append((log, punch_time))
+        Holds the same exclusive advisory lock as the cron and the shards, so a
+        manual run never overlaps them; the run is made in a savepoint so the
+        lock can be released even when it fails.
+        """
+        cr = self.env.cr
+        cr.execute("SELECT pg_try_advisory_lock(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+        if not cr.fetchone()[0]:
+            raise UserError(_("The attendance calculation is already running. Please try again later."))
+        try:
+            with cr.savepoint():
+                counters = self._calculate_attendance()
+        finally:
+            cr.execute("SELECT pg_advisory_unlock(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+        _logger.info("Attendance calculation: %(logs)s logs of %(employees)s employees, "
+                     "%(created)s attendances created, %(updated)s updated, %(failed)s employees failed",
+                     counters)
+
+    @api.model
+    def _cron_calculate_attendance(self, batch_size=None, shard=0, shards=1):
+        """
+        Calculate the pending punches in batches of employees, committing each batch.
+
+        Runs are serialized with PostgreSQL advisory locks: a run started while
+        another one holds its lock returns immediately. The highest employee id
+        of the last committed batch is kept in a cursor parameter, so a run that
+        is interrupted resumes after the last committed batch; the cursor is
+        reset once the end of the backlog is reached, and a resumed run then
+        makes one more pass over the employees it skipped.
+
+        With `shards` > 1 the run only handles the employees whose id modulo
+        `shards` equals `shard`, with its own lock and cursor, so all the shards
+        of a run can be processed at the same time by separate processes or
+        cron jobs (see the `zkteco_calculate_attendance` command). Shards share
+        the lock of an unsharded run, which therefore never overlaps them; all
+        the shards of a run must use the same `shards` count.
 
-            for (employee_id, punch_date), log_entries in logs_by_employee.items():
-                # Fetch existing attendance for the day
-                attendance = self.env['hr.attendance'].search([
-                    ('employee_id', '=', employee_id),
-                    ('punch_date', '=', punch_date)
-                ], limit=1)
+        Args:
+            batch_size (int): Employees per batch, defaults to the
+                `attendance_calculation_batch_size` setting.
+            shard (int): Shard handled by this run, from 0 to `shards` - 1.
+            shards (int): Number of shards the employees are split into.
 
-                if attendance:
-                    all_logs = self.env['zkteco.device.logs'].search([
-                        ('employee_id', '=', employee_id),
-                        ('user_punch_time', '>=', datetime.combine(punch_date, datetime.min.time())),
-                        ('user_punch_time', '<=', datetime.combine(punch_date, datetime.max.time())),
-                    ]).sorted('user_punch_time')
-
-                    log_entries = []
-                    for log in all_logs:
-                        punch_time_utc = log.user_punch_time.replace(tzinfo=UTC)
-                        punch_time_local = punch_time_utc.astimezone(user_tz)
-                        punch_time = punch_time_local.astimezone(UTC).replace(tzinfo=None)
-                        log_entries.append((log, punch_time))
-
-                log_entries.sort(key=lambda x: x[1])
-                punch_times = [pt for (_, pt) in log_entries]
-
-                if len(punch_times) < 2:
+        Returns:
+            dict: Counters of the run, summed over the batches.
+        """
+        cr = self.env.cr
+        if shards > 1:
+            cr.execute("SELECT pg_try_advisory_lock_shared(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+            if not cr.fetchone()[0]:
+                _logger.info("Attendance calculation already running, shard %s/%s skipped", shard, shards)
+                return {}
+            cr.execute("SELECT pg_try_advisory_lock(%s, %s)", (ATTENDANCE_CALCULATION_LOCK, shard))
+            if not cr.fetchone()[0]:
+                cr.execute("SELECT pg_advisory_unlock_shared(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+                _logger.info("Attendance calculation shard %s/%s already running, skipped", shard, shards)
+                return {}
+        else:
+            cr.execute("SELECT pg_try_advisory_lock(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+            if not cr.fetchone()[0]:
+                _logger.info("Attendance calculation already running, skipped")
+                return {}
+        try:
+            return self._calculate_attendance_batches(batch_size, shard, shards)
+        except Exception:
+            cr.rollback()
+            raise
+        finally:
+            if shards > 1:
+                cr.execute("SELECT pg_advisory_unlock(%s, %s)", (ATTENDANCE_CALCULATION_LOCK, shard))
+                cr.execute("SELECT pg_advisory_unlock_shared(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+            else:
+                cr.execute("SELECT pg_advisory_unlock(%s)", (ATTENDANCE_CALCULATION_LOCK,))
+
+    @api.model
+    def _calculate_attendance_batches(self, batch_size=None, shard=0, shards=1):
+        """Run the batches of `_cron_calculate_attendance`; the caller holds the locks."""
+        params = self.env['ir.config_parameter'].sudo()
+        batch_size = batch_size or int(params.get_param(
+            'dps_zkteco_biometric_integration.attendance_calculation_batch_size', 0) or 0) \
+            or ATTENDANCE_CALCULATION_BATCH
+        cursor_param = ATTENDANCE_CALCULATION_CURSOR if shards == 1 \
+            else f"{ATTENDANCE_CALCULATION_CURSOR}.{shard}.{shards}"
+        cursor = int(params.get_param(cursor_param, 0) or 0)
+        resumed = bool(cursor)
+        totals = dict.fromkeys(('batches', 'logs', 'employees', 'created', 'updated', 'failed'), 0)
+
+        while True:
+            self.env.cr.execute("""
+                SELECT DISTINCT employee_id
+                  FROM zkteco_device_logs
+                 WHERE user_punch_calculated IS NOT TRUE
+                   AND employee_id > %s
+                   AND mod(employee_id, %s) = %s
+                   AND user_punch_time <= %s
+              ORDER BY employee_id
+                 LIMIT %s
+            """, (cursor, shards, shard, fields.Datetime.now(), batch_size))
+            employee_ids = [row[0] for row in self.env.cr.fetchall()]
+            if not employee_ids:
+                params.set_param(cursor_param, 0)
+                self.env.cr.commit()
+                if resumed:
+                    # Employees before the cursor were skipped by the resumed pass
+                    cursor, resumed = 0, False
                     continue
+                break
+
+            started = time_module.monotonic()
+            counters = self._calculate_attendance(employee_ids=employee_ids)
+            cursor = employee_ids[-1]
+            params.set_param(cursor_param, cursor)
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+            totals['batches'] += 1
+            for key, value in counters.items():
+                totals[key] += value
+            _logger.info("Attendance calculation shard %s/%s batch %s: %s employees up to id %s, %s logs, "
+                         "%s attendances created, %s updated, %s employees failed in %.2fs",
+                         shard, shards, totals['batches'], len(employee_ids), cursor, counters['logs'],
+                         counters['created'], counters['updated'], counters['failed'],
+                         time_module.monotonic() - started)
+
+        _logger.info("Attendance calculation shard %s/%s done: %s batches, %s logs of %s employees, "
+                     "%s attendances created, %s updated, %s employees failed",
+                     shard, shards, totals['batches'], totals['logs'], totals['employees'],
+                     totals['created'], totals['updated'], totals['failed'])
+        return totals
+
+    def _calculate_attendance(self, employee_ids=None):
+        """
+        Calculate and adjust attendance records based on attendance logs and company settings.
 
-                check_in = punch_times[0]
-                check_out = punch_times[-1]
-                adjusted_check_in, adjusted_check_out = adjust_check_in_out_times(check_in, check_out)
+        This method processes attendance logs from biometric devices or other sources and creates or updates
+        corresponding HR attendance records in Odoo. It handles:
+            - Timezone conversions
+            - Adjusting check-in and check-out times
+            - Applying minimal attendance rules (if configured)
+            - Assigning leave types for specific dates
+            - Handling both single-shift and multi-shift configurations
+            - Pairing multiple punches into check-in/check-out pairs
+
+        Logic is divided into two paths:
+            1. Single shift scenario (multiple_shift = False), set-based, see
+               `_calculate_single_shift_attendance`
+            2. Multi-shift scenario (multiple_shift = True), recomputing the queued
+               employee days, see `_calculate_multi_shift_attendance`
 
-                leave_type = get_leave_type_for_date(self.env['hr.employee'].browse(employee_id), check_in)
-                vals = {
-                    'check_in': adjusted_check_in,
-                    'check_out': adjusted_check_out if adjusted_check_in != adjusted_check_out else False,
-                    'leave_type': leave_type,
-                    'punch_date': punch_date,
-                }
+        Args:
+            employee_ids (list): Only calculate the punches of these employees (all when None).
 
-                if attendance:
-                    attendance.write(vals)
-                else:
-                    vals['employee_id'] = employee_id
-                    attendance = self.env['hr.attendance'].create(vals)
+        Raises:
+            No direct exceptions raised here, but writes and creates may raise Odoo ORM exceptions if
+            constraints fail.
+
+        Returns:
+            dict: Counters 'logs', 'employees', 'created', 'updated' and 'failed'.
+        """
 
-                attendance.multiple_checkin_ids.unlink()
-                count = 1
-                i = 0
-                while i < len(punch_times):
-                    punch_in = punch_times[i]
-                    punch_out = punch_times[i + 1] if i + 1 < len(punch_times) else None
-                    self.env['multiple.punch'].create({
-                        'attendance_id': [(6, 0, [attendance.id])],
-                        'count': count,
-                        'check_in': punch_in,
-                        'check_out': punch_out,
-                    })
-                    count += 1
-                    i += 2
+        param_val = self.env['ir.config_parameter'].sudo().get_param('dps_zkteco_biometric_integration.multiple_shift')
 
-                for (log, _) in log_entries:
-                    log.user_punch_calculated = True
+        if param_val in [False, 'False', 'false', '0', 0, None, '']:
+            minimal_attendance = self.env['ir.config_parameter'].sudo().get_param(
+                'dps_zkteco_biometric_integration.minimal_attendance')
+            return self._calculate_single_shift_attendance(minimal_attendance, employee_ids)
 
+        return self._calculate_multi_shift_attendance(employee_ids)
 
 
 class MultiplePuching(models.Model):
     _name = 'multiple.punch'
     _description = 'Multiple Punch'
 
-    attendance_id = fields.Many2many('hr.attendance', string='Attendance', store=True, copy=False)
+    attendance_id = fields.Many2one('hr.attendance', string='Attendance', index=True, ondelete='cascade',
+                                    copy=False)
     employee_id = fields.Many2one('hr.employee', string='Employee', related='attendance_id.employee_id', copy=False,
                                   store=True)
     count = fields.Integer(string='Count', store=True, copy=False)
@@ -400,14 +773,9 @@ class MultiplePuching(models.Model):
             check_out_day = str(check_out.weekday())
 
             working_schedule = attendance.employee_id.resource_calendar_id
-            relevant_attendances = [
-                att for att in working_schedule.attendance_ids
-                if att.day_period == "lunch" and att.dayofweek in {check_in_day, check_out_day}
-            ]
+            relevant_attendances = working_schedule._get_lunch_intervals((check_in_day, check_out_day))
 
-            for att in relevant_attendances:
-                start_time = att.hour_from
-                end_time = att.hour_to
+            for start_time, end_time in relevant_attendances:
 
                 break_start = check_in.replace(hour=int(start_time), minute=int((start_time % 1) * 60))
                 break_end = check_in.replace(hour=int(end_time), minute=int((end_time % 1) * 60))
@@ -473,16 +841,11 @@ class HrAttendance(models.Model):
             check_in_day = str(check_in.weekday())
             check_out_day = str(check_out.weekday())
 
-            relevant_attendances = [
-                att for att in working_schedule.attendance_ids
-                if att.day_period == "lunch" and att.dayofweek in {check_in_day, check_out_day}
-            ]
+            relevant_attendances = working_schedule._get_lunch_intervals((check_in_day, check_out_day))
 
             total_break_time = 0.0  # Initialize total break time accumulator
 
-            for att in relevant_attendances:
-                start_time = att.hour_from
-                end_time = att.hour_to
+            for start_time, end_time in relevant_attendances:
 
                 break_start = check_in.replace(hour=int(start_time), minute=int((start_time % 1) * 60))
                 break_end = check_in.replace(hour=int(end_time), minute=int((end_time % 1) * 60))
@@ -513,12 +876,72 @@ class HrAttendance(models.Model):
         - If mandatory data (check-in, check-out, employee) is missing, `worked_hours` will be set to `False`.
 
         Notes:
-        - Relies on `_get_employee_calendar()` and `_employee_attendance_intervals()` for calendar and break handling.
+        - Relies on `_get_employee_calendar()` for the timezone and on the lunch intervals of the
+          employee's calendar, as `_employee_attendance_intervals(..., lunch=True)` returns them.
+        - Records are grouped by (lunch calendar, timezone); the lunch intervals of each group are
+          computed once over the span of its attendances and each attendance only subtracts the
+          intervals it overlaps.
+        - When `hr.contract` is installed, lunch intervals depend on contracts and every record is
+          computed on its own with `_employee_attendance_intervals()`.
         - Does not raise errors; missing or invalid calendar defaults to `False` (handled gracefully).
 
         Raises:
         - No explicit exceptions. If data is missing, worked hours remain unset (False).
         """
+        if 'hr.contract' in self.env:
+            self._compute_worked_hours_per_record()
+            return
+
+        groups = defaultdict(list)
+        for attendance in self:
+            if not (attendance.check_out and attendance.check_in and attendance.employee_id):
+                attendance.worked_hours = False
+                continue
+            calendar = attendance._get_employee_calendar() or attendance.employee_id.resource_calendar_id
+            if not calendar:
+                attendance.worked_hours = 0.0
+                continue
+            try:
+                tz = timezone(calendar.tz)
+            except Exception:
+                attendance.worked_hours = 0.0
+                continue
+            employee = attendance.employee_id
+            lunch_calendar = employee.resource_calendar_id or employee.company_id.resource_calendar_id
+            groups[(lunch_calendar, tz)].append(attendance)
+
+        for (lunch_calendar, tz), attendances in groups.items():
+            lunches_by_resource = {}
+            if lunch_calendar:
+                start = min(attendance.check_in for attendance in attendances).astimezone(tz)
+                stop = max(attendance.check_out for attendance in attendances).astimezone(tz)
+                resources = self.env['resource.resource'].browse(
+                    {attendance.employee_id.resource_id.id for attendance in attendances})
+                for resource_id, intervals in lunch_calendar._attendance_intervals_batch(
+                        start, stop, resources, lunch=True).items():
+                    intervals = list(intervals)
+                    lunches_by_resource[resource_id] = (intervals, [interval[1] for interval in intervals])
+
+            for attendance in attendances:
+                check_in_tz = attendance.check_in.astimezone(tz)
+                check_out_tz = attendance.check_out.astimezone(tz)
+                attendance_intervals = Intervals([(check_in_tz, check_out_tz, attendance)])
+                intervals, stops = lunches_by_resource.get(attendance.employee_id.resource_id.id, ([], []))
+                # Lunch intervals are sorted and disjoint: keep the ones ending after the check-in
+                # and starting before the check-out.
+                overlapping = []
+                for interval in intervals[bisect.bisect_right(stops, check_in_tz):]:
+                    if interval[0] >= check_out_tz:
+                        break
+                    overlapping.append(interval)
+                if overlapping:
+                    attendance_intervals = attendance_intervals - Intervals(overlapping)
+
+                total_seconds = sum((interval[1] - interval[0]).total_seconds() for interval in attendance_intervals)
+                attendance.worked_hours = total_seconds / 3600.0
+
+    def _compute_worked_hours_per_record(self):
+        """Compute `worked_hours` record by record with `_employee_attendance_intervals()`."""
         for attendance in self:
             if attendance.check_out and attendance.check_in and attendance.employee_id:
                 calendar = attendance._get_employee_calendar() or attendance.employee_id.resource_calendar_id
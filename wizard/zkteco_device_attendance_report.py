@@ -279,6 +279,11 @@ class EmployeeAttendanceReport(models.TransientModel):
             datetime.today()) + ')' + '.xlsx'
         output = io.BytesIO()
         workbook = xlsxwriter.Workbook(output)
+        # Leave of every reported employee and day, from the daily summaries
+        leave_calendar = self.env['zkteco.attendance.daily']._get_leave_calendar(
+            [employee.id for employee in attendances],
+            datetime.strptime(report_date_start_from, '%Y-%m-%d %H:%M:%S').date(),
+            datetime.strptime(report_date_end_to, '%Y-%m-%d %H:%M:%S').date())
         param_val = self.env['ir.config_parameter'].sudo().get_param(
             'tis_hr_biometric_attendance.multiple_shift')
         if param_val in [False, 'False', 'false', '0', 0,None, '']:  # Not True
@@ -465,7 +470,6 @@ class EmployeeAttendanceReport(models.TransientModel):
                 total_overtime_minutes_rounded = 0
                 total_ot_list = []
                 total_working_hours = 0
-                total_shortfall_hours = timedelta()
                 total_worked_hours = timedelta()
                 # my_dates = datetime.strptime(date_from, "%Y-%m-%d %H:%M:%S")  # Convert to datetime
                 my_date = datetime.strptime(report_date_start_from, '%Y-%m-%d %H:%M:%S').date()  # Convert date_from to date
@@ -524,19 +528,18 @@ class EmployeeAttendanceReport(models.TransientModel):
                             ml_difference = False
 
                             # Determine leave type on the given date
-                            for leave in employee.leave_line_ids:
-                                if leave.date == my_date:
-                                    leave_type = leave.leave_type
-                                    if leave_type == 'medical':
-                                        if leave.att_start_date and leave.att_end_date:
-                                            ml_chek_in = leave.att_start_date.strftime("%Y-%m-%d %H:%M:%S")
-                                            ml_chek_out = leave.att_end_date.strftime("%Y-%m-%d %H:%M:%S")
-                                            duration = leave.att_end_date - leave.att_start_date
-                                            wh = duration.total_seconds() / 3600 if ml_chek_in and ml_chek_out else 0.0
-                                            if wh > 0:
-                                                working_hours = wh
-                                                ml_difference = working_hours
-                                    break
+                            leave = leave_calendar.get(employee.id, my_date)
+                            if leave:
+                                leave_type = leave.leave_type
+                                if leave_type == 'medical':
+                                    if leave.start and leave.end:
+                                        ml_chek_in = leave.start.strftime("%Y-%m-%d %H:%M:%S")
+                                        ml_chek_out = leave.end.strftime("%Y-%m-%d %H:%M:%S")
+                                        duration = leave.end - leave.start
+                                        wh = duration.total_seconds() / 3600 if ml_chek_in and ml_chek_out else 0.0
+                                        if wh > 0:
+                                            working_hours = wh
+                                            ml_difference = working_hours
 
                             # Map leave type to style
                             if leave_type == 'holiday':
@@ -601,10 +604,9 @@ class EmployeeAttendanceReport(models.TransientModel):
                     font_to_set = None
 
                     # Determine leave type on the given date
-                    for leave in employee.leave_line_ids:
-                        if leave.date == my_date:
-                            leave_type = leave.leave_type
-                            break
+                    leave = leave_calendar.get(employee.id, my_date)
+                    if leave:
+                        leave_type = leave.leave_type
 
                     # Map leave type to style
                     if leave_type == 'holiday':
@@ -750,10 +752,9 @@ class EmployeeAttendanceReport(models.TransientModel):
 
 
                         # Determine leave type on the given date
-                        for leave in employee.leave_line_ids:
-                            if leave.date == my_date:
-                                leave_type = leave.leave_type
-                                break
+                        leave = leave_calendar.get(employee.id, my_date)
+                        if leave:
+                            leave_type = leave.leave_type
 
                         leave_ot = False
                         if leave_type == 'holiday' or leave_type == 'vacation':
@@ -875,9 +876,6 @@ class EmployeeAttendanceReport(models.TransientModel):
 
 
                     worksheet.write(row, col + 10, adjusted_time if classification == "Shortfall" else "00:00", present_weeend_style if p_on_weekend else (leave_style if leave_style else font_center))
-                    if classification == "Shortfall" and adjusted_time:
-                        hours, minutes = map(int, adjusted_time.split(":"))
-                        total_shortfall_hours += timedelta(hours=hours, minutes=minutes)
 
                     my_date += timedelta(days=1)
                     row += 1
@@ -908,19 +906,18 @@ class EmployeeAttendanceReport(models.TransientModel):
 
 
                         # Determine leave type on the given date
-                        for leave in employee.leave_line_ids:
-                            if leave.date == my_date:
-                                leave_type = leave.leave_type
-                                if leave_type == 'medical':
-                                    if leave.att_start_date and leave.att_end_date:
-                                        ml_chek_in = leave.att_start_date.strftime("%Y-%m-%d %H:%M:%S")
-                                        ml_chek_out = leave.att_end_date.strftime("%Y-%m-%d %H:%M:%S")
-                                        duration = leave.att_end_date - leave.att_start_date
-                                        wh = duration.total_seconds() / 3600 if ml_chek_in and ml_chek_out else 0.0
-                                        if wh > 0:
-                                            working_hours = wh
-                                            ml_difference = working_hours
-                                break
+                        leave = leave_calendar.get(employee.id, my_date)
+                        if leave:
+                            leave_type = leave.leave_type
+                            if leave_type == 'medical':
+                                if leave.start and leave.end:
+                                    ml_chek_in = leave.start.strftime("%Y-%m-%d %H:%M:%S")
+                                    ml_chek_out = leave.end.strftime("%Y-%m-%d %H:%M:%S")
+                                    duration = leave.end - leave.start
+                                    wh = duration.total_seconds() / 3600 if ml_chek_in and ml_chek_out else 0.0
+                                    if wh > 0:
+                                        working_hours = wh
+                                        ml_difference = working_hours
 
                         # Apply style if present and check-in exists
                         if leave_type and attendance and attendance.check_in:
@@ -1014,9 +1011,6 @@ class EmployeeAttendanceReport(models.TransientModel):
                 worksheet.write(row, 9, f"Total: {new_over_time}", font_center)
                 # worksheet.write(row, 10, f"Total: {total_overtime}", font_center)
                 worksheet.write(row, 8, f"Total: {total_working_hours}", font_center)
-                # Convert timedelta to total hours and minutes
-                total_hours = total_shortfall_hours.seconds // 3600  # Extract hours
-                total_minutes = (total_shortfall_hours.seconds % 3600) // 60  # Extract minutes
                 #####
                 total_seconds = total_worked_hours.total_seconds()
                 total_hours = int(total_seconds // 3600)
@@ -1244,7 +1238,6 @@ class EmployeeAttendanceReport(models.TransientModel):
                 total_overtime_minutes_rounded = 0
                 total_ot_list = []
                 total_working_hours = 0
-                total_shortfall_hours = timedelta()
                 total_worked_hours = timedelta()
                 # my_dates = datetime.strptime(date_from, "%Y-%m-%d %H:%M:%S")  # Convert to datetime
                 my_date = datetime.strptime(report_date_start_from, '%Y-%m-%d %H:%M:%S').date()  # Convert date_from to date
@@ -1304,10 +1297,9 @@ class EmployeeAttendanceReport(models.TransientModel):
                             font_to_set = None
 
                             # Determine leave type on the given date
-                            for leave in employee.leave_line_ids:
-                                if leave.date == my_date:
-                                    leave_type = leave.leave_type
-                                    break
+                            leave = leave_calendar.get(employee.id, my_date)
+                            if leave:
+                                leave_type = leave.leave_type
 
                             # Map leave type to style
                             if leave_type == 'holiday':
@@ -1394,10 +1386,9 @@ class EmployeeAttendanceReport(models.TransientModel):
                     font_to_set = None
 
                     # Determine leave type on the given date
-                    for leave in employee.leave_line_ids:
-                        if leave.date == my_date:
-                            leave_type = leave.leave_type
-                            break
+                    leave = leave_calendar.get(employee.id, my_date)
+                    if leave:
+                        leave_type = leave.leave_type
                     # Map leave type to style
                     if leave_type == 'holiday':
                         leave_style = holiday_present_style
@@ -1557,10 +1548,9 @@ class EmployeeAttendanceReport(models.TransientModel):
                         leave_type = None
 
                         # Determine leave type on the given date
-                        for leave in employee.leave_line_ids:
-                            if leave.date == my_date:
-                                leave_type = leave.leave_type
-                                break
+                        leave = leave_calendar.get(employee.id, my_date)
+                        if leave:
+                            leave_type = leave.leave_type
 
                         leave_ot = False
                         if leave_type == 'holiday' or leave_type == 'vacation':
@@ -1568,10 +1558,9 @@ class EmployeeAttendanceReport(models.TransientModel):
 
                         leave_type = None
 
-                        for leave in employee.leave_line_ids:
-                            if leave.date == my_date:
-                                leave_type = leave.leave_type
-                                break
+                        leave = leave_calendar.get(employee.id, my_date)
+                        if leave:
+                            leave_type = leave.leave_type
 
 
 
@@ -1712,9 +1701,6 @@ class EmployeeAttendanceReport(models.TransientModel):
                         worksheet.write(row, col + 11, '-' + adjusted_time if classification == "Shortfall" else "00:00",
                                         present_weeend_style if p_on_weekend else (leave_style if leave_style else font_center))
 
-                    if classification == "Shortfall" and adjusted_time:
-                        hours, minutes = map(int, adjusted_time.split(":"))
-                        total_shortfall_hours += timedelta(hours=hours, minutes=minutes)
 
 
 
@@ -1783,10 +1769,9 @@ class EmployeeAttendanceReport(models.TransientModel):
                         font_to_set = None
 
                         # Determine leave type on the given date
-                        for leave in employee.leave_line_ids:
-                            if leave.date == my_date:
-                                leave_type = leave.leave_type
-                                break
+                        leave = leave_calendar.get(employee.id, my_date)
+                        if leave:
+                            leave_type = leave.leave_type
 
                         # Apply style if present and check-in exists
                         if leave_type and attendance and attendance.check_in:
@@ -1892,9 +1877,6 @@ class EmployeeAttendanceReport(models.TransientModel):
                 worksheet.write(row, 10, f"Total: {new_over_time}", font_center)
                 # worksheet.write(row, 10, f"Total: {total_overtime}", font_center)
                 worksheet.write(row, 9, f"Total: {total_working_hours}", font_center)
-                # Convert timedelta to total hours and minutes
-                total_hours = total_shortfall_hours.seconds // 3600  # Extract hours
-                total_minutes = (total_shortfall_hours.seconds % 3600) // 60  # Extract minutes
                 #####
                 total_seconds = total_worked_hours.total_seconds()
                 total_hours = int(total_seconds // 3600)
@@ -2167,15 +2149,10 @@ class EmployeeAttendanceReport(models.TransientModel):
         check_in_day = check_in.weekday()  # Monday = 0, Sunday = 6
         check_out_day = check_out.weekday()
 
-        relevant_attendances = [
-            att for att in working_schedule.attendance_ids
-            if att.day_period == 'lunch' and att.dayofweek in {str(check_in_day), str(check_out_day)}
-        ]
+        relevant_attendances = working_schedule._get_lunch_intervals((str(check_in_day), str(check_out_day)))
 
         total_break_time = 0.0
-        for att in relevant_attendances:
-            start_time = att.hour_from
-            end_time = att.hour_to
+        for start_time, end_time in relevant_attendances:
 
             break_start = check_in.replace(hour=int(start_time), minute=int((start_time % 1) * 60))
             break_end = check_in.replace(hour=int(end_time), minute=int((end_time % 1) * 60))
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#
+#    OpenERP, Open Source Management Solution
+#    Copyright (C) 2024 DOTSPRIME SYSTEM LLP
+#    Email : sales@dotsprime.com / dotsprime@gmail.com
+########################################################
+
+"""
+Offline parsing of attendance log dumps.
+
+Understands the record layouts returned by `ZK.get_attendance` (8, 16 and
+40 byte binary records) and the tab separated text lines of ATTLOG exports.
+Parsers work on any buffer (bytes, mmap) and yield records lazily, so a dump
+can be memory-mapped and read without loading it into Python objects.
+"""
+
+from datetime import datetime
+from struct import iter_unpack, unpack, unpack_from
+
+# record size -> struct format, as unpacked by ZK.get_attendance
+BINARY_LAYOUTS = {
+    8: 'HB4sB',
+    16: '<I4sBB2sI',
+    40: '<H24sB4sB8s',
+}
+
+
+def decode_time(raw):
+    """Decode a 4-byte device timestamp (same encoding as ZK.__decode_time)."""
+    t = unpack("<I", raw)[0]
+    second = t % 60
+    t = t // 60
+    minute = t % 60
+    t = t // 60
+    hour = t % 24
+    t = t // 24
+    day = t % 31 + 1
+    t = t // 31
+    month = t % 12 + 1
+    t = t // 12
+    return datetime(t + 2000, month, day, hour, minute, second)
+
+
+# Records checked per candidate layout when detecting the layout of a dump
+DETECT_SAMPLE_RECORDS = 1000
+# Punch states sent by the devices (check in/out, break out/in, overtime in/out, ...)
+MAX_PUNCH_STATE = 15
+# Device clocks count from 2000; an earlier year or one far ahead means a wrong layout
+MIN_PUNCH_YEAR = 2001
+
+
+def _unpack_record(record_size, record):
+    """Return (user_id, raw timestamp, punch, status) of an unpacked binary record."""
+    if record_size == 8:
+        uid, status, timestamp, punch = record
+        return str(uid), timestamp, punch, status
+    if record_size == 16:
+        user_id, timestamp, status, punch, _reserved, _workcode = record
+        return str(user_id), timestamp, punch, status
+    _uid, user_id, status, timestamp, punch, _space = record
+    return user_id.split(b'\x00')[0].decode(errors='ignore'), timestamp, punch, status
+
+
+def _layout_fits(buffer, record_size, offset):
+    """
+    Tell whether the records of a dump decode to plausible punches with a layout.
+
+    Up to `DETECT_SAMPLE_RECORDS` records spread over the dump are checked:
+    each must have a PIN (at most 9 digits for the numeric layouts), a
+    valid timestamp in a sensible range of years and a known punch state.
+    """
+    count = (len(buffer) - offset) // record_size
+    if not count:
+        return False
+    fmt = BINARY_LAYOUTS[record_size]
+    last_year = datetime.now().year + 1
+    step = max(1, count // DETECT_SAMPLE_RECORDS)
+    for index in range(0, count, step):
+        user_id, timestamp, punch, _status = _unpack_record(
+            record_size, unpack_from(fmt, buffer, offset + index * record_size))
+        if not user_id.isalnum() or user_id == '0' or punch > MAX_PUNCH_STATE:
+            return False
+        if record_size != 40 and len(user_id) > 9:
+            return False
+        try:
+            punch_time = decode_time(timestamp)
+        except ValueError:
+            return False
+        if not MIN_PUNCH_YEAR <= punch_time.year <= last_year:
+            return False
+    return True
+
+
+def detect_layout(buffer):
+    """
+    Detect the layout of a dump.
+
+    Text dumps are recognised by their first line. For binary dumps, every
+    record size dividing the dump is tried and kept only when its decoded
+    records are plausible punches (see `_layout_fits`).
+
+    Returns:
+        tuple: ('text', 0) or (record size, offset of the first record).
+
+    Raises:
+        ValueError: No layout fits the dump, or several do; the layout must
+            then be given explicitly.
+    """
+    first_line = bytes(buffer[:64]).split(b'\n')[0][:32]
+    if first_line.strip() and all(byte in b'\t\r 0123456789-:' for byte in first_line):
+        return 'text', 0
+    size = len(buffer)
+    offsets = [0]
+    # Buffers read from the device start with a 4-byte total size
+    if size >= 4 and unpack("<I", bytes(buffer[:4]))[0] == size - 4:
+        offsets.insert(0, 4)
+    fits = [(record_size, offset) for offset in offsets for record_size in (40, 16, 8)
+            if (size - offset) % record_size == 0 and _layout_fits(buffer, record_size, offset)]
+    if not fits:
+        raise ValueError("Unrecognized attendance dump layout (%s bytes)" % size)
+    if len(fits) > 1:
+        raise ValueError("Ambiguous attendance dump layout (%s bytes): %s byte records all decode, "
+                         "please choose the layout" % (size, ", ".join(str(record_size) for record_size, offset in fits)))
+    return fits[0]
+
+
+def iter_binary_records(buffer, record_size, offset=0):
+    """
+    Yield (user_id, local datetime, punch, status) from binary records.
+
+    Trailing bytes that do not form a full record are ignored.
+    """
+    fmt = BINARY_LAYOUTS[record_size]
+    end = offset + (len(buffer) - offset) // record_size * record_size
+    view = memoryview(buffer)[offset:end]
+    try:
+        for record in iter_unpack(fmt, view):
+            user_id, timestamp, punch, status = _unpack_record(record_size, record)
+            try:
+                punch_time = decode_time(timestamp)
+            except ValueError:
+                continue
+            yield user_id, punch_time, punch, status
+    finally:
+        view.release()
+
+
+def iter_text_records(buffer):
+    """
+    Yield (user_id, local datetime, punch, status) from ATTLOG text lines.
+
+    Lines are `PIN<TAB>YYYY-MM-DD HH:MM:SS<TAB>status<TAB>verify...`, as posted
+    by ADMS devices; malformed lines are skipped.
+    """
+    start = 0
+    size = len(buffer)
+    while start < size:
+        end = buffer.find(b'\n', start)
+        if end == -1:
+            end = size
+        values = bytes(buffer[start:end]).decode(errors='ignore').split()
+        start = end + 1
+        try:
+            yield (values[0], datetime.strptime(f"{values[1]} {values[2]}", "%Y-%m-%d %H:%M:%S"),
+                   values[3], int(values[4]))
+        except (IndexError, ValueError):
+            continue
+
+
+def iter_records(buffer, layout='auto'):
+    """
+    Yield (user_id, local datetime, punch, status) from a dump.
+
+    Args:
+        buffer: bytes-like object or mmap of the dump.
+        layout (str|int): 'auto', 'text' or a binary record size (8, 16, 40).
+    """
+    offset = 0
+    if layout == 'auto':
+        layout, offset = detect_layout(buffer)
+    elif layout != 'text':
+        layout = int(layout)
+        if len(buffer) >= 4 and unpack("<I", bytes(buffer[:4]))[0] == len(buffer) - 4:
+            offset = 4
+    if layout == 'text':
+        return iter_text_records(buffer)
+    return iter_binary_records(buffer, layout, offset)